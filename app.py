@@ -1,13 +1,34 @@
 import os
+import hmac
+import hashlib
 import secrets
 import base64
 import json
 import time
+import threading
+import click
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from cryptography.fernet import Fernet
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from crypto_manager import CryptoManager, generate_data_key, wrap_data_key, unwrap_data_key
+from vault_store import VaultStore
+from sqlite_store import SQLiteStore
+from vault_cache import VaultCache
+from durable_io import atomic_write_json
+from compression import COMPRESSION_METHODS
+from kdf_service import KDFService, KDFBusyError
+from session_store import SessionStore
+import kdf_registry
+from export_manager import iter_export
+from import_manager import iter_import, import_entries
+import entry_query
+from sharing_manager import derive_share_key, encrypt_shared_entry, decrypt_shared_entry
+
+try:
+    import fcntl
+except ImportError:  # Windows - single process, no cross-process locking needed
+    fcntl = None
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', secrets.token_hex(16))
@@ -18,49 +39,63 @@ app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=30)
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
 SHARED_DIR = os.path.join(DATA_DIR, "shared")
+# Index of each user's shares (see get_share_index)
+SHARE_INDEX_DIR = os.path.join(DATA_DIR, "share_index")
+# KDF parameters for new keys; written by the calibrate-kdf command
+KDF_POLICY_FILE = os.path.join(DATA_DIR, "kdf_policy.json")
 
 # Ensure data directories exist
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 if not os.path.exists(SHARED_DIR):
     os.makedirs(SHARED_DIR)
+if not os.path.exists(SHARE_INDEX_DIR):
+    os.makedirs(SHARE_INDEX_DIR)
 
 # Initialize users file if it doesn't exist
 if not os.path.exists(USERS_FILE):
     with open(USERS_FILE, 'w') as f:
         json.dump({}, f)
 
+# Optional SQLite database for users, vaults and shares (flat files otherwise)
+DATABASE_PATH = os.environ.get('SECUREPASS_DATABASE')
+db = SQLiteStore(DATABASE_PATH) if DATABASE_PATH else None
+
+# Decrypted vaults cached by this worker
+vault_cache = VaultCache(
+    max_bytes=int(os.environ.get('SECUREPASS_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    idle_ttl=int(os.environ.get('SECUREPASS_CACHE_IDLE_TTL', 600))
+)
+
+# Key derivations run in a process pool so they don't stall the worker
+kdf_service = KDFService(
+    max_workers=int(os.environ['SECUREPASS_KDF_WORKERS']) if 'SECUREPASS_KDF_WORKERS' in os.environ else None,
+    max_pending=int(os.environ['SECUREPASS_KDF_QUEUE']) if 'SECUREPASS_KDF_QUEUE' in os.environ else None
+)
+
+# Largest number of operations accepted by POST /api/passwords/batch
+MAX_BATCH_OPERATIONS = 1000
+
+# Server-side sessions; with the SQLite database they are shared by all workers
+session_store = SessionStore(
+    db,
+    idle_ttl=int(app.config['PERMANENT_SESSION_LIFETIME'].total_seconds())
+)
+if db is None:
+    print("Warning: sessions are kept in this process's memory; run a single worker "
+          "or set SECUREPASS_DATABASE so that all workers share them")
+
 # Helper functions for cryptography
-def derive_key(password, salt=None):
-    """Derive a cryptographic key from a password."""
-    if salt is None:
-        salt = os.urandom(16)
-        
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-    )
-    
-    key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-    return key, salt
+def derive_key(password, salt, params=None):
+    """Derive raw key bytes from a password (legacy PBKDF2 parameters by default)."""
+    return kdf_service.derive(password, salt, params or kdf_registry.LEGACY_PARAMS)
 
-def hash_password(password, salt=None):
-    """Hash a password with salt."""
-    if salt is None:
-        salt = os.urandom(16)
-        
-    # Combine password with salt and hash
-    salted_password = password.encode() + salt
-    hash_obj = hashes.Hash(hashes.SHA256())
-    hash_obj.update(salted_password)
-    password_hash = hash_obj.finalize().hex()
-    
-    return password_hash, salt.hex()
+def pbkdf2_in_pool(password, salt, iterations):
+    """PBKDF2-HMAC-SHA256 through the KDF service, for version 1 shares."""
+    return kdf_service.derive(password, salt, {"name": "pbkdf2-sha256", "iterations": iterations})
 
 def verify_password(entered_password, stored_hash, stored_salt):
-    """Verify a password against a stored hash."""
+    """Verify a password against a stored SHA-256 hash (users registered before the derived verifier)."""
     salt = bytes.fromhex(stored_salt)
     salted_password = entered_password.encode() + salt
     hash_obj = hashes.Hash(hashes.SHA256())
@@ -73,40 +108,6 @@ def get_user_data_path(username):
     """Get path to user's encrypted data file."""
     return os.path.join(DATA_DIR, f"{username}_passwords.dat")
 
-def encrypt_data(data, key):
-    """Encrypt data (dictionary) with the given key."""
-    fernet = Fernet(key)
-    json_data = json.dumps(data)
-    encrypted_data = fernet.encrypt(json_data.encode())
-    return encrypted_data
-
-def decrypt_data(encrypted_data, key):
-    """Decrypt data with the given key."""
-    try:
-        fernet = Fernet(key)
-        decrypted_data = fernet.decrypt(encrypted_data)
-        return json.loads(decrypted_data.decode())
-    except Exception as e:
-        print(f"Error decrypting data: {e}")
-        return None
-
-def encrypt_password(password, key):
-    """Encrypt a single password string."""
-    fernet = Fernet(key)
-    encrypted = fernet.encrypt(password.encode())
-    return base64.b64encode(encrypted).decode()
-
-def decrypt_password(encrypted_password, key):
-    """Decrypt a single password string."""
-    try:
-        fernet = Fernet(key)
-        encrypted = base64.b64decode(encrypted_password)
-        decrypted = fernet.decrypt(encrypted)
-        return decrypted.decode()
-    except Exception as e:
-        print(f"Error decrypting password: {e}")
-        return None
-
 def load_users():
     """Load all users from the users file."""
     with open(USERS_FILE, 'r') as f:
@@ -114,22 +115,350 @@ def load_users():
 
 def save_users(users):
     """Save users to the users file."""
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f)
+    atomic_write_json(USERS_FILE, users)
+
+def get_user(username):
+    """Load a single user's record, or None if the user doesn't exist."""
+    if db is not None:
+        return db.get_user(username)
+    return load_users().get(username)
 
-def save_user_passwords(username, encrypted_data):
-    """Save encrypted password data for a user."""
-    with open(get_user_data_path(username), 'wb') as f:
-        f.write(encrypted_data)
+def save_user(username, user_data):
+    """Create or replace a single user's record."""
+    if db is not None:
+        db.save_user(username, user_data)
+        return
+    users = load_users()
+    users[username] = user_data
+    save_users(users)
 
-def load_user_passwords(username):
-    """Load encrypted password data for a user."""
-    data_path = get_user_data_path(username)
-    if not os.path.exists(data_path):
+def add_user(username, user_data):
+    """Create a user unless the name is taken. Returns True if created."""
+    if db is not None:
+        return db.add_user(username, user_data)
+    users = load_users()
+    if username in users:
+        return False
+    users[username] = user_data
+    save_users(users)
+    return True
+
+def get_share_path(share_id):
+    """Get path to a shared item's file."""
+    return os.path.join(SHARED_DIR, f"{share_id}.json")
+
+def load_share(share_id):
+    """Load a shared item, or None if it doesn't exist."""
+    if db is not None:
+        return db.get_share(share_id)
+    share_path = get_share_path(share_id)
+    if not os.path.exists(share_path):
         return None
+    with open(share_path, 'r') as f:
+        return json.load(f)
+
+def save_share(share_id, share_data):
+    """Create or replace a shared item."""
+    if db is not None:
+        db.save_share(share_id, share_data)
+        return
+    atomic_write_json(get_share_path(share_id), share_data)
+    
+    # Every change gives the owner's shares a new random version; the user
+    # record isn't touched (shares are also updated by anonymous requests)
+    owner = share_data.get("owner")
+    if owner:
+        with update_share_index(owner) as index:
+            index["shares"][share_id] = share_data.get("expires_at", 0)
+            index["version"] = secrets.token_hex(16)
+
+def get_share_index_path(username):
+    """Get path to the index of a user's shares."""
+    return os.path.join(SHARE_INDEX_DIR, f"{username}.json")
+
+def get_share_index(username):
+    """
+    Load the index of a user's shares (flat-file storage).
+    
+    The index maps the user's share ids to their expiry times and holds
+    the version of their shares, so listing them or checking their
+    version doesn't read every shared item. It is built from the share
+    files the first time it is needed.
+    
+    Returns:
+        dict: {"version": ..., "shares": {share_id: expires_at}}
+    """
+    index_path = get_share_index_path(username)
+    if os.path.exists(index_path):
+        with open(index_path, 'r') as f:
+            return json.load(f)
+    with update_share_index(username) as index:
+        return index
+
+# Serializes changes to share indexes between the threads of this worker
+_share_index_lock = threading.Lock()
+
+@contextmanager
+def update_share_index(username):
+    """Load the index of a user's shares for modification, locked; it's written when the block exits."""
+    index_path = get_share_index_path(username)
+    with _share_index_lock, open(index_path + ".lock", 'a') as lock_file:
+        # Other workers wait on the lock file
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+        else:
+            index = {"version": secrets.token_hex(16), "shares": {}}
+            for filename in os.listdir(SHARED_DIR):
+                if filename.endswith(".json"):
+                    share_data = load_share(filename[:-5])
+                    if share_data and share_data.get("owner") == username:
+                        index["shares"][filename[:-5]] = share_data.get("expires_at", 0)
+        
+        yield index
+        atomic_write_json(index_path, index)
+
+def get_share_version(username):
+    """Get the version of a user's shares, which changes on every change to them."""
+    if db is not None:
+        return db.get_share_version(username)
+    return get_share_index(username)["version"]
+
+def count_expired_shares(username, now):
+    """Count a user's shares whose expiry time has passed."""
+    if db is not None:
+        return db.count_expired_shares(username, now)
+    return sum(1 for expires_at in get_share_index(username)["shares"].values() if expires_at <= now)
+
+@contextmanager
+def update_share(share_id):
+    """Load a shared item for modification; it's saved when the block exits, if it was changed."""
+    if db is not None:
+        with db.update_share(share_id) as share_data:
+            yield share_data
+        return
+    share_data = load_share(share_id)
+    original = json.dumps(share_data, sort_keys=True)
+    yield share_data
+    if share_data is not None and json.dumps(share_data, sort_keys=True) != original:
+        save_share(share_id, share_data)
+
+def load_owner_shares(username):
+    """Load all shared items created by a user as (share_id, share_data) tuples."""
+    if db is not None:
+        return db.get_owner_shares(username)
+    shares = []
+    for share_id in get_share_index(username)["shares"]:
+        share_data = load_share(share_id)
+        if share_data and share_data.get("owner") == username:
+            shares.append((share_id, share_data))
+    return shares
+
+def make_etag(username, resource, version):
+    """ETag of a user's resource at a version; never the same for two users."""
+    return hashlib.sha256(json.dumps([username, resource, version], default=str).encode()).hexdigest()[:32]
+
+def not_modified(etag):
+    """
+    Answer a conditional GET.
+    
+    Returns:
+        Response: 304 if the client's If-None-Match has the ETag, None otherwise
+    """
+    if not request.if_none_match.contains(etag):
+        return None
+    return with_etag(Response(status=304), etag)
+
+def with_etag(response, etag):
+    """Set the ETag of a response; clients must revalidate before reusing it."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def get_session_user():
+    """
+    Get the session of the logged-in user.
+    
+    Returns:
+        UserSession: The session, or None if not logged in or the session
+                     expired or was revoked
+    """
+    return session_store.get(session.get('session_id'), session.get('session_token'))
+
+def get_user_vault(user_session):
+    """
+    Get the session user's vault for per-entry reads and writes.
+    
+    The vault is kept open on the session between requests, and forgotten
+    with the session's key when it expires or is revoked; records appended
+    by other workers are picked up by re-scanning only the new tail of the file.
+    """
+    if user_session.vault is not None:
+        vault = user_session.vault
+        vault.refresh()
+        return vault
+    
+    username = user_session.username
+    key = user_session.key
+    # Compression is chosen per vault; existing records are read whatever they use
+    user_data = get_user(username) or {}
+    compression = user_data.get('app_settings', {}).get('vault_compression', 'zlib')
+    crypto_manager = CryptoManager(key, compression=compression)
+    if db is not None:
+        vault = db.open_vault(username, crypto_manager)
+    else:
+        vault = VaultStore(get_user_data_path(username), crypto_manager)
+    # Entry ids of a single-blob vault are only stored once it is rewritten
+    vault.upgrade()
+    user_session.vault = vault
+    return vault
+
+def close_user_vault(username):
+    """Forget the vaults opened for a user's sessions and their cached entries."""
+    for user_session in session_store.local_sessions(username):
+        user_session.vault = None
+    vault_cache.invalidate(username)
+
+def wrap_user_key(user_data, password, data_key, params=None):
+    """Wrap a data key with a fresh derivation of the password, in user_data."""
+    params = params or kdf_registry.load_policy(KDF_POLICY_FILE)
+    key_salt = os.urandom(16)
+    store_wrapped_key(user_data, derive_key(password, key_salt, params), key_salt, params, data_key)
+
+def store_wrapped_key(user_data, derived, key_salt, params, data_key):
+    """Store the verifier and wrapped data key split from one derivation in user_data."""
+    verifier, wrapping_key = kdf_registry.split_derived_key(derived)
+    user_data['key_salt'] = key_salt.hex()
+    user_data['kdf'] = params
+    user_data['verifier'] = verifier.hex()
+    user_data['wrapped_key'] = wrap_data_key(wrapping_key, data_key)
+    # The SHA-256 verifier is replaced by the derived one
+    user_data.pop('password_hash', None)
+    user_data.pop('password_salt', None)
+
+def unlock_user_key(username, user_data, password):
+    """
+    Verify a user's password and get the data key of their vault.
+    
+    One key derivation both verifies the password and unwraps the key.
+    Users still verified by a SHA-256 hash are moved to this format; their
+    derived key either wraps the data key or, before data keys, is the
+    data key. The data key is re-wrapped if the KDF parameters are weaker
+    than the policy; either way only the user record is rewritten.
+    
+    Returns:
+        bytes: The data key, or None if the password is wrong
+    """
+    legacy = 'verifier' not in user_data
+    if legacy and not verify_password(password, user_data['password_hash'], user_data['password_salt']):
+        return None
+    
+    key_salt = bytes.fromhex(user_data['key_salt'])
+    params = user_data.get('kdf', kdf_registry.LEGACY_PARAMS)
+    derived = derive_key(password, key_salt, params)
+    if legacy:
+        legacy_key = base64.urlsafe_b64encode(derived)
+        data_key = unwrap_data_key(legacy_key, user_data['wrapped_key']) if 'wrapped_key' in user_data else legacy_key
+    else:
+        verifier, wrapping_key = kdf_registry.split_derived_key(derived)
+        if not hmac.compare_digest(verifier.hex(), user_data['verifier']):
+            return None
+        data_key = unwrap_data_key(wrapping_key, user_data['wrapped_key'])
+    
+    policy = kdf_registry.load_policy(KDF_POLICY_FILE)
+    if kdf_registry.is_outdated(params, policy):
+        wrap_user_key(user_data, password, data_key, policy)
+    elif legacy:
+        store_wrapped_key(user_data, derived, key_salt, params, data_key)
+    else:
+        return data_key
+    
+    save_user(username, user_data)
+    return data_key
+
+def load_vault_entries(username, vault):
+    """
+    Get the metadata of all entries of a vault, from the cache when the vault is unchanged.
+    
+    Only metadata is decrypted (and cached); passwords and notes stay
+    encrypted until get_vault_entry is called for a single entry.
+    The returned list and entries are shared with the cache and must not be modified.
+    """
+    version = vault.version()
+    entries = vault_cache.get(username, version)
+    if entries is None:
+        entries = vault.load_entries(include_secrets=False)
+        vault_cache.put(username, version, entries)
+    return entries
+
+def prepare_new_entry(vault, entry):
+    """Encrypt the password of an entry sent by the client and timestamp it, before it is added."""
+    entry.pop("id", None)
+    
+    # Encrypt password with the vault's cipher
+    if "password" in entry:
+        entry["password"] = vault.crypto_manager.encrypt_password(entry["password"])
+        entry["encrypted"] = True
+    
+    # Add timestamps
+    entry["created_at"] = time.time()
+    entry["modified_at"] = time.time()
+
+def prepare_updated_entry(vault, existing_entry, updated_entry, entry_id):
+    """
+    Turn an edited entry sent by the client into the entry replacing existing_entry.
+    
+    A password left as the "********" placeholder of the list keeps the
+    stored one; any other password is encrypted.
+    """
+    if "password" in updated_entry:
+        if existing_entry.get("encrypted", False) and updated_entry["password"] == "********":
+            updated_entry["password"] = existing_entry["password"]
+        else:
+            updated_entry["password"] = vault.crypto_manager.encrypt_password(updated_entry["password"])
+        updated_entry["encrypted"] = True
     
-    with open(data_path, 'rb') as f:
-        return f.read()
+    # Update timestamps
+    updated_entry["modified_at"] = time.time()
+    if "created_at" not in updated_entry and "created_at" in existing_entry:
+        updated_entry["created_at"] = existing_entry["created_at"]
+    
+    updated_entry["id"] = entry_id
+
+def get_vault_derived(username, vault, name, build):
+    """
+    Get data computed from the entry metadata of a vault (see VaultCache.get_derived).
+    
+    It is computed once per vault version, or on every call when the vault
+    is too large to be cached.
+    """
+    version = vault.version()
+    derived = vault_cache.get_derived(username, version, name, build)
+    if derived is None:
+        entries = load_vault_entries(username, vault)
+        derived = vault_cache.get_derived(username, version, name, build) or build(entries)
+    return derived
+
+def get_vault_entry(vault, entry_id):
+    """Read and decrypt an entry (secrets included) by id, or None if there is no such entry."""
+    if not isinstance(entry_id, str):
+        return None
+    return vault.get_entry(entry_id)
+
+def list_entry(entry):
+    """
+    Get an entry as listed by GET /api/passwords.
+    
+    Passwords and notes aren't sent with the list; /api/passwords/decrypt returns them.
+    """
+    listed = {field: value for field, value in entry.items() if field not in CryptoManager.SECRET_FIELDS}
+    if entry.get("encrypted", False):
+        listed["password_hidden"] = True
+        listed["password"] = "********"
+    return listed
 
 def create_shared_item(entry, username, expiration_hours=24, access_count=1):
     """Create a shared password entry."""
@@ -154,93 +483,65 @@ def create_shared_item(entry, username, expiration_hours=24, access_count=1):
     expiration_time = time.time() + (expiration_hours * 3600)
     
     # Encrypt the entry with the access key
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=b'sharing_salt',  # Fixed salt for simplicity
-        iterations=100000,
-    )
-    sharing_key = base64.urlsafe_b64encode(kdf.derive(access_key.encode()))
-    fernet = Fernet(sharing_key)
+    share_data = encrypt_shared_entry(shared_entry, access_key)
     
-    encrypted_data = fernet.encrypt(json.dumps(shared_entry).encode())
-    
-    # Create share metadata
-    share_data = {
-        "encrypted_entry": base64.b64encode(encrypted_data).decode(),
+    # Add share metadata
+    share_data.update({
         "created_at": time.time(),
         "expires_at": expiration_time,
         "access_count_limit": access_count,
         "access_count_current": 0,
         "is_valid": True,
         "owner": username
-    }
+    })
     
     # Save shared item
-    share_path = os.path.join(SHARED_DIR, f"{share_id}.json")
-    with open(share_path, 'w') as f:
-        json.dump(share_data, f)
+    save_share(share_id, share_data)
     
     return share_id, access_key
 
 def access_shared_item(share_id, access_key):
     """Access a shared password item."""
-    # Load the shared item
-    share_path = os.path.join(SHARED_DIR, f"{share_id}.json")
-    if not os.path.exists(share_path):
-        return None
-    
-    with open(share_path, 'r') as f:
-        share_data = json.load(f)
-    
-    # Check if share is valid
-    if not share_data.get("is_valid", False):
-        return None
-    
-    # Check if expired
-    current_time = time.time()
-    if current_time > share_data.get("expires_at", 0):
-        # Mark as invalid due to expiration
-        share_data["is_valid"] = False
-        with open(share_path, 'w') as f:
-            json.dump(share_data, f)
+    share_data = load_share(share_id)
+    if share_data is None:
         return None
     
-    # Check access count
-    current_count = share_data.get("access_count_current", 0)
-    limit = share_data.get("access_count_limit", 1)
+    # Derived before the access is counted, so a busy KDF service (needed
+    # for version 1 shares) doesn't use one up
+    sharing_key = derive_share_key(share_data, access_key, pbkdf2=pbkdf2_in_pool)
     
-    if limit > 0 and current_count >= limit:
-        # Mark as invalid due to max access count reached
-        share_data["is_valid"] = False
-        with open(share_path, 'w') as f:
-            json.dump(share_data, f)
-        return None
-    
-    # Increment access count
-    share_data["access_count_current"] = current_count + 1
-    if limit > 0 and share_data["access_count_current"] >= limit:
-        share_data["is_valid"] = False
-    
-    # Save updated access count
-    with open(share_path, 'w') as f:
-        json.dump(share_data, f)
+    with update_share(share_id) as share_data:
+        if not share_data:
+            return None
+        
+        # Check if share is valid
+        if not share_data.get("is_valid", False):
+            return None
+        
+        # Check if expired
+        current_time = time.time()
+        if current_time > share_data.get("expires_at", 0):
+            # Mark as invalid due to expiration
+            share_data["is_valid"] = False
+            return None
+        
+        # Check access count
+        current_count = share_data.get("access_count_current", 0)
+        limit = share_data.get("access_count_limit", 1)
+        
+        if limit > 0 and current_count >= limit:
+            # Mark as invalid due to max access count reached
+            share_data["is_valid"] = False
+            return None
+        
+        # Increment access count
+        share_data["access_count_current"] = current_count + 1
+        if limit > 0 and share_data["access_count_current"] >= limit:
+            share_data["is_valid"] = False
     
     # Decrypt the shared item
     try:
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=b'sharing_salt',  # Fixed salt for simplicity
-            iterations=100000,
-        )
-        sharing_key = base64.urlsafe_b64encode(kdf.derive(access_key.encode()))
-        fernet = Fernet(sharing_key)
-        
-        encrypted_data = base64.b64decode(share_data["encrypted_entry"])
-        decrypted_data = fernet.decrypt(encrypted_data)
-        
-        return json.loads(decrypted_data.decode())
+        return decrypt_shared_entry(share_data, sharing_key)
     except Exception as e:
         print(f"Error decrypting shared item: {e}")
         return None
@@ -249,52 +550,35 @@ def get_user_shares(username):
     """Get all shares created by a user."""
     shares = []
     
-    for filename in os.listdir(SHARED_DIR):
-        if filename.endswith(".json"):
-            share_id = filename[:-5]  # Remove .json extension
-            share_path = os.path.join(SHARED_DIR, filename)
-            
-            with open(share_path, 'r') as f:
-                share_data = json.load(f)
-            
-            if share_data.get("owner") == username:
-                # Add share ID to the data
-                share_info = {
-                    "id": share_id,
-                    "created_at": share_data.get("created_at"),
-                    "expires_at": share_data.get("expires_at"),
-                    "access_count_limit": share_data.get("access_count_limit"),
-                    "access_count_current": share_data.get("access_count_current"),
-                    "is_valid": share_data.get("is_valid")
-                }
-                shares.append(share_info)
+    for share_id, share_data in load_owner_shares(username):
+        # Add share ID to the data
+        share_info = {
+            "id": share_id,
+            "created_at": share_data.get("created_at"),
+            "expires_at": share_data.get("expires_at"),
+            "access_count_limit": share_data.get("access_count_limit"),
+            "access_count_current": share_data.get("access_count_current"),
+            "is_valid": share_data.get("is_valid")
+        }
+        shares.append(share_info)
     
     return shares
 
 def invalidate_shared_item(share_id, username):
     """Invalidate a shared item if owned by the user."""
-    share_path = os.path.join(SHARED_DIR, f"{share_id}.json")
-    if not os.path.exists(share_path):
-        return False
-    
-    with open(share_path, 'r') as f:
-        share_data = json.load(f)
-    
-    # Verify ownership
-    if share_data.get("owner") != username:
-        return False
-    
-    share_data["is_valid"] = False
-    
-    with open(share_path, 'w') as f:
-        json.dump(share_data, f)
+    with update_share(share_id) as share_data:
+        # Verify ownership
+        if not share_data or share_data.get("owner") != username:
+            return False
+        
+        share_data["is_valid"] = False
     
     return True
 
 # Routes
 @app.route('/')
 def index():
-    if 'username' in session:
+    if get_session_user() is not None:
         return redirect(url_for('dashboard'))
     return render_template('login.html')
 
@@ -319,34 +603,20 @@ def register():
             return render_template('register.html')
         
         # Check if username exists
-        users = load_users()
-        if username in users:
+        if get_user(username) is not None:
             flash('Username already exists', 'error')
             return render_template('register.html')
         
-        # Create user
-        password_hash, salt = hash_password(password)
-        
-        # Derive encryption key
-        key, key_salt = derive_key(password)
-        
-        users[username] = {
-            "password_hash": password_hash,
-            "password_salt": salt,
-            "key_salt": key_salt.hex(),
-            "created_at": time.time()
-        }
-        
-        save_users(users)
+        # Create user; the vault is encrypted with a random data key,
+        # wrapped by a key derived from the password
+        user_data = {"created_at": time.time()}
+        wrap_user_key(user_data, password, generate_data_key())
         
-        # Create initial empty password database
-        initial_data = {
-            "entries": [],
-            "version": 1
-        }
+        if not add_user(username, user_data):
+            flash('Username already exists', 'error')
+            return render_template('register.html')
         
-        encrypted_data = encrypt_data(initial_data, key)
-        save_user_passwords(username, encrypted_data)
+        # The password database is created on the first write
         
         flash('Registration successful! You can now log in.', 'success')
         return redirect(url_for('login'))
@@ -365,23 +635,22 @@ def login():
             return render_template('login.html')
         
         # Check credentials
-        users = load_users()
-        if username not in users:
+        user_data = get_user(username)
+        if user_data is None:
             flash('Invalid username or password', 'error')
             return render_template('login.html')
         
-        user_data = users[username]
-        if not verify_password(password, user_data['password_hash'], user_data['password_salt']):
+        # Verify the password and unwrap the vault's data key
+        key = unlock_user_key(username, user_data, password)
+        if key is None:
             flash('Invalid username or password', 'error')
             return render_template('login.html')
         
-        # Derive key for decryption
-        key_salt = bytes.fromhex(user_data['key_salt'])
-        key, _ = derive_key(password, key_salt)
-        
-        # Store username and key in session
-        session['username'] = username
-        session['key'] = key.decode()  # Store key as string
+        # The key stays on the server; the cookie only identifies the session
+        session_id, token = session_store.create(username, key)
+        session.clear()
+        session['session_id'] = session_id
+        session['session_token'] = token
         session.permanent = True
         
         return redirect(url_for('dashboard'))
@@ -390,193 +659,244 @@ def login():
 
 @app.route('/dashboard')
 def dashboard():
-    if 'username' not in session:
+    if get_session_user() is None:
         return redirect(url_for('login'))
     
     return render_template('dashboard.html')
 
 @app.route('/api/passwords', methods=['GET'])
 def get_passwords():
-    if 'username' not in session or 'key' not in session:
+    user_session = get_session_user()
+    if user_session is None:
         return jsonify({"error": "Unauthorized"}), 401
     
-    username = session['username']
-    key = session['key'].encode()  # Convert string back to bytes
+    username = user_session.username
     
-    encrypted_data = load_user_passwords(username)
-    if not encrypted_data:
-        return jsonify({"entries": []})
+    try:
+        field, descending = entry_query.parse_sort(request.args.get('sort'))
+        limit = int(request.args.get('limit', entry_query.DEFAULT_PAGE_SIZE))
+        if not 1 <= limit <= entry_query.MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {entry_query.MAX_PAGE_SIZE}")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    data = decrypt_data(encrypted_data, key)
-    if not data:
+    try:
+        vault = get_user_vault(user_session)
+        
+        # The vault's version is known before anything is decrypted
+        etag = make_etag(username, "passwords", [vault.version(), request.query_string.decode()])
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        
+        order = get_vault_derived(username, vault, "order:" + field,
+                                  lambda entries: entry_query.build_order(entries, field))
+        categories = get_vault_derived(username, vault, "categories",
+                                       lambda entries: sorted({entry["category"] for entry in entries if entry.get("category")}))
+    except Exception as e:
+        print(f"Error loading passwords: {e}")
         return jsonify({"error": "Could not decrypt data"}), 500
     
-    # Don't send encrypted passwords to frontend
-    entries = data.get("entries", [])
-    for entry in entries:
-        if "password" in entry and entry.get("encrypted", False):
-            entry["password_hidden"] = True
-            entry["password"] = "********"
-    
-    return jsonify({"entries": entries})
+    try:
+        page, next_cursor = entry_query.query_page(
+            order, field, descending,
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            category=request.args.get('category'),
+            query=request.args.get('q')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return with_etag(jsonify({
+        "entries": [list_entry(entry) for entry in page],
+        "next_cursor": next_cursor,
+        "categories": categories
+    }), etag)
 
 @app.route('/api/passwords', methods=['POST'])
 def add_password():
-    if 'username' not in session or 'key' not in session:
+    user_session = get_session_user()
+    if user_session is None:
         return jsonify({"error": "Unauthorized"}), 401
     
-    username = session['username']
-    key = session['key'].encode()
+    username = user_session.username
     
     # Get request data
     entry = request.json
     
-    # Encrypt password
-    if "password" in entry:
-        entry["password"] = encrypt_password(entry["password"], key)
-        entry["encrypted"] = True
-    
-    # Add timestamps
-    entry["created_at"] = time.time()
-    entry["modified_at"] = time.time()
-    
-    # Load current entries
-    encrypted_data = load_user_passwords(username)
-    if encrypted_data:
-        data = decrypt_data(encrypted_data, key)
-    else:
-        data = {"entries": [], "version": 1}
-    
-    if not data:
+    try:
+        vault = get_user_vault(user_session)
+        prepare_new_entry(vault, entry)
+        
+        # Append the new entry; it gets its id here
+        vault.put_entry(entry)
+        vault_cache.invalidate(username)
+    except Exception as e:
+        print(f"Error saving password: {e}")
         return jsonify({"error": "Could not decrypt data"}), 500
     
-    # Add new entry
-    data["entries"].append(entry)
-    
-    # Save updated data
-    encrypted_data = encrypt_data(data, key)
-    save_user_passwords(username, encrypted_data)
-    
-    return jsonify({"success": True, "entry": entry})
+    return jsonify({"success": True, "entry": list_entry(entry)})
 
-@app.route('/api/passwords/<int:entry_id>', methods=['PUT'])
+@app.route('/api/passwords/<entry_id>', methods=['PUT'])
 def update_password(entry_id):
-    if 'username' not in session or 'key' not in session:
+    user_session = get_session_user()
+    if user_session is None:
         return jsonify({"error": "Unauthorized"}), 401
     
-    username = session['username']
-    key = session['key'].encode()
+    username = user_session.username
     
     # Get request data
     updated_entry = request.json
     
-    # Load current entries
-    encrypted_data = load_user_passwords(username)
-    if not encrypted_data:
-        return jsonify({"error": "No data found"}), 404
-    
-    data = decrypt_data(encrypted_data, key)
-    if not data:
+    try:
+        vault = get_user_vault(user_session)
+    except Exception as e:
+        print(f"Error opening vault: {e}")
         return jsonify({"error": "Could not decrypt data"}), 500
     
-    entries = data.get("entries", [])
-    
     # Ensure entry_id is valid
-    if entry_id < 0 or entry_id >= len(entries):
+    existing_entry = vault.get_entry(entry_id)
+    if not existing_entry:
         return jsonify({"error": "Entry not found"}), 404
     
-    # If the password was changed, encrypt it
-    if "password" in updated_entry and (not entries[entry_id].get("encrypted", False) or 
-                                       updated_entry["password"] != "********"):
-        updated_entry["password"] = encrypt_password(updated_entry["password"], key)
-        updated_entry["encrypted"] = True
+    # Update entry
+    prepare_updated_entry(vault, existing_entry, updated_entry, entry_id)
+    vault.put_entry(updated_entry)
+    vault_cache.invalidate(username)
     
-    # Update timestamps
-    updated_entry["modified_at"] = time.time()
-    if "created_at" not in updated_entry and "created_at" in entries[entry_id]:
-        updated_entry["created_at"] = entries[entry_id]["created_at"]
+    return jsonify({"success": True, "entry": list_entry(updated_entry)})
+
+@app.route('/api/passwords/batch', methods=['POST'])
+def batch_passwords():
+    user_session = get_session_user()
+    if user_session is None:
+        return jsonify({"error": "Unauthorized"}), 401
     
-    # Update entry
-    entries[entry_id] = updated_entry
+    username = user_session.username
+    
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"success": False, "error": "operations must be a non-empty list", "results": []}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({"success": False, "error": f"At most {MAX_BATCH_OPERATIONS} operations per batch", "results": []}), 400
+    
+    try:
+        vault = get_user_vault(user_session)
+    except Exception as e:
+        print(f"Error opening vault: {e}")
+        return jsonify({"error": "Could not decrypt data"}), 500
+    
+    # Operations are checked against the vault as changed by the ones before
+    # them; nothing is written unless all of them are valid
+    staged = {}  # entry id -> entry as it will be written, None if deleted
+    changes = []
+    results = []
+    for operation in operations:
+        op = operation.get("op") if isinstance(operation, dict) else None
+        entry_id = operation.get("id") if op else None
+        entry = dict(operation["entry"]) if op and isinstance(operation.get("entry"), dict) else None
+        
+        if op == "create" and entry is not None:
+            prepare_new_entry(vault, entry)
+            entry["id"] = VaultStore.new_entry_id()
+            staged[entry["id"]] = entry
+            changes.append(("put", entry))
+            results.append({"op": op, "id": entry["id"], "entry": list_entry(entry)})
+            continue
+        
+        if op not in ("update", "delete") or not isinstance(entry_id, str) or (op == "update" and entry is None):
+            results.append({"op": op, "error": "Invalid operation"})
+            continue
+        
+        existing_entry = staged[entry_id] if entry_id in staged else vault.get_entry(entry_id)
+        if existing_entry is None:
+            results.append({"op": op, "id": entry_id, "error": "Entry not found"})
+        elif op == "update":
+            prepare_updated_entry(vault, existing_entry, entry, entry_id)
+            staged[entry_id] = entry
+            changes.append(("put", entry))
+            results.append({"op": op, "id": entry_id, "entry": list_entry(entry)})
+        else:
+            staged[entry_id] = None
+            changes.append(("delete", entry_id))
+            results.append({"op": op, "id": entry_id})
+    
+    if any("error" in result for result in results):
+        return jsonify({"success": False, "error": "Batch not applied", "results": results}), 400
     
-    # Save updated data
-    encrypted_data = encrypt_data(data, key)
-    save_user_passwords(username, encrypted_data)
+    try:
+        vault.write_batch(changes)
+        vault_cache.invalidate(username)
+    except Exception as e:
+        print(f"Error applying batch: {e}")
+        return jsonify({"error": "Could not save changes"}), 500
     
-    return jsonify({"success": True, "entry": updated_entry})
+    return jsonify({"success": True, "results": results})
 
-@app.route('/api/passwords/<int:entry_id>', methods=['DELETE'])
+@app.route('/api/passwords/<entry_id>', methods=['DELETE'])
 def delete_password(entry_id):
-    if 'username' not in session or 'key' not in session:
+    user_session = get_session_user()
+    if user_session is None:
         return jsonify({"error": "Unauthorized"}), 401
     
-    username = session['username']
-    key = session['key'].encode()
+    username = user_session.username
     
-    # Load current entries
-    encrypted_data = load_user_passwords(username)
-    if not encrypted_data:
-        return jsonify({"error": "No data found"}), 404
-    
-    data = decrypt_data(encrypted_data, key)
-    if not data:
+    try:
+        vault = get_user_vault(user_session)
+    except Exception as e:
+        print(f"Error opening vault: {e}")
         return jsonify({"error": "Could not decrypt data"}), 500
     
-    entries = data.get("entries", [])
-    
     # Ensure entry_id is valid
-    if entry_id < 0 or entry_id >= len(entries):
+    deleted_entry = vault.get_entry(entry_id, include_secrets=False)
+    if not deleted_entry:
         return jsonify({"error": "Entry not found"}), 404
     
     # Delete entry
-    deleted_entry = entries.pop(entry_id)
+    vault.delete_entry(entry_id)
+    vault_cache.invalidate(username)
     
-    # Save updated data
-    encrypted_data = encrypt_data(data, key)
-    save_user_passwords(username, encrypted_data)
-    
-    return jsonify({"success": True, "deleted": deleted_entry})
+    return jsonify({"success": True, "deleted": list_entry(deleted_entry)})
 
-@app.route('/api/passwords/decrypt/<int:entry_id>', methods=['GET'])
+@app.route('/api/passwords/decrypt/<entry_id>', methods=['GET'])
 def decrypt_password_api(entry_id):
-    if 'username' not in session or 'key' not in session:
+    user_session = get_session_user()
+    if user_session is None:
         return jsonify({"error": "Unauthorized"}), 401
     
-    username = session['username']
-    key = session['key'].encode()
-    
-    # Load current entries
-    encrypted_data = load_user_passwords(username)
-    if not encrypted_data:
-        return jsonify({"error": "No data found"}), 404
-    
-    data = decrypt_data(encrypted_data, key)
-    if not data:
+    try:
+        vault = get_user_vault(user_session)
+    except Exception as e:
+        print(f"Error opening vault: {e}")
         return jsonify({"error": "Could not decrypt data"}), 500
     
-    entries = data.get("entries", [])
-    
     # Ensure entry_id is valid
-    if entry_id < 0 or entry_id >= len(entries):
+    entry = get_vault_entry(vault, entry_id)
+    if not entry:
+        if isinstance(entry_id, str) and vault.get_entry(entry_id, include_secrets=False) is not None:
+            # The entry exists but its secrets can't be decrypted
+            return jsonify({"error": "Could not decrypt data"}), 500
         return jsonify({"error": "Entry not found"}), 404
     
-    entry = entries[entry_id]
-    
-    # Decrypt password if encrypted
-    if "password" in entry and entry.get("encrypted", False):
-        decrypted_password = decrypt_password(entry["password"], key)
-        if decrypted_password:
-            return jsonify({"success": True, "password": decrypted_password})
+    # Decrypt password if encrypted; the notes are returned even if it can't be
+    password = entry.get("password", "")
+    result = {"success": True, "password": password, "notes": entry.get("notes", "")}
+    if password and entry.get("encrypted", False):
+        result["password"] = vault.crypto_manager.decrypt_password(password)
+        if result["password"] is None:
+            result["password_error"] = "Could not decrypt password"
     
-    return jsonify({"error": "Could not decrypt password"}), 500
+    return jsonify(result)
 
 @app.route('/api/share', methods=['POST'])
 def share_password():
-    if 'username' not in session:
+    user_session = get_session_user()
+    if user_session is None:
         return jsonify({"error": "Unauthorized"}), 401
     
-    username = session['username']
-    key = session['key'].encode()
+    username = user_session.username
     
     # Get request data
     data = request.json
@@ -584,26 +904,20 @@ def share_password():
     expiration_hours = data.get('expiration_hours', 24)
     access_count = data.get('access_count', 1)
     
-    # Load current entries
-    encrypted_data = load_user_passwords(username)
-    if not encrypted_data:
-        return jsonify({"error": "No data found"}), 404
-    
-    decrypted_data = decrypt_data(encrypted_data, key)
-    if not decrypted_data:
+    try:
+        vault = get_user_vault(user_session)
+    except Exception as e:
+        print(f"Error opening vault: {e}")
         return jsonify({"error": "Could not decrypt data"}), 500
     
-    entries = decrypted_data.get("entries", [])
-    
     # Ensure entry_id is valid
-    if entry_id < 0 or entry_id >= len(entries):
+    entry = get_vault_entry(vault, entry_id)
+    if not entry:
         return jsonify({"error": "Entry not found"}), 404
     
-    entry = entries[entry_id]
-    
     # Decrypt password if encrypted
     if "password" in entry and entry.get("encrypted", False):
-        entry["password"] = decrypt_password(entry["password"], key)
+        entry["password"] = vault.crypto_manager.decrypt_password(entry["password"])
     
     # Create share
     share_id, access_key = create_shared_item(entry, username, expiration_hours, access_count)
@@ -618,12 +932,88 @@ def share_password():
         "share_url": share_url
     })
 
+@app.route('/api/export', methods=['POST'])
+def export_passwords():
+    user_session = get_session_user()
+    if user_session is None:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    passphrase = (request.json or {}).get('passphrase', '')
+    
+    if len(passphrase) < 8:
+        return jsonify({"error": "Passphrase must be at least 8 characters long"}), 400
+    
+    try:
+        vault = get_user_vault(user_session)
+    except Exception as e:
+        print(f"Error opening vault: {e}")
+        return jsonify({"error": "Could not decrypt data"}), 500
+    
+    # The first piece is produced now, so the passphrase key is derived (and
+    # a busy KDF service reported) before the response starts streaming
+    pieces = iter_export(vault, passphrase, kdf_registry.load_policy(KDF_POLICY_FILE), derive=kdf_service.derive)
+    first_piece = next(pieces)
+    
+    def generate():
+        yield first_piece
+        yield from pieces
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/octet-stream',
+        headers={"Content-Disposition": "attachment; filename=securepass-backup.spx"}
+    )
+
+@app.route('/api/import', methods=['POST'])
+def import_passwords():
+    user_session = get_session_user()
+    if user_session is None:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    username = user_session.username
+    upload = request.files.get('file')
+    
+    if upload is None:
+        return jsonify({"error": "No file uploaded"}), 400
+    
+    try:
+        vault = get_user_vault(user_session)
+    except Exception as e:
+        print(f"Error opening vault: {e}")
+        return jsonify({"error": "Could not decrypt data"}), 500
+    
+    # The upload is parsed as it is read and the new entries written at once;
+    # a SecurePass export is restored with its passphrase
+    passphrase = request.form.get('passphrase', '')
+    try:
+        report = import_entries(vault, iter_import(upload.stream, passphrase, derive=kdf_service.derive))
+        vault_cache.invalidate(username)
+    except KDFBusyError:
+        # Answered with a 503 by the error handler
+        raise
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error importing passwords: {e}")
+        return jsonify({"error": "Could not import passwords"}), 500
+    
+    return jsonify({"success": True, "report": report})
+
 @app.route('/api/shares', methods=['GET'])
 def get_shares():
-    if 'username' not in session:
+    user_session = get_session_user()
+    if user_session is None:
         return jsonify({"error": "Unauthorized"}), 401
     
-    username = session['username']
+    username = user_session.username
+    
+    # The response only depends on the stored shares and which of them have
+    # expired; the remaining time is counted down by the page
+    now = time.time()
+    etag = make_etag(username, "shares", [get_share_version(username), count_expired_shares(username, now)])
+    response = not_modified(etag)
+    if response is not None:
+        return response
     
     # Get shares for user
     shares = get_user_shares(username)
@@ -636,29 +1026,17 @@ def get_shares():
         
         share["created_at_formatted"] = created_at.strftime("%Y-%m-%d %H:%M")
         share["expires_at_formatted"] = expires_at.strftime("%Y-%m-%d %H:%M")
-        
-        # Calculate remaining time
-        now = time.time()
-        remaining_seconds = max(0, share["expires_at"] - now)
-        remaining_hours = remaining_seconds / 3600
-        
-        if remaining_hours < 1:
-            share["remaining_text"] = f"{int(remaining_seconds / 60)} minutes remaining"
-        elif remaining_hours < 24:
-            share["remaining_text"] = f"{int(remaining_hours)} hours remaining"
-        elif remaining_hours < 48:
-            share["remaining_text"] = "1 day remaining"
-        else:
-            share["remaining_text"] = f"{int(remaining_hours / 24)} days remaining"
+        share["expired"] = share["expires_at"] <= now
     
-    return jsonify({"shares": shares})
+    return with_etag(jsonify({"shares": shares}), etag)
 
 @app.route('/api/shares/<share_id>', methods=['DELETE'])
 def revoke_share(share_id):
-    if 'username' not in session:
+    user_session = get_session_user()
+    if user_session is None:
         return jsonify({"error": "Unauthorized"}), 401
     
-    username = session['username']
+    username = user_session.username
     
     # Invalidate share
     success = invalidate_shared_item(share_id, username)
@@ -668,6 +1046,32 @@ def revoke_share(share_id):
     else:
         return jsonify({"error": "Could not revoke share"}), 500
 
+@app.errorhandler(KDFBusyError)
+def handle_kdf_busy(error):
+    headers = {"Retry-After": str(error.retry_after)}
+    if request.path.startswith('/api/'):
+        return jsonify({"error": "Server is busy, please try again shortly"}), 503, headers
+    
+    flash('Server is busy, please try again in a few seconds', 'error')
+    template = 'register.html' if request.endpoint == 'register' else 'login.html'
+    return render_template(template), 503, headers
+
+@app.route('/api/kdf/stats', methods=['GET'])
+def get_kdf_stats():
+    user_session = get_session_user()
+    if user_session is None:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    return jsonify(kdf_service.stats())
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    user_session = get_session_user()
+    if user_session is None:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    return jsonify(vault_cache.stats())
+
 @app.route('/shared/<share_id>', methods=['GET'])
 def access_share(share_id):
     return render_template('shared.html', share_id=share_id)
@@ -689,39 +1093,76 @@ def access_shared_password(share_id):
 
 @app.route('/logout')
 def logout():
-    session.pop('username', None)
-    session.pop('key', None)
+    user_session = get_session_user()
+    if user_session is not None:
+        session_store.revoke(user_session.session_id)
+        close_user_vault(user_session.username)
+    session.clear()
     return redirect(url_for('login'))
 
 @app.route('/generator')
 def generator():
-    if 'username' not in session:
+    if get_session_user() is None:
         return redirect(url_for('login'))
     
     return render_template('generator.html')
 
+@app.route('/api/master-password', methods=['POST'])
+def change_master_password():
+    user_session = get_session_user()
+    if user_session is None:
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    data = request.json or {}
+    current_password = data.get('current_password', '')
+    new_password = data.get('new_password', '')
+    username = user_session.username
+    
+    if len(new_password) < 8:
+        return jsonify({"error": "Password must be at least 8 characters long"}), 400
+    
+    user_data = get_user(username)
+    data_key = unlock_user_key(username, user_data, current_password) if user_data else None
+    if data_key is None:
+        return jsonify({"error": "Current password is incorrect"}), 403
+    
+    # The vault keeps its data key; only the wrapped copy in the user record changes
+    wrap_user_key(user_data, new_password, data_key)
+    save_user(username, user_data)
+    
+    # Sessions opened with the old password end; this one stays
+    session_store.revoke_user(username, keep=user_session.session_id)
+    
+    return jsonify({"success": True})
+
 @app.route('/api/settings', methods=['POST'])
 def save_settings():
-    if 'username' not in session:
+    user_session = get_session_user()
+    if user_session is None:
         return jsonify({"error": "Unauthorized"}), 401
     
     settings = request.json
-    username = session['username']
+    username = user_session.username
+    
+    if settings.get('vault_compression', 'zlib') not in COMPRESSION_METHODS:
+        return jsonify({"error": "Unknown compression method"}), 400
     
     try:
         # Load master config
-        config = load_users()[username]
+        config = get_user(username)
         
         # Update settings
         if 'app_settings' not in config:
             config['app_settings'] = {}
             
         config['app_settings'].update(settings)
+        config['settings_version'] = config.get('settings_version', 0) + 1
         
         # Save updated config
-        users = load_users()
-        users[username] = config
-        save_users(users)
+        save_user(username, config)
+        
+        # Reopen the vault so a changed compression setting takes effect
+        close_user_vault(username)
         
         return jsonify({"success": True})
     except Exception as e:
@@ -730,14 +1171,20 @@ def save_settings():
 
 @app.route('/api/settings', methods=['GET'])
 def get_settings():
-    if 'username' not in session:
+    user_session = get_session_user()
+    if user_session is None:
         return jsonify({"error": "Unauthorized"}), 401
     
-    username = session['username']
+    username = user_session.username
     
     try:
         # Load master config
-        config = load_users()[username]
+        config = get_user(username)
+        
+        etag = make_etag(username, "settings", config.get('settings_version', 0))
+        response = not_modified(etag)
+        if response is not None:
+            return response
         
         # Get settings
         settings = config.get('app_settings', {})
@@ -749,14 +1196,17 @@ def get_settings():
             settings['clipboard_timeout'] = '30'
         if 'auto_logout' not in settings:
             settings['auto_logout'] = '0'
+        if 'vault_compression' not in settings:
+            settings['vault_compression'] = 'zlib'
             
-        return jsonify(settings)
+        return with_etag(jsonify(settings), etag)
     except Exception as e:
         print(f"Error getting settings: {e}")
         return jsonify({
             "theme_mode": "system",
             "clipboard_timeout": "30",
-            "auto_logout": "0"
+            "auto_logout": "0",
+            "vault_compression": "zlib"
         })
 
 @app.route('/api/generate-password', methods=['POST'])
@@ -873,10 +1323,59 @@ def generate_password_api():
 
 @app.route('/shared')
 def shared():
-    if 'username' not in session:
+    if get_session_user() is None:
         return redirect(url_for('login'))
     
     return render_template('shared_passwords.html')
 
+@app.cli.command('import-files')
+def import_files_command():
+    """Import users, vaults and shares from the flat files into the SQLite database."""
+    if db is None:
+        print("Set SECUREPASS_DATABASE to the database path first.")
+        return
+    
+    users = load_users()
+    for username, user_data in users.items():
+        db.save_user(username, user_data)
+        
+        data_path = get_user_data_path(username)
+        if os.path.exists(data_path):
+            # Records are copied still encrypted; old single-blob vaults are
+            # split into records the next time their owner logs in
+            records, legacy_blob = VaultStore.read_raw(data_path)
+            db.import_raw_vault(username, records, legacy_blob)
+    
+    share_count = 0
+    for filename in os.listdir(SHARED_DIR):
+        if filename.endswith(".json"):
+            with open(os.path.join(SHARED_DIR, filename), 'r') as f:
+                db.save_share(filename[:-5], json.load(f))
+            share_count += 1
+    
+    print(f"Imported {len(users)} users and {share_count} shares into {DATABASE_PATH}")
+
+@app.cli.command('purge-expired-shares')
+def purge_expired_shares_command():
+    """Delete expired shares from the SQLite database."""
+    if db is None:
+        print("Set SECUREPASS_DATABASE to the database path first.")
+        return
+    
+    count = db.delete_expired_shares(time.time())
+    print(f"Deleted {count} expired shares")
+
+@app.cli.command('calibrate-kdf')
+@click.option('--kdf', 'name', default=kdf_registry.DEFAULT_CALIBRATION_KDF,
+              type=click.Choice(sorted(kdf_registry.KDF_FUNCTIONS)), help='Key derivation function')
+@click.option('--target-ms', default=int(kdf_registry.DEFAULT_TARGET_SECONDS * 1000),
+              help='Wanted time of one derivation in milliseconds')
+def calibrate_kdf_command(name, target_ms):
+    """Pick KDF parameters for this host; users are upgraded at their next login."""
+    params = kdf_registry.calibrate(name, target_ms / 1000)
+    seconds = kdf_registry.time_derivation(params)
+    kdf_registry.save_policy(KDF_POLICY_FILE, params)
+    print(f"Saved {params} ({seconds * 1000:.0f} ms per derivation) to {KDF_POLICY_FILE}")
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -1,9 +1,11 @@
 import os
+import hmac
 import hashlib
 import base64
 import json
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import threading
+import kdf_registry
+from crypto_manager import generate_data_key, wrap_data_key, unwrap_data_key
 from storage_manager import StorageManager
 
 class AuthManager:
@@ -12,54 +14,46 @@ class AuthManager:
     def __init__(self, storage_manager: StorageManager):
         self.storage_manager = storage_manager
         
-    def derive_key(self, password: str, salt: bytes = None):
+    def get_kdf_policy(self):
         """
-        Derive a cryptographic key from the master password.
+        Get the KDF parameters new keys are derived with.
+        
+        Until calibrate_kdf_policy has stored parameters for this machine,
+        the legacy ones are used; keys are re-derived with the calibrated
+        parameters at the next unlock.
         
-        Args:
-            password: The master password string
-            salt: Optional salt bytes, generated if not provided
-            
         Returns:
-            tuple: (key, salt) where key is the derived key and salt is the salt used
+            dict: KDF parameters
         """
-        if salt is None:
-            salt = os.urandom(16)
-            
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        return key, salt
-    
-    def hash_password(self, password: str, salt: bytes = None):
+        return kdf_registry.load_policy(self.storage_manager.kdf_policy_file)
+        
+    def calibrate_kdf_policy(self):
         """
-        Hash the master password for storage.
+        Calibrate the KDF parameters to the target unlock time on this
+        machine in a background thread, unless they are already stored.
         
-        Args:
-            password: The master password to hash
-            salt: Optional salt bytes, generated if not provided
-            
         Returns:
-            tuple: (hash_hex, salt_hex) where both are hex encoded strings
+            threading.Thread: The calibration thread, or None if there is nothing to calibrate
         """
-        if salt is None:
-            salt = os.urandom(16)
-            
-        # Combine password with salt and hash
-        salted_password = password.encode() + salt
-        hash_obj = hashlib.sha256(salted_password)
-        password_hash = hash_obj.hexdigest()
+        policy_file = self.storage_manager.kdf_policy_file
+        if os.path.exists(policy_file):
+            return None
+        
+        thread = threading.Thread(target=self._save_calibrated_policy, args=(policy_file,), daemon=True)
+        thread.start()
+        return thread
         
-        return password_hash, salt.hex()
+    def _save_calibrated_policy(self, policy_file: str):
+        """Time probe derivations and store the parameters they calibrate to."""
+        try:
+            kdf_registry.save_policy(policy_file, kdf_registry.calibrate())
+        except Exception as e:
+            print(f"Error calibrating KDF: {e}")
     
     def verify_password(self, entered_password: str, stored_hash: str, stored_salt: str):
         """
-        Verify an entered password against the stored hash.
+        Verify an entered password against a stored SHA-256 hash (configurations
+        written before the verifier was derived with the key).
         
         Args:
             entered_password: The password entered by user
@@ -84,56 +78,135 @@ class AuthManager:
         """
         Create a new master password.
         
+        The vault is encrypted with a random data key, stored wrapped by a
+        key derived from the master password.
+        
         Args:
             password: The master password to set
             
         Returns:
-            bool: True if successful, False otherwise
+            bytes: The vault's data key, or None if the configuration couldn't be saved
         """
-        # Hash password for storage
-        password_hash, salt_hex = self.hash_password(password)
+        data_key = generate_data_key()
+        master_config = {}
+        self._wrap_data_key(master_config, password, data_key)
         
-        # Derive encryption key
-        key, key_salt = self.derive_key(password)
-        
-        # Store master configuration
-        master_config = {
-            "password_hash": password_hash,
-            "password_salt": salt_hex,
-            "key_salt": key_salt.hex()
-        }
-        
-        return self.storage_manager.save_master_config(master_config)
+        if not self.storage_manager.save_master_config(master_config):
+            return None
+        return data_key
     
     def verify_master_password(self, password: str):
         """
-        Verify the master password.
+        Verify the master password and unlock the vault's data key.
+        
+        A single key derivation both verifies the password and unwraps the key.
         
         Args:
             password: The password to verify
             
         Returns:
-            tuple: (is_valid, key) where is_valid is a boolean and key is the derived key if valid
+            tuple: (is_valid, key) where is_valid is a boolean and key is the vault's data key if valid
         """
         try:
             # Load master configuration
             master_config = self.storage_manager.load_master_config()
             
-            # Verify the password
-            is_valid = self.verify_password(
-                password,
-                master_config["password_hash"],
-                master_config["password_salt"]
-            )
+            if "verifier" not in master_config:
+                return self._unlock_legacy(password, master_config)
             
-            if is_valid:
-                # Derive the key using stored salt
-                key_salt = bytes.fromhex(master_config["key_salt"])
-                key, _ = self.derive_key(password, key_salt)
-                return True, key
+            params = master_config["kdf"]
+            derived = kdf_registry.derive_key(password, bytes.fromhex(master_config["key_salt"]), params)
+            verifier, wrapping_key = kdf_registry.split_derived_key(derived)
+            if not hmac.compare_digest(verifier.hex(), master_config["verifier"]):
+                return False, None
             
-            return False, None
+            data_key = unwrap_data_key(wrapping_key, master_config["wrapped_key"])
+            
+            policy = self.get_kdf_policy()
+            if kdf_registry.is_outdated(params, policy):
+                self._wrap_data_key(master_config, password, data_key, policy)
+                # Unlocking works either way; a failed save is retried next time
+                self.storage_manager.save_master_config(master_config)
+            
+            return True, data_key
         
         except Exception as e:
             print(f"Error verifying master password: {e}")
             return False, None
+    
+    def change_master_password(self, current_password: str, new_password: str):
+        """
+        Change the master password.
+        
+        Only the wrapped data key is replaced; the vault itself is not rewritten.
+        
+        Args:
+            current_password: The current master password
+            new_password: The new master password
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        is_valid, data_key = self.verify_master_password(current_password)
+        if not is_valid:
+            return False
+        
+        try:
+            master_config = self.storage_manager.load_master_config()
+            self._wrap_data_key(master_config, new_password, data_key)
+            return self.storage_manager.save_master_config(master_config)
+        except Exception as e:
+            print(f"Error changing master password: {e}")
+            return False
+    
+    def _unlock_legacy(self, password: str, master_config: dict):
+        """
+        Unlock a configuration verified by a separate SHA-256 hash.
+        
+        The key derived from the password either wraps the data key or,
+        before data keys, is the data key itself. The configuration is
+        moved to the single-derivation format, reusing this derivation
+        unless the KDF parameters are outdated.
+        
+        Returns:
+            tuple: (is_valid, key) as verify_master_password
+        """
+        if not self.verify_password(password, master_config["password_hash"], master_config["password_salt"]):
+            return False, None
+        
+        key_salt = bytes.fromhex(master_config["key_salt"])
+        params = master_config.get("kdf", kdf_registry.LEGACY_PARAMS)
+        derived = kdf_registry.derive_key(password, key_salt, params)
+        legacy_key = base64.urlsafe_b64encode(derived)
+        if "wrapped_key" in master_config:
+            data_key = unwrap_data_key(legacy_key, master_config["wrapped_key"])
+        else:
+            data_key = legacy_key
+        
+        policy = self.get_kdf_policy()
+        if kdf_registry.is_outdated(params, policy):
+            self._wrap_data_key(master_config, password, data_key, policy)
+        else:
+            self._store_wrapped_key(master_config, derived, key_salt, params, data_key)
+        
+        # Unlocking works either way; a failed save is retried next time
+        self.storage_manager.save_master_config(master_config)
+        return True, data_key
+    
+    def _wrap_data_key(self, master_config: dict, password: str, data_key: bytes, policy: dict = None):
+        """Wrap the data key with a fresh derivation of the password, in master_config."""
+        params = policy or self.get_kdf_policy()
+        key_salt = os.urandom(16)
+        derived = kdf_registry.derive_key(password, key_salt, params)
+        self._store_wrapped_key(master_config, derived, key_salt, params, data_key)
+    
+    def _store_wrapped_key(self, master_config: dict, derived: bytes, key_salt: bytes, params: dict, data_key: bytes):
+        """Store the verifier and wrapped data key split from one derivation in master_config."""
+        verifier, wrapping_key = kdf_registry.split_derived_key(derived)
+        master_config["key_salt"] = key_salt.hex()
+        master_config["kdf"] = params
+        master_config["verifier"] = verifier.hex()
+        master_config["wrapped_key"] = wrap_data_key(wrapping_key, data_key)
+        # The SHA-256 verifier is replaced by the derived one
+        master_config.pop("password_hash", None)
+        master_config.pop("password_salt", None)
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import hashlib
+from datetime import datetime
+from durable_io import atomic_write, atomic_write_json, group_committer
+
+def _build_gear_table():
+    """Fixed pseudo-random table for the gear rolling hash (must never change)."""
+    table = []
+    for i in range(256):
+        digest = hashlib.sha256(b"securepass-gear-" + bytes([i])).digest()
+        table.append(int.from_bytes(digest[:4], "big"))
+    return table
+
+GEAR_TABLE = _build_gear_table()
+
+class BackupManager:
+    """
+    Incremental, content-addressed backups of the vault files.
+
+    Files are split into variable-size chunks with content-defined
+    chunking (gear rolling hash), so an edit only changes the chunks
+    around it. Each unique chunk is stored once under its SHA-256 in
+    chunks/, and every snapshot is a small JSON manifest in snapshots/
+    listing the chunks of each backed up file.
+    """
+
+    MIN_CHUNK_SIZE = 2 * 1024
+    AVG_CHUNK_SIZE = 8 * 1024
+    MAX_CHUNK_SIZE = 64 * 1024
+
+    # Default retention: newest snapshot of each of the last N hours/days/weeks
+    DEFAULT_RETENTION = {"hourly": 24, "daily": 7, "weekly": 8}
+
+    def __init__(self, backup_dir):
+        """
+        Initialize the backup manager.
+
+        Args:
+            backup_dir: Directory holding the chunk store and manifests
+        """
+        self.backup_dir = backup_dir
+        self.chunks_dir = os.path.join(backup_dir, "chunks")
+        self.snapshots_dir = os.path.join(backup_dir, "snapshots")
+        # Test the top bits of the hash; they depend on the most preceding bytes
+        cut_bits = self.AVG_CHUNK_SIZE.bit_length() - 1
+        self._cut_mask = ((1 << cut_bits) - 1) << (32 - cut_bits)
+
+        for directory in (self.chunks_dir, self.snapshots_dir):
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+
+    def create_snapshot(self, files):
+        """
+        Back up a set of files.
+
+        Args:
+            files: Dictionary mapping a name to the path of the file to back up;
+                   missing files are skipped
+
+        Returns:
+            dict: The snapshot manifest, or None if none of the files exist
+        """
+        created_at = time.time()
+        manifest = {
+            "id": datetime.fromtimestamp(created_at).strftime("%Y%m%d_%H%M%S_%f"),
+            "created_at": created_at,
+            "files": {}
+        }
+
+        new_chunk_paths = set()
+        for name, path in files.items():
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            chunk_ids = []
+            for start, end in self.chunk_boundaries(data):
+                chunk = data[start:end]
+                chunk_id = hashlib.sha256(chunk).hexdigest()
+                if self._store_chunk(chunk_id, chunk):
+                    new_chunk_paths.add(self._chunk_path(chunk_id))
+                chunk_ids.append(chunk_id)
+
+            manifest["files"][name] = {
+                "path": path,
+                "size": len(data),
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "chunks": chunk_ids
+            }
+
+        if not manifest["files"]:
+            return None
+
+        # New chunks must be on disk before a manifest refers to them
+        if new_chunk_paths:
+            chunk_dirs = {os.path.dirname(path) for path in new_chunk_paths}
+            group_committer.sync(*new_chunk_paths, *chunk_dirs, self.chunks_dir)
+        atomic_write_json(self._manifest_path(manifest["id"]), manifest)
+        return manifest
+
+    def list_snapshots(self):
+        """
+        Get all snapshot manifests.
+
+        Returns:
+            list: Manifests, newest first
+        """
+        snapshots = []
+        for filename in os.listdir(self.snapshots_dir):
+            if filename.endswith(".json"):
+                manifest = self.load_snapshot(filename[:-5])
+                if manifest:
+                    snapshots.append(manifest)
+        snapshots.sort(key=lambda manifest: manifest["created_at"], reverse=True)
+        return snapshots
+
+    def load_snapshot(self, snapshot_id):
+        """
+        Load a snapshot manifest.
+
+        Returns:
+            dict: The manifest or None if it doesn't exist
+        """
+        try:
+            with open(self._manifest_path(snapshot_id), 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading backup snapshot: {e}")
+            return None
+
+    def restore_snapshot(self, snapshot_id, target_dir=None):
+        """
+        Restore the files of a snapshot.
+
+        Every file is reassembled from its chunks and verified before
+        anything is overwritten.
+
+        Args:
+            snapshot_id: Id of the snapshot to restore
+            target_dir: Directory to restore into; defaults to the original paths
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        manifest = self.load_snapshot(snapshot_id)
+        if not manifest:
+            return False
+
+        try:
+            restored = []
+            for name, file_info in manifest["files"].items():
+                data = b"".join(self._load_chunk(chunk_id) for chunk_id in file_info["chunks"])
+                if hashlib.sha256(data).hexdigest() != file_info["sha256"]:
+                    raise ValueError(f"Backup of {name} is corrupted")
+                target = os.path.join(target_dir, name) if target_dir else file_info["path"]
+                restored.append((target, data))
+
+            for target, data in restored:
+                atomic_write(target, data)
+            return True
+        except Exception as e:
+            print(f"Error restoring backup: {e}")
+            return False
+
+    def apply_retention(self, policy=None, now=None):
+        """
+        Delete snapshots not kept by the retention policy, then unreferenced chunks.
+
+        For each period type the newest snapshot of each of the last N
+        periods is kept; the newest snapshot overall is always kept.
+
+        Args:
+            policy: Dictionary with "hourly", "daily" and "weekly" counts
+            now: Current time (for testing)
+
+        Returns:
+            int: Number of deleted snapshots
+        """
+        policy = policy or self.DEFAULT_RETENTION
+        now = now if now is not None else time.time()
+        snapshots = self.list_snapshots()
+
+        bucket_formats = {
+            "hourly": ("%Y%m%d%H", 3600),
+            "daily": ("%Y%m%d", 86400),
+            "weekly": ("%G%V", 7 * 86400),
+        }
+
+        keep = set()
+        if snapshots:
+            keep.add(snapshots[0]["id"])
+        for period, (bucket_format, period_seconds) in bucket_formats.items():
+            count = policy.get(period, 0)
+            seen_buckets = set()
+            for manifest in snapshots:
+                if len(seen_buckets) >= count or manifest["created_at"] < now - count * period_seconds:
+                    break
+                bucket = datetime.fromtimestamp(manifest["created_at"]).strftime(bucket_format)
+                if bucket not in seen_buckets:
+                    seen_buckets.add(bucket)
+                    keep.add(manifest["id"])
+
+        deleted = 0
+        for manifest in snapshots:
+            if manifest["id"] not in keep:
+                os.remove(self._manifest_path(manifest["id"]))
+                deleted += 1
+
+        if deleted:
+            self.collect_garbage()
+        return deleted
+
+    def collect_garbage(self):
+        """
+        Delete chunks no snapshot refers to.
+
+        Returns:
+            int: Number of deleted chunks
+        """
+        referenced = set()
+        for manifest in self.list_snapshots():
+            for file_info in manifest["files"].values():
+                referenced.update(file_info["chunks"])
+
+        deleted = 0
+        for prefix in os.listdir(self.chunks_dir):
+            prefix_dir = os.path.join(self.chunks_dir, prefix)
+            for chunk_id in os.listdir(prefix_dir):
+                if chunk_id not in referenced:
+                    os.remove(os.path.join(prefix_dir, chunk_id))
+                    deleted += 1
+        return deleted
+
+    def chunk_boundaries(self, data):
+        """
+        Split data into content-defined chunks.
+
+        A chunk ends where the gear hash of the preceding bytes has its low
+        bits all zero, so boundaries move with the content instead of with
+        offsets, and inserting bytes only changes the chunks around them.
+
+        Args:
+            data: Bytes to split
+
+        Yields:
+            tuple: (start, end) offsets of each chunk
+        """
+        gear = GEAR_TABLE
+        mask = self._cut_mask
+        length = len(data)
+        start = 0
+        while start < length:
+            end = min(start + self.MAX_CHUNK_SIZE, length)
+            cut = end
+            hash_value = 0
+            # Bytes below the minimum chunk size never end a chunk; skip hashing them
+            for position in range(start + self.MIN_CHUNK_SIZE, end):
+                hash_value = ((hash_value << 1) + gear[data[position]]) & 0xFFFFFFFF
+                if not hash_value & mask:
+                    cut = position + 1
+                    break
+            yield start, cut
+            start = cut
+
+    def _manifest_path(self, snapshot_id):
+        return os.path.join(self.snapshots_dir, f"{snapshot_id}.json")
+
+    def _chunk_path(self, chunk_id):
+        return os.path.join(self.chunks_dir, chunk_id[:2], chunk_id)
+
+    def _store_chunk(self, chunk_id, chunk):
+        """
+        Store a chunk unless an identical one is already stored.
+
+        The chunk is not synced to disk; the caller syncs all new chunks at once.
+
+        Returns:
+            bool: True if the chunk was new
+        """
+        path = self._chunk_path(chunk_id)
+        if os.path.exists(path):
+            return False
+        prefix_dir = os.path.dirname(path)
+        if not os.path.exists(prefix_dir):
+            os.makedirs(prefix_dir)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(chunk)
+        os.replace(temp_path, path)
+        return True
+
+    def _load_chunk(self, chunk_id):
+        with open(self._chunk_path(chunk_id), 'rb') as f:
+            chunk = f.read()
+        if hashlib.sha256(chunk).hexdigest() != chunk_id:
+            raise ValueError(f"Backup chunk {chunk_id} is corrupted")
+        return chunk
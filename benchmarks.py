@@ -0,0 +1,176 @@
+"""
+Micro-benchmarks for the storage and crypto layers.
+
+Usage:
+    python benchmarks.py [name ...]
+
+Runs all benchmarks when no name is given.
+"""
+import os
+import sys
+import base64
+import time
+import tempfile
+import random
+import string
+from cryptography.fernet import Fernet
+from crypto_manager import CryptoManager, SERIALIZATION_FORMATS
+from compression import COMPRESSION_METHODS, METHOD_NONE, METHOD_ZLIB
+from vault_store import VaultStore
+import kdf_registry
+
+VAULT_SIZES = [100, 1000, 10000]
+KDF_TARGETS_MS = [100, 250, 500, 1000]
+FIELD_COUNT = 10000
+BATCH_FIELD_COUNT = 100000
+
+def make_entries(count, crypto_manager, seed=1):
+    """Build a vault of realistic-looking entries with encrypted passwords."""
+    rng = random.Random(seed)
+    categories = ["Personal", "Work", "Finance", "Shopping", "Social", ""]
+    entries = []
+    for i in range(count):
+        site = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12)))
+        password = "".join(rng.choices(string.ascii_letters + string.digits, k=16))
+        entries.append({
+            "title": site.capitalize(),
+            "website": f"https://www.{site}.com",
+            "username": f"user{i}@example.com",
+            "password": crypto_manager.encrypt_password(password),
+            "encrypted": True,
+            "category": rng.choice(categories),
+            "notes": "" if rng.random() < 0.7 else "Security question: first pet",
+            "created_at": 1700000000.0 + i,
+            "modified_at": 1700000000.0 + i
+        })
+    return entries
+
+def timed(function, repeat=3):
+    """Best wall time of a few runs, in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def bench_compression():
+    """Encrypted size and time of whole vaults and per-entry records per compression method."""
+    key = Fernet.generate_key()
+    print("Compression before encryption")
+    print(f"{'entries':>8} {'layout':>8} {'method':>6} {'bytes':>12} {'encrypt ms':>11} {'decrypt ms':>11}")
+    for size in VAULT_SIZES:
+        entries = make_entries(size, CryptoManager(key))
+        for method in COMPRESSION_METHODS:
+            crypto_manager = CryptoManager(key, compression=method)
+
+            # Whole vault as one blob
+            vault = {"entries": entries, "version": 1}
+            encrypt_ms, blob = timed(lambda: crypto_manager.encrypt_data(vault))
+            decrypt_ms, _ = timed(lambda: crypto_manager.decrypt_data(blob))
+            print(f"{size:>8} {'blob':>8} {method:>6} {len(blob):>12} {encrypt_ms:>11.1f} {decrypt_ms:>11.1f}")
+
+            # One record per entry, as stored by VaultStore
+            encrypt_ms, records = timed(lambda: [crypto_manager.encrypt_data(entry) for entry in entries])
+            decrypt_ms, _ = timed(lambda: [crypto_manager.decrypt_data(record) for record in records])
+            total = sum(len(record) for record in records)
+            print(f"{size:>8} {'records':>8} {method:>6} {total:>12} {encrypt_ms:>11.1f} {decrypt_ms:>11.1f}")
+    print()
+
+def bench_serialization():
+    """Encrypted size and time of per-entry records per serialization format."""
+    key = Fernet.generate_key()
+    print("Record serialization")
+    print(f"{'entries':>8} {'format':>6} {'method':>6} {'bytes':>12} {'encrypt ms':>11} {'decrypt ms':>11} {'no secrets ms':>14}")
+    for size in VAULT_SIZES:
+        entries = make_entries(size, CryptoManager(key))
+        for serialization in SERIALIZATION_FORMATS:
+            for method in (METHOD_NONE, METHOD_ZLIB):
+                crypto_manager = CryptoManager(key, compression=method, serialization=serialization)
+                encrypt_ms, records = timed(lambda: [crypto_manager.encrypt_data(entry) for entry in entries])
+                decrypt_ms, _ = timed(lambda: [crypto_manager.decrypt_data(record) for record in records])
+                skip_ms, _ = timed(lambda: [crypto_manager.decrypt_data(record, skip_fields=("password", "notes"))
+                                            for record in records])
+                total = sum(len(record) for record in records)
+                print(f"{size:>8} {serialization:>6} {method:>6} {total:>12} {encrypt_ms:>11.1f} {decrypt_ms:>11.1f} {skip_ms:>14.1f}")
+    print()
+
+def bench_vault_open():
+    """Time to open a vault file and read one entry, vs. listing every entry."""
+    crypto_manager = CryptoManager(Fernet.generate_key())
+    print("Vault open")
+    print(f"{'entries':>8} {'file bytes':>12} {'open ms':>8} {'1 entry ms':>11} {'list ms':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in VAULT_SIZES:
+            path = os.path.join(directory, f"vault-{size}.dat")
+            vault = VaultStore(path, crypto_manager)
+            # One bulk append instead of a synced write per entry
+            with vault._lock, vault._locked_file() as f:
+                vault._append(f, [(VaultStore.OP_PUT, VaultStore.new_entry_id(), crypto_manager.encrypt_entry(entry))
+                                  for entry in make_entries(size, crypto_manager)])
+            vault.compact()
+
+            open_ms, vault = timed(lambda: VaultStore(path, crypto_manager))
+            entry_id = vault.entry_ids()[size // 2]
+            entry_ms, _ = timed(lambda: vault.get_entry(entry_id))
+            list_ms, _ = timed(lambda: vault.load_entries(include_secrets=False), repeat=1)
+            print(f"{size:>8} {os.path.getsize(path):>12} {open_ms:>8.1f} {entry_ms:>11.2f} {list_ms:>9.1f}")
+    print()
+
+def bench_fields():
+    """Per-field throughput of the AES-GCM field format vs. the older Fernet tokens."""
+    crypto_manager = CryptoManager(Fernet.generate_key())
+    passwords = ["".join(random.choices(string.ascii_letters + string.digits, k=16)) for _ in range(FIELD_COUNT)]
+
+    def encrypt_fernet(password):
+        return base64.b64encode(crypto_manager.fernet.encrypt(password.encode())).decode()
+
+    print(f"Field encryption ({FIELD_COUNT} passwords)")
+    print(f"{'format':>8} {'bytes':>6} {'encrypt/s':>11} {'decrypt/s':>11}")
+    for name, encrypt in (("fernet", encrypt_fernet), ("aes-gcm", crypto_manager.encrypt_password)):
+        encrypt_ms, fields = timed(lambda: [encrypt(password) for password in passwords])
+        decrypt_ms, _ = timed(lambda: [crypto_manager.decrypt_password(field) for field in fields])
+        size = len(base64.b64decode(fields[0]))
+        print(f"{name:>8} {size:>6} {FIELD_COUNT / encrypt_ms * 1000:>11.0f} {FIELD_COUNT / decrypt_ms * 1000:>11.0f}")
+    print()
+
+def bench_batch():
+    """Throughput of encrypt_many/decrypt_many per number of threads."""
+    crypto_manager = CryptoManager(Fernet.generate_key())
+    passwords = ["".join(random.choices(string.ascii_letters + string.digits, k=16)) for _ in range(BATCH_FIELD_COUNT)]
+    thread_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+
+    print(f"Batch field encryption ({BATCH_FIELD_COUNT} passwords, {os.cpu_count()} CPUs)")
+    print(f"{'threads':>8} {'encrypt/s':>11} {'decrypt/s':>11}")
+    for workers in thread_counts:
+        encrypt_ms, fields = timed(lambda: crypto_manager.encrypt_many(passwords, workers), repeat=1)
+        decrypt_ms, _ = timed(lambda: crypto_manager.decrypt_many(fields, workers), repeat=1)
+        print(f"{workers:>8} {BATCH_FIELD_COUNT / encrypt_ms * 1000:>11.0f} {BATCH_FIELD_COUNT / decrypt_ms * 1000:>11.0f}")
+    print()
+
+def bench_kdf():
+    """Parameters each KDF calibrates to per target unlock time, and their measured time."""
+    print("KDF calibration")
+    print(f"{'kdf':>14} {'target ms':>10} {'measured ms':>12}  params")
+    for name in kdf_registry.KDF_FUNCTIONS:
+        for target_ms in KDF_TARGETS_MS:
+            params = kdf_registry.calibrate(name, target_ms / 1000)
+            measured_ms, _ = timed(lambda: kdf_registry.derive_key(b"benchmark", os.urandom(16), params))
+            settings = {key: value for key, value in params.items() if key != "name"}
+            print(f"{name:>14} {target_ms:>10} {measured_ms:>12.1f}  {settings}")
+    print()
+
+BENCHMARKS = {
+    "compression": bench_compression,
+    "serialization": bench_serialization,
+    "vault_open": bench_vault_open,
+    "fields": bench_fields,
+    "batch": bench_batch,
+    "kdf": bench_kdf,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,114 @@
+import zlib
+import lzma
+from record_codec import is_binary_record
+
+# Header of a compressed payload. Plain JSON payloads start with "{", so a
+# leading NUL byte tells them apart and old payloads stay readable.
+MAGIC = b"\x00SPZ"
+FORMAT_VERSION = 1
+
+METHOD_NONE = "none"
+METHOD_ZLIB = "zlib"
+METHOD_LZMA = "lzma"
+
+COMPRESSION_METHODS = (METHOD_NONE, METHOD_ZLIB, METHOD_LZMA)
+
+_METHOD_IDS = {METHOD_ZLIB: 1, METHOD_LZMA: 2}
+_METHOD_NAMES = {method_id: name for name, method_id in _METHOD_IDS.items()}
+
+# Id written for zlib payloads compressed with ZLIB_BINARY_DICTIONARY
+_ZLIB_BINARY_ID = 3
+
+# Preset dictionary for zlib. Vault records are small (one entry each), so
+# without it every record would pay again for the field names it repeats.
+# Existing payloads depend on it: never change it, add a new method instead.
+ZLIB_DICTIONARY = (
+    b'"encrypted": true, "encrypted": false, "password_hidden": true, '
+    b'"created_at": , "modified_at": , "category": "", "notes": "", '
+    b'"website": "https://www.", "username": "", "password": "Z0FBQUFB", '
+    b'"title": "", "id": "", "entries": [{"title": "", "version": 1}'
+)
+
+# Preset dictionary for zlib on binary records (see record_codec), which are
+# what entries are written as by default: the header, interned field tags,
+# timestamps and common website and username pieces, as encoded. Payloads
+# compressed with it have their own method id. Never change it either.
+ZLIB_BINARY_DICTIONARY = (
+    b'\x00SPB\x01\t-\x08\x01\x05\x00\x04\x05\x07http://\x02\x05\x00\x05\x05\x00\x07\x01\x08\x04A\xd9T\xfc@\x00\x00\x00\t'
+    b'\x04A\xd9T\xfc@\x00\x00\x00\n\x05\x00.com/.org/.net/login/account'
+    b'/@outlook.com@yahoo.com@hotmail.com\x00SPB\x01'
+    b'\tC\x08\x01\x05\x00\x04\x05\x08https://\x02\x05\n@gmail.com\x05\x05\x08Persona'
+    b'l\x07\x02\x08\x04A\xda\x13\xb8`\x00\x00\x00\t\x04A\xda\x13\xb8`\x00\x00\x00\n\x05\x03-4-\x00SPB\x01\t\x10\x04\x05\x05\x04'
+    b'Work\x0e\x05\x00\r\x02\x06\x05\x00\x00SPB\x01\t\x07\x02\x03\x05\x00\x06\x05\x00\x00SPB\x01\t2\x08\x01\x05\x00\x04\x05\x0c'
+    b'https://www.\x02\x05\x00\x05\x05\x00\x07\x02\x08\x04A\xda\x86)@\x00\x00\x00\t\x04A\xda\x86)@\x00\x00\x00'
+    b'\n\x05\x00'
+)
+
+def compress_payload(data, method=METHOD_ZLIB):
+    """
+    Compress a serialized payload before encryption.
+
+    The payload is returned unchanged if the method is "none" or if
+    compression wouldn't make it smaller.
+
+    zlib (with the preset dictionary matching the serialization) is the
+    right choice for per-entry records; lzma only pays off on large single
+    payloads.
+
+    Args:
+        data: Serialized payload bytes
+        method: "none", "zlib" or "lzma"
+
+    Returns:
+        bytes: Header + compressed data, or the original data
+    """
+    if not method or method == METHOD_NONE:
+        return data
+    if method not in _METHOD_IDS:
+        raise ValueError(f"Unknown compression method: {method}")
+
+    method_id = _METHOD_IDS[method]
+    if method == METHOD_ZLIB:
+        if is_binary_record(data):
+            method_id = _ZLIB_BINARY_ID
+            compressor = zlib.compressobj(level=6, zdict=ZLIB_BINARY_DICTIONARY)
+        else:
+            compressor = zlib.compressobj(level=6, zdict=ZLIB_DICTIONARY)
+        compressed = compressor.compress(data) + compressor.flush()
+    else:
+        compressed = lzma.compress(data, format=lzma.FORMAT_XZ, preset=6)
+
+    header = MAGIC + bytes([FORMAT_VERSION, method_id])
+    if len(header) + len(compressed) >= len(data):
+        return data
+    return header + compressed
+
+def decompress_payload(data):
+    """
+    Undo compress_payload; payloads without the header are returned as-is.
+
+    Args:
+        data: Decrypted payload bytes
+
+    Returns:
+        bytes: Serialized payload
+    """
+    if not data.startswith(MAGIC):
+        return data
+
+    header_size = len(MAGIC) + 2
+    version, method_id = data[len(MAGIC)], data[len(MAGIC) + 1]
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Unsupported compression format version {version}")
+
+    method = _METHOD_NAMES.get(method_id)
+    body = data[header_size:]
+    if method_id == _ZLIB_BINARY_ID:
+        decompressor = zlib.decompressobj(zdict=ZLIB_BINARY_DICTIONARY)
+        return decompressor.decompress(body) + decompressor.flush()
+    if method == METHOD_ZLIB:
+        decompressor = zlib.decompressobj(zdict=ZLIB_DICTIONARY)
+        return decompressor.decompress(body) + decompressor.flush()
+    if method == METHOD_LZMA:
+        return lzma.decompress(body, format=lzma.FORMAT_XZ)
+    raise ValueError(f"Unknown compression method id {method_id}")
@@ -1,18 +1,98 @@
+import os
 import base64
 import json
+import struct
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from compression import compress_payload, decompress_payload, COMPRESSION_METHODS, METHOD_ZLIB
+from record_codec import encode_record, decode_record, is_binary_record
+
+SERIALIZATION_JSON = "json"
+SERIALIZATION_BINARY = "binary"
+SERIALIZATION_FORMATS = (SERIALIZATION_JSON, SERIALIZATION_BINARY)
+
+def generate_data_key():
+    """
+    Generate a random data encryption key.
+    
+    Returns:
+        bytes: Base64 encoded key for CryptoManager
+    """
+    return Fernet.generate_key()
+
+def wrap_data_key(wrapping_key, data_key):
+    """
+    Encrypt a data encryption key with a key derived from a secret.
+    
+    Args:
+        wrapping_key: Base64 encoded key (e.g. derived from the master password)
+        data_key: Base64 encoded data encryption key
+        
+    Returns:
+        str: Wrapped key, a few hundred bytes whatever the size of the vault
+    """
+    return Fernet(wrapping_key).encrypt(data_key).decode()
+
+def unwrap_data_key(wrapping_key, wrapped_key):
+    """
+    Decrypt a data encryption key wrapped by wrap_data_key.
+    
+    Raises:
+        cryptography.fernet.InvalidToken: If the wrapping key is wrong
+    """
+    return Fernet(wrapping_key).decrypt(wrapped_key.encode())
 
 class CryptoManager:
     """Manages encryption and decryption of sensitive data."""
     
-    def __init__(self, key):
+    # Entry fields encrypted apart from the rest, so listing entries never decrypts them
+    SECRET_FIELDS = ("password", "notes")
+    
+    # Header of an entry payload holding separately encrypted metadata and
+    # secrets. Older payloads are a single Fernet token, which never starts
+    # with a NUL byte.
+    ENTRY_MAGIC = b"\x00SPE"
+    ENTRY_FORMAT_VERSION = 1
+    ENTRY_HEADER = struct.Struct(">4sBI")  # magic, version, metadata length
+    
+    # Encrypted fields (passwords) are version (1 byte) + nonce (12 bytes) +
+    # AES-GCM ciphertext and tag, base64 encoded. Older fields are base64
+    # encoded Fernet tokens, whose first byte is "g" (0x67), never a version.
+    FIELD_FORMAT_VERSION = 1
+    FIELD_NONCE_SIZE = 12
+    FIELD_KEY_INFO = b"securepass field key v1"
+    
+    # Fields per unit of work of encrypt_many/decrypt_many
+    BATCH_CHUNK_SIZE = 2048
+    
+    def __init__(self, key, compression=METHOD_ZLIB, serialization=SERIALIZATION_BINARY):
         """
         Initialize the crypto manager with a key.
         
         Args:
             key: Base64 encoded key for Fernet encryption
+            compression: Compression applied before encrypting data
+                         ("none", "zlib" or "lzma"); detected automatically on decrypt
+            serialization: Encoding of data before compression ("binary" or
+                           "json"); detected automatically on decrypt
         """
+        if compression not in COMPRESSION_METHODS:
+            raise ValueError(f"Unknown compression method: {compression}")
+        if serialization not in SERIALIZATION_FORMATS:
+            raise ValueError(f"Unknown serialization format: {serialization}")
         self.fernet = Fernet(key)
+        self.field_cipher = AESGCM(self._derive_field_key(key))
+        self.compression = compression
+        self.serialization = serialization
+    
+    @classmethod
+    def _derive_field_key(cls, key):
+        """Derive the AES-256-GCM key for fields from the Fernet key."""
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=cls.FIELD_KEY_INFO)
+        return hkdf.derive(base64.urlsafe_b64decode(key))
         
     def encrypt_data(self, data):
         """
@@ -24,32 +104,121 @@ class CryptoManager:
         Returns:
             bytes: Encrypted data
         """
-        # Convert dictionary to JSON string
-        json_data = json.dumps(data)
-        # Encrypt the data
-        encrypted_data = self.fernet.encrypt(json_data.encode())
+        # Serialize the dictionary
+        if self.serialization == SERIALIZATION_BINARY:
+            serialized = encode_record(data)
+        else:
+            serialized = json.dumps(data).encode()
+        # Compress, then encrypt the data
+        payload = compress_payload(serialized, self.compression)
+        encrypted_data = self.fernet.encrypt(payload)
         return encrypted_data
     
-    def decrypt_data(self, encrypted_data):
+    def decrypt_data(self, encrypted_data, skip_fields=None):
         """
         Decrypt data.
         
         Args:
             encrypted_data: Encrypted data bytes
+            skip_fields: Field names to leave out of the result; binary
+                         payloads skip them without decoding their values
             
         Returns:
             dict: Decrypted data as dictionary
         """
         try:
             # Decrypt the data
-            decrypted_data = self.fernet.decrypt(encrypted_data)
+            decrypted_data = decompress_payload(self.fernet.decrypt(encrypted_data))
+            if is_binary_record(decrypted_data):
+                return decode_record(decrypted_data, skip_fields)
             # Convert JSON string back to dictionary
             json_data = json.loads(decrypted_data.decode())
+            if skip_fields and isinstance(json_data, dict):
+                for field in skip_fields:
+                    json_data.pop(field, None)
             return json_data
         except Exception as e:
             print(f"Error decrypting data: {e}")
             return None
     
+    @classmethod
+    def split_entry(cls, entry):
+        """
+        Split an entry into its metadata and its secret fields.
+        
+        Args:
+            entry: Entry dictionary
+            
+        Returns:
+            tuple: (metadata dictionary, secrets dictionary)
+        """
+        metadata = {}
+        secrets = {}
+        for field, value in entry.items():
+            if field in cls.SECRET_FIELDS:
+                secrets[field] = value
+            else:
+                metadata[field] = value
+        return metadata, secrets
+    
+    def encrypt_entry(self, entry):
+        """
+        Encrypt a vault entry with its metadata and secrets in separate tokens.
+        
+        Args:
+            entry: Entry dictionary
+            
+        Returns:
+            bytes: Entry payload
+        """
+        metadata, secrets = self.split_entry(entry)
+        
+        # Fields still encrypted in the Fernet format are moved to the current one
+        if entry.get("encrypted") and secrets.get("password") and self.is_legacy_password(secrets["password"]):
+            password = self.decrypt_password(secrets["password"])
+            if password is not None:
+                secrets["password"] = self.encrypt_password(password)
+        
+        encrypted_metadata = self.encrypt_data(metadata)
+        encrypted_secrets = self.encrypt_data(secrets)
+        header = self.ENTRY_HEADER.pack(self.ENTRY_MAGIC, self.ENTRY_FORMAT_VERSION, len(encrypted_metadata))
+        return header + encrypted_metadata + encrypted_secrets
+    
+    def decrypt_entry(self, payload, include_secrets=True):
+        """
+        Decrypt a vault entry payload.
+        
+        Args:
+            payload: Payload written by encrypt_entry (or a single encrypted
+                     token, as written before entries were split)
+            include_secrets: If False, only the metadata is decrypted and
+                             the secret fields are left out
+            
+        Returns:
+            dict: The entry, or None if it could not be decrypted
+        """
+        if bytes(payload[:len(self.ENTRY_MAGIC)]) != self.ENTRY_MAGIC:
+            return self.decrypt_data(bytes(payload), None if include_secrets else self.SECRET_FIELDS)
+        
+        try:
+            _, version, metadata_length = self.ENTRY_HEADER.unpack_from(payload)
+            if version > self.ENTRY_FORMAT_VERSION:
+                raise ValueError(f"Unsupported entry format version {version}")
+        except Exception as e:
+            print(f"Error decrypting data: {e}")
+            return None
+        
+        start = self.ENTRY_HEADER.size
+        entry = self.decrypt_data(bytes(payload[start:start + metadata_length]))
+        if entry is None or not include_secrets:
+            return entry
+        
+        secrets = self.decrypt_data(bytes(payload[start + metadata_length:]))
+        if secrets is None:
+            return None
+        entry.update(secrets)
+        return entry
+    
     def encrypt_password(self, password):
         """
         Encrypt a single password string.
@@ -60,7 +229,9 @@ class CryptoManager:
         Returns:
             str: Base64 encoded encrypted password
         """
-        encrypted = self.fernet.encrypt(password.encode())
+        version = bytes([self.FIELD_FORMAT_VERSION])
+        nonce = os.urandom(self.FIELD_NONCE_SIZE)
+        encrypted = version + nonce + self.field_cipher.encrypt(nonce, password.encode(), version)
         return base64.b64encode(encrypted).decode()
     
     def decrypt_password(self, encrypted_password):
@@ -75,8 +246,74 @@ class CryptoManager:
         """
         try:
             encrypted = base64.b64decode(encrypted_password)
-            decrypted = self.fernet.decrypt(encrypted)
+            if encrypted[0] == self.FIELD_FORMAT_VERSION:
+                nonce_end = 1 + self.FIELD_NONCE_SIZE
+                decrypted = self.field_cipher.decrypt(encrypted[1:nonce_end], encrypted[nonce_end:], encrypted[:1])
+            else:
+                decrypted = self.fernet.decrypt(encrypted)
             return decrypted.decode()
         except Exception as e:
             print(f"Error decrypting password: {e}")
             return None
+    
+    def is_legacy_password(self, encrypted_password):
+        """Check if a password was encrypted in the older Fernet format."""
+        # The first 4 base64 characters hold the first 3 bytes
+        return base64.b64decode(encrypted_password[:4])[0] != self.FIELD_FORMAT_VERSION
+    
+    def encrypt_many(self, passwords, workers=None):
+        """
+        Encrypt many password strings.
+        
+        The strings are processed in chunks spread over a thread pool; the
+        cipher is shared and releases the GIL while it works.
+        
+        Args:
+            passwords: List of password strings
+            workers: Number of threads (defaults to the CPU count)
+            
+        Returns:
+            list: Base64 encoded encrypted passwords, in order
+        """
+        return self._map_chunks(self._encrypt_chunk, passwords, workers)
+    
+    def decrypt_many(self, encrypted_passwords, workers=None):
+        """
+        Decrypt many password strings (either field format).
+        
+        Args:
+            encrypted_passwords: List of base64 encoded encrypted passwords
+            workers: Number of threads (defaults to the CPU count)
+            
+        Returns:
+            list: Decrypted passwords in order, None for any that failed
+        """
+        return self._map_chunks(self._decrypt_chunk, encrypted_passwords, workers)
+    
+    def _map_chunks(self, function, items, workers):
+        """Apply a function taking a list to chunks of items, in parallel, and join the results."""
+        items = list(items)
+        chunks = [items[start:start + self.BATCH_CHUNK_SIZE]
+                  for start in range(0, len(items), self.BATCH_CHUNK_SIZE)]
+        workers = min(len(chunks), workers or os.cpu_count() or 1)
+        if workers <= 1:
+            return [result for chunk in chunks for result in function(chunk)]
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return [result for chunk_results in executor.map(function, chunks) for result in chunk_results]
+    
+    def _encrypt_chunk(self, passwords):
+        version = bytes([self.FIELD_FORMAT_VERSION])
+        # One read of the random source for the whole chunk
+        nonces = os.urandom(self.FIELD_NONCE_SIZE * len(passwords))
+        encrypt = self.field_cipher.encrypt
+        
+        results = []
+        for position, password in enumerate(passwords):
+            nonce = nonces[position * self.FIELD_NONCE_SIZE:(position + 1) * self.FIELD_NONCE_SIZE]
+            encrypted = version + nonce + encrypt(nonce, password.encode(), version)
+            results.append(base64.b64encode(encrypted).decode())
+        return results
+    
+    def _decrypt_chunk(self, encrypted_passwords):
+        return [self.decrypt_password(encrypted_password) for encrypted_password in encrypted_passwords]
@@ -0,0 +1,125 @@
+import json
+import base64
+from bisect import bisect_left, bisect_right
+
+# Fields entries can be sorted by; "-field" sorts in descending order
+TEXT_SORT_FIELDS = ("title", "website", "username", "category")
+TIME_SORT_FIELDS = ("created_at", "modified_at")
+DEFAULT_SORT = "title"
+
+# Fields matched by a search
+SEARCH_FIELDS = ("title", "username", "website", "category")
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def parse_sort(sort):
+    """
+    Check a sort parameter.
+
+    Args:
+        sort: Field name, prefixed with "-" for descending order
+
+    Returns:
+        tuple: (field, descending)
+
+    Raises:
+        ValueError: If the field can't be sorted by
+    """
+    sort = sort or DEFAULT_SORT
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    if field not in TEXT_SORT_FIELDS and field not in TIME_SORT_FIELDS:
+        raise ValueError(f"Cannot sort by {field}")
+    return field, descending
+
+def sort_key(entry, field):
+    """Sort key of an entry for a field: case-folded text or a timestamp, then the id."""
+    if field in TIME_SORT_FIELDS:
+        value = entry.get(field)
+        return (float(value) if isinstance(value, (int, float)) else 0.0, entry["id"])
+    value = entry.get(field)
+    return (value.casefold() if isinstance(value, str) else "", entry["id"])
+
+def build_order(entries, field):
+    """
+    Precompute the order of entries for a sort field.
+
+    Returns:
+        tuple: (sorted keys, entries in the same order)
+    """
+    keyed = sorted(((sort_key(entry, field), entry) for entry in entries), key=lambda item: item[0])
+    return [key for key, _ in keyed], [entry for _, entry in keyed]
+
+def encode_cursor(key):
+    """Make an opaque cursor from the sort key of the last entry of a page."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+def decode_cursor(cursor, field):
+    """
+    Read a cursor made by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or was made for another sort field
+    """
+    try:
+        value, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor") from None
+    expected = (int, float) if field in TIME_SORT_FIELDS else str
+    if not isinstance(value, expected) or isinstance(value, bool) or not isinstance(entry_id, str):
+        raise ValueError("Invalid cursor")
+    return (float(value) if field in TIME_SORT_FIELDS else value, entry_id)
+
+def matches(entry, category=None, query=None):
+    """Check an entry against a category and a case-insensitive search text."""
+    if category and entry.get("category") != category:
+        return False
+    if query:
+        query = query.casefold()
+        return any(isinstance(entry.get(field), str) and query in entry[field].casefold()
+                   for field in SEARCH_FIELDS)
+    return True
+
+def query_page(order, field, descending=False, cursor=None, limit=DEFAULT_PAGE_SIZE, category=None, query=None):
+    """
+    Get a page of entries from a precomputed order.
+
+    Pages are keyed by the sort key of their last entry rather than an
+    offset, so entries added or deleted between requests don't shift the
+    following pages.
+
+    Args:
+        order: (keys, entries) from build_order
+        field: Sort field the order was built for
+        descending: Walk the order backwards
+        cursor: Cursor returned with the previous page
+        limit: Maximum number of entries in the page
+        category: Only entries of this category
+        query: Only entries with this text in a searched field
+
+    Returns:
+        tuple: (entries, next cursor or None on the last page)
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    keys, entries = order
+    if descending:
+        start = bisect_left(keys, decode_cursor(cursor, field)) - 1 if cursor else len(keys) - 1
+        positions = range(start, -1, -1)
+    else:
+        start = bisect_right(keys, decode_cursor(cursor, field)) if cursor else 0
+        positions = range(start, len(keys))
+
+    page = []
+    last_key = None
+    for position in positions:
+        entry = entries[position]
+        if not matches(entry, category, query):
+            continue
+        if len(page) == limit:
+            return page, encode_cursor(last_key)
+        page.append(entry)
+        last_key = keys[position]
+    return page, None
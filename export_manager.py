@@ -0,0 +1,132 @@
+import io
+import os
+import json
+import base64
+import struct
+import kdf_registry
+from stream_crypto import StreamWriter, StreamReader
+
+# Export file layout:
+#   MAGIC (8 bytes) + format version (1 byte) + settings length (4 bytes)
+#   + settings (JSON: KDF parameters and salt of the passphrase key)
+#   + encrypted stream (see stream_crypto) of one JSON entry per line
+#
+# Entries are written with their passwords decrypted, so an export opens
+# with its passphrase alone, without the vault's key.
+EXPORT_MAGIC = b"SPEXPORT"
+EXPORT_FORMAT_VERSION = 1
+EXPORT_HEADER = struct.Struct(">8sBI")
+
+# Entries read and decrypted at a time
+EXPORT_BATCH_SIZE = 256
+
+def iter_export(vault, passphrase, params=kdf_registry.LEGACY_PARAMS, derive=None):
+    """
+    Produce an encrypted export of a vault piece by piece.
+
+    Entries are read from the vault a batch at a time and encrypted as
+    they are serialized, so memory stays bounded whatever the vault size.
+
+    Args:
+        vault: VaultStore (or SQLiteVault) to export
+        passphrase: Passphrase protecting the export
+        params: KDF parameters for the passphrase
+        derive: Function(password, salt, params) returning the raw key;
+                defaults to kdf_registry.derive_key
+
+    Yields:
+        bytes: Consecutive pieces of the export file
+    """
+    salt = os.urandom(16)
+    key = (derive or kdf_registry.derive_key)(passphrase, salt, params)
+    settings = json.dumps({"kdf": params, "salt": base64.b64encode(salt).decode()}).encode()
+    header = EXPORT_HEADER.pack(EXPORT_MAGIC, EXPORT_FORMAT_VERSION, len(settings)) + settings
+
+    sink = io.BytesIO()
+    sink.write(header)
+    writer = StreamWriter(sink, key, associated_data=header)
+
+    entry_ids = vault.entry_ids()
+    crypto_manager = vault.crypto_manager
+    for start in range(0, len(entry_ids), EXPORT_BATCH_SIZE):
+        entries = [vault.get_entry(entry_id) for entry_id in entry_ids[start:start + EXPORT_BATCH_SIZE]]
+        entries = [entry for entry in entries if entry is not None]
+
+        encrypted = [entry for entry in entries if entry.get("encrypted") and entry.get("password")]
+        for entry, password in zip(encrypted, crypto_manager.decrypt_many([entry["password"] for entry in encrypted])):
+            entry["password"] = password if password is not None else ""
+        for entry in entries:
+            entry.pop("encrypted", None)
+            writer.write(json.dumps(entry).encode() + b"\n")
+
+        yield _take(sink)
+
+    writer.close()
+    yield _take(sink)
+
+def export_vault(vault, path, passphrase, params=kdf_registry.LEGACY_PARAMS):
+    """
+    Write an encrypted export of a vault to a file.
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            for piece in iter_export(vault, passphrase, params):
+                f.write(piece)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        return True
+    except Exception as e:
+        print(f"Error exporting vault: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+def read_export(fileobj, passphrase, derive=None):
+    """
+    Read the entries of an encrypted export.
+
+    Args:
+        fileobj: Binary file object of the export
+        passphrase: Passphrase of the export
+        derive: Function(password, salt, params) returning the raw key
+
+    Yields:
+        dict: Entries with plain text passwords
+
+    Raises:
+        ValueError: If the file isn't an export, the passphrase is wrong or
+                    the file was modified
+    """
+    header = fileobj.read(EXPORT_HEADER.size)
+    if len(header) < EXPORT_HEADER.size:
+        raise ValueError("Not a SecurePass export")
+    magic, version, settings_length = EXPORT_HEADER.unpack(header)
+    if magic != EXPORT_MAGIC:
+        raise ValueError("Not a SecurePass export")
+    if version > EXPORT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format version {version}")
+
+    settings_data = fileobj.read(settings_length)
+    try:
+        settings = json.loads(settings_data)
+        salt = base64.b64decode(settings["salt"])
+        params = settings["kdf"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Malformed SecurePass export") from None
+    key = (derive or kdf_registry.derive_key)(passphrase, salt, params)
+
+    reader = io.BufferedReader(StreamReader(fileobj, key, associated_data=header + settings_data))
+    for line in reader:
+        yield json.loads(line)
+
+def _take(sink):
+    """Return and clear what was written to a BytesIO."""
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
@@ -0,0 +1,321 @@
+import io
+import csv
+import json
+import time
+from itertools import chain
+from urllib.parse import urlsplit
+from export_manager import EXPORT_MAGIC, read_export
+
+# Entry fields an import fills in
+IMPORT_FIELDS = ("title", "website", "username", "password", "category", "notes")
+
+# Column (or JSON key) names other password managers export each field
+# under: Chrome, Edge, Firefox, Bitwarden, LastPass, 1Password, Dashlane,
+# KeePass and KeePassXC. The first matching column of a file wins.
+FIELD_ALIASES = {
+    "title": ("title", "name", "account", "entry"),
+    "website": ("website", "url", "login_uri", "web site", "uri", "origin"),
+    "username": ("username", "login_username", "login name", "user name", "email"),
+    "password": ("password", "login_password"),
+    "category": ("category", "folder", "grouping", "group"),
+    "notes": ("notes", "note", "extra", "comments", "comment")
+}
+COLUMN_FIELDS = {alias: field for field, aliases in FIELD_ALIASES.items() for alias in aliases}
+
+# Keys of a JSON export holding the list of items
+JSON_ITEM_KEYS = ("items", "entries")
+
+# Entries encrypted at a time
+IMPORT_BATCH_SIZE = 256
+
+# Characters read from the file at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+def iter_import(fileobj, passphrase=None, derive=None):
+    """
+    Read the entries of another password manager's export, or of a
+    SecurePass export to restore.
+
+    CSV files with a header row and JSON files (a list of items, or an
+    object with an "items" or "entries" list, as Bitwarden writes) are
+    recognized from their content, as are encrypted SecurePass exports.
+    The file is parsed as it is read, one row or item at a time.
+
+    Args:
+        fileobj: Seekable binary file object of the export (UTF-8)
+        passphrase: Passphrase of a SecurePass export
+        derive: Function(password, salt, params) returning the raw key of
+                a SecurePass export; defaults to kdf_registry.derive_key
+
+    Yields:
+        dict: Entries with plain text passwords, or None for items that
+              aren't logins (secure notes, cards, empty rows...)
+
+    Raises:
+        ValueError: If the file can't be parsed, or is a SecurePass export
+                    and the passphrase is missing or wrong
+    """
+    if is_securepass_export(fileobj):
+        if not passphrase:
+            raise ValueError("This SecurePass export needs its passphrase")
+        for entry in read_export(fileobj, passphrase, derive):
+            yield _make_entry(entry) if isinstance(entry, dict) else None
+        return
+
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        start = text.read(READ_CHUNK_SIZE)
+        if start.lstrip()[:1] in ("[", "{"):
+            yield from _iter_json(_JsonReader(text, start))
+        else:
+            # Complete the last line of the chunk before handing lines to csv
+            lines = chain(io.StringIO(start + text.readline(), newline=""), text)
+            yield from _iter_csv(lines)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed import file: {e}") from None
+
+def import_entries(vault, entries, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Add imported entries to a vault.
+
+    Entries whose website and username match an entry already in the vault
+    (or earlier in the import) are skipped. Passwords are encrypted a batch
+    at a time (empty ones are left unencrypted), and all new entries are
+    written at once when the import has been read to the end, so a file
+    that fails to parse adds nothing.
+
+    Args:
+        vault: VaultStore (or SQLiteVault) to add the entries to
+        entries: Entries from iter_import
+        batch_size: Number of passwords encrypted at a time
+        progress: Function(report) called after each batch
+
+    Returns:
+        dict: Counts of entries read, imported, skipped as duplicates and
+              skipped as not being logins
+
+    Raises:
+        ValueError: If the file can't be parsed
+    """
+    report = {"read": 0, "imported": 0, "duplicates": 0, "skipped": 0}
+    seen = {dedupe_key(entry) for entry in vault.load_entries(include_secrets=False)}
+    changes = []
+    pending = []
+
+    def encrypt_pending():
+        # Items without a password (SSO logins, notes) are stored as they are
+        with_password = [entry for entry in pending if entry["password"]]
+        passwords = vault.crypto_manager.encrypt_many([entry["password"] for entry in with_password])
+        for entry, password in zip(with_password, passwords):
+            entry["password"] = password
+            entry["encrypted"] = True
+        for entry in pending:
+            entry.setdefault("encrypted", False)
+            changes.append(("put", entry))
+        pending.clear()
+        if progress:
+            progress(dict(report))
+
+    now = time.time()
+    for entry in entries:
+        report["read"] += 1
+        if entry is None:
+            report["skipped"] += 1
+            continue
+
+        key = dedupe_key(entry)
+        if key is not None:
+            if key in seen:
+                report["duplicates"] += 1
+                continue
+            seen.add(key)
+
+        entry["created_at"] = now
+        entry["modified_at"] = now
+        pending.append(entry)
+        report["imported"] += 1
+        if len(pending) >= batch_size:
+            encrypt_pending()
+
+    encrypt_pending()
+    if changes:
+        vault.write_batch(changes)
+    return report
+
+def is_securepass_export(fileobj):
+    """Check whether a seekable binary file is a SecurePass export, leaving it at its start."""
+    magic = fileobj.read(len(EXPORT_MAGIC))
+    fileobj.seek(0)
+    return magic == EXPORT_MAGIC
+
+def dedupe_key(entry):
+    """Key telling entries for the same login apart, or None if it has neither website nor username."""
+    website = entry.get("website") or ""
+    username = entry.get("username") or ""
+    if not isinstance(website, str) or not isinstance(username, str) or not (website or username):
+        return None
+    return (website.strip().rstrip("/").casefold(), username.strip().casefold())
+
+def _make_entry(fields):
+    """Build an entry from the fields found in a row or item, or None if it holds no login."""
+    entry = {}
+    for field in IMPORT_FIELDS:
+        value = fields.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        elif not isinstance(value, str):
+            value = ""
+        # Passwords are kept exactly as exported
+        entry[field] = value if field == "password" else value.strip()
+
+    if not (entry["password"] or entry["username"] or entry["website"]):
+        return None
+    if not entry["title"]:
+        entry["title"] = urlsplit(entry["website"]).hostname or entry["website"] or entry["username"]
+    return entry
+
+def _map_fields(item):
+    """Pick the entry fields out of a flat JSON item by their aliases."""
+    fields = {}
+    for name, value in item.items():
+        field = COLUMN_FIELDS.get(name.strip().lower()) if isinstance(name, str) else None
+        if field and field not in fields:
+            fields[field] = value
+    return fields
+
+def _iter_csv(lines):
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+
+    columns = {}
+    for index, name in enumerate(header):
+        field = COLUMN_FIELDS.get(name.strip().lower())
+        if field and field not in columns:
+            columns[field] = index
+    if "password" not in columns:
+        raise ValueError("Unrecognized CSV file: no password column")
+
+    # Bitwarden exports notes and cards as rows of other types
+    names = [name.strip().lower() for name in header]
+    type_index = names.index("type") if "type" in names else None
+
+    for row in reader:
+        if type_index is not None and type_index < len(row) and row[type_index] not in ("", "login"):
+            yield None
+            continue
+        yield _make_entry({field: row[index] for field, index in columns.items() if index < len(row)})
+
+def _iter_json(reader):
+    folders = {}
+
+    def entry_of(item):
+        if not isinstance(item, dict) or item.get("encrypted"):
+            # Items encrypted by another vault can't be read
+            return None
+        login = item.get("login")
+        if not isinstance(login, dict):
+            return _make_entry(_map_fields(item))
+
+        # Bitwarden item
+        uris = login.get("uris") or []
+        uri = uris[0] if isinstance(uris, list) and uris else None
+        return _make_entry({
+            "title": item.get("name"),
+            "website": uri.get("uri") if isinstance(uri, dict) else None,
+            "username": login.get("username"),
+            "password": login.get("password"),
+            "category": folders.get(item.get("folderId")),
+            "notes": item.get("notes")
+        })
+
+    if reader.peek() == "[":
+        for item in reader.items():
+            yield entry_of(item)
+        return
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError("Malformed import file: invalid JSON object key")
+        reader.expect(":")
+        if key in JSON_ITEM_KEYS and reader.peek() == "[":
+            for item in reader.items():
+                yield entry_of(item)
+        else:
+            value = reader.value()
+            # Bitwarden lists its folders before the items
+            if key == "folders" and isinstance(value, list):
+                folders.update((folder.get("id"), folder.get("name")) for folder in value if isinstance(folder, dict))
+        if reader.expect(",}") == "}":
+            return
+
+class _JsonReader:
+    """Reads the values of a JSON document one at a time from a text stream."""
+
+    def __init__(self, text, start=""):
+        self.text = text
+        self.buffer = start
+        self.position = 0
+        self.at_end = False
+        self.decoder = json.JSONDecoder()
+
+    def peek(self):
+        """Return the next non-whitespace character ("" at the end of the file)."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in " \t\r\n":
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read():
+                return ""
+
+    def expect(self, characters):
+        """Consume the next character, which must be one of characters."""
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Malformed import file: expected one of {characters!r} in JSON")
+        self.position += 1
+        return character
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.at_end:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.at_end:
+                    raise ValueError(f"Malformed import file: {e}") from None
+            self._read()
+
+    def items(self):
+        """Decode the elements of the array starting at the next character, one at a time."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+    def _read(self):
+        """Append the next chunk of the file to the buffer, dropping what was consumed."""
+        if self.at_end:
+            return False
+        chunk = self.text.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.at_end = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
@@ -0,0 +1,169 @@
+import json
+import time
+import base64
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from durable_io import atomic_write_json
+
+class PBKDF2Function:
+    """PBKDF2-HMAC-SHA256. Time grows linearly with the iteration count."""
+
+    name = "pbkdf2-sha256"
+    cost_parameter = "iterations"
+
+    # Never calibrate below what keys were derived with before calibration existed
+    MIN_ITERATIONS = 100000
+
+    def derive(self, password, salt, params, length=32):
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=length,
+            salt=salt,
+            iterations=params["iterations"],
+        )
+        return kdf.derive(password)
+
+    def calibrate(self, target_seconds):
+        """Extrapolate the iteration count from one timed probe."""
+        probe = {"name": self.name, "iterations": 50000}
+        elapsed = time_derivation(probe)
+        iterations = round(probe["iterations"] * target_seconds / elapsed, -4)
+        return {"name": self.name, "iterations": int(max(self.MIN_ITERATIONS, iterations))}
+
+class ScryptFunction:
+    """scrypt. Time and memory (128 * r * n bytes) double with n."""
+
+    name = "scrypt"
+    cost_parameter = "n"
+
+    MIN_N = 2 ** 14
+    MAX_MEMORY = 256 * 1024 * 1024
+
+    def derive(self, password, salt, params, length=32):
+        kdf = Scrypt(salt=salt, length=length, n=params["n"], r=params["r"], p=params["p"])
+        return kdf.derive(password)
+
+    def calibrate(self, target_seconds):
+        """Double n while that gets closer to the target time, within the memory limit."""
+        params = {"name": self.name, "n": self.MIN_N, "r": 8, "p": 1}
+        while 128 * params["r"] * params["n"] * 2 <= self.MAX_MEMORY:
+            # Doubling t overshoots by more than it falls short once 3t >= 2 * target
+            if time_derivation(params) * 3 >= target_seconds * 2:
+                break
+            params["n"] *= 2
+        return params
+
+KDF_FUNCTIONS = {function.name: function for function in (PBKDF2Function(), ScryptFunction())}
+
+# Parameters of keys derived before they were stored with the user
+LEGACY_PARAMS = {"name": "pbkdf2-sha256", "iterations": 100000}
+
+# HKDF labels of the keys split from one password derivation
+VERIFIER_INFO = b"securepass verifier v1"
+WRAPPING_KEY_INFO = b"securepass wrapping key v1"
+
+DEFAULT_CALIBRATION_KDF = "scrypt"
+DEFAULT_TARGET_SECONDS = 0.5
+
+def get_kdf(params):
+    """
+    Get the KDF implementation for a parameter set.
+
+    Raises:
+        ValueError: If the KDF isn't known
+    """
+    function = KDF_FUNCTIONS.get(params.get("name"))
+    if function is None:
+        raise ValueError(f"Unknown KDF: {params.get('name')}")
+    return function
+
+def derive_key(password, salt, params, length=32):
+    """
+    Derive a key from a password.
+
+    Args:
+        password: Password (str or bytes)
+        salt: Salt bytes
+        params: KDF parameters, including the KDF's "name"
+        length: Length of the key in bytes
+
+    Returns:
+        bytes: The raw derived key
+    """
+    if isinstance(password, str):
+        password = password.encode()
+    return get_kdf(params).derive(password, salt, params, length)
+
+def split_derived_key(derived):
+    """
+    Split one password derivation into a verifier and a wrapping key.
+
+    The verifier is stored to check the password; it reveals nothing about
+    the wrapping key, so a single KDF run both verifies and unlocks.
+
+    Args:
+        derived: Raw output of derive_key
+
+    Returns:
+        tuple: (verifier bytes, base64 encoded wrapping key)
+    """
+    keys = []
+    for info in (VERIFIER_INFO, WRAPPING_KEY_INFO):
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info)
+        keys.append(hkdf.derive(derived))
+    return keys[0], base64.urlsafe_b64encode(keys[1])
+
+def time_derivation(params):
+    """Seconds one derivation with the given parameters takes on this host."""
+    start = time.perf_counter()
+    derive_key(b"calibration", b"\0" * 16, params)
+    return time.perf_counter() - start
+
+def calibrate(name=DEFAULT_CALIBRATION_KDF, target_seconds=DEFAULT_TARGET_SECONDS):
+    """
+    Pick parameters for a KDF that take about target_seconds on this host.
+
+    Args:
+        name: Name of the KDF
+        target_seconds: Wanted unlock latency
+
+    Returns:
+        dict: KDF parameters
+    """
+    return get_kdf({"name": name}).calibrate(target_seconds)
+
+def is_outdated(params, policy):
+    """
+    Check if keys derived with params should be re-derived under the policy.
+
+    True when the policy uses a different KDF or a higher cost.
+    """
+    if params.get("name") != policy["name"]:
+        return True
+    cost_parameter = get_kdf(policy).cost_parameter
+    return params.get(cost_parameter, 0) < policy[cost_parameter]
+
+def load_policy(path, default=LEGACY_PARAMS):
+    """
+    Load the KDF parameters new keys should be derived with.
+
+    Returns:
+        dict: The stored parameters, or default if there are none (or they're invalid)
+    """
+    try:
+        with open(path, 'r') as f:
+            policy = json.load(f)
+        get_kdf(policy)
+        return policy
+    except FileNotFoundError:
+        return dict(default)
+    except Exception as e:
+        print(f"Error loading KDF policy: {e}")
+        return dict(default)
+
+def save_policy(path, params):
+    """Store the KDF parameters new keys should be derived with."""
+    get_kdf(params)
+    atomic_write_json(path, params)
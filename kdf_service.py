@@ -0,0 +1,206 @@
+import os
+import math
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from kdf_registry import derive_key
+
+def timed_derive_key(password, salt, params, length):
+    """
+    Derive a key, run in a pool process.
+
+    Returns:
+        tuple: (derived key, seconds spent deriving it)
+    """
+    start = time.perf_counter()
+    key = derive_key(password, salt, params, length)
+    return key, time.perf_counter() - start
+
+class KDFBusyError(Exception):
+    """Raised when the KDF service can't take more work right now."""
+
+    def __init__(self, retry_after):
+        """
+        Args:
+            retry_after: Suggested number of seconds to wait before retrying
+        """
+        super().__init__(f"Key derivation service is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class KDFService:
+    """
+    Runs password key derivations in a process pool.
+
+    Deriving a key takes a deliberately long CPU burst; run inline it
+    stalls every other request of the worker. Derivations are submitted to
+    a pool of processes instead, and at most max_workers + max_pending may
+    be in flight: further calls are rejected with KDFBusyError right away
+    rather than queuing without bound behind a burst of logins.
+    """
+
+    # Seconds assumed per derivation before any has been timed
+    DEFAULT_ESTIMATE = 0.1
+
+    def __init__(self, max_workers=None, max_pending=None, timeout=30.0):
+        """
+        Initialize the service. The pool is started on first use.
+
+        Args:
+            max_workers: Number of pool processes (defaults to the CPU
+                         count); 0 derives inline in the calling thread
+            max_pending: Number of derivations allowed to wait for a free
+                         process (defaults to 4 per process)
+            timeout: Seconds a caller waits for its result
+        """
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_pending = max(1, self.max_workers) * 4 if max_pending is None else max_pending
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._in_flight = 0
+
+        # Metrics
+        self.calls = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+        self._total_seconds = 0.0
+        self._total_wait_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def derive(self, password, salt, params, length=32):
+        """
+        Derive a key with any KDF of the registry.
+
+        Args:
+            password: Password (str or bytes)
+            salt: Salt bytes
+            params: KDF parameters (see kdf_registry)
+            length: Length of the key in bytes
+
+        Returns:
+            bytes: The derived key
+
+        Raises:
+            KDFBusyError: If too many derivations are in flight or the
+                          result took longer than the timeout
+        """
+        if isinstance(password, str):
+            password = password.encode()
+
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise KDFBusyError(self._retry_after())
+            self._in_flight += 1
+
+        start = time.perf_counter()
+        try:
+            if self.max_workers == 0:
+                try:
+                    key, seconds = timed_derive_key(password, salt, params, length)
+                finally:
+                    self._release_slot()
+            else:
+                key, seconds = self._run_in_pool(password, salt, params, length)
+        except KDFBusyError:
+            raise
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.calls += 1
+            self._total_seconds += seconds
+            self._total_wait_seconds += max(0.0, elapsed - seconds)
+            self._max_seconds = max(self._max_seconds, elapsed)
+        return key
+
+    def stats(self):
+        """
+        Get the service's metrics.
+
+        Returns:
+            dict: Counters, current load and average/maximum timings
+        """
+        with self._lock:
+            calls = self.calls
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "calls": calls,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "failures": self.failures,
+                "avg_derive_ms": round(self._total_seconds / calls * 1000, 2) if calls else 0.0,
+                "avg_wait_ms": round(self._total_wait_seconds / calls * 1000, 2) if calls else 0.0,
+                "max_total_ms": round(self._max_seconds * 1000, 2)
+            }
+
+    def shutdown(self):
+        """Stop the pool processes of this process."""
+        with self._lock:
+            executor = self._executor if self._executor_pid == os.getpid() else None
+            self._executor = None
+            self._executor_pid = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_in_pool(self, password, salt, params, length):
+        """
+        Run a derivation in the pool and release its slot once it has ended.
+
+        A derivation that timed out can't be stopped once a process runs
+        it, so its slot stays taken until it finishes; otherwise admission
+        would let in more work than there are free processes.
+        """
+        future = None
+        try:
+            executor = self._get_executor()
+            future = executor.submit(timed_derive_key, password, salt, params, length)
+            future.add_done_callback(self._release_slot)
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+                retry_after = self._retry_after()
+            raise KDFBusyError(retry_after)
+        except BrokenProcessPool:
+            # A pool process died; start a fresh pool for the next call
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        finally:
+            if future is None:
+                self._release_slot()
+
+    def _release_slot(self, future=None):
+        """Count a derivation as no longer in flight (also a future's done callback)."""
+        with self._lock:
+            self._in_flight -= 1
+
+    def _get_executor(self):
+        """Get this process's pool; a pool inherited across fork is not usable."""
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                # spawn, not fork: forking a threaded server process is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _retry_after(self):
+        """Estimate the seconds until the current backlog has drained (lock held)."""
+        per_call = self._total_seconds / self.calls if self.calls else self.DEFAULT_ESTIMATE
+        return max(1, math.ceil(per_call * self._in_flight / max(1, self.max_workers)))
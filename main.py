@@ -1,12 +1,25 @@
 import os
+import time
 import customtkinter as ctk
 from ui.login_frame import LoginFrame
 from ui.dashboard_frame import DashboardFrame
 from auth_manager import AuthManager
 from crypto_manager import CryptoManager
 from storage_manager import StorageManager
+from quick_unlock import QuickUnlock
 from ui.theme_manager import ThemeManager
 
+# Inactivity before the session is locked, per "Auto logout after" setting
+AUTO_LOGOUT_SECONDS = {
+    "5 minutes": 5 * 60,
+    "15 minutes": 15 * 60,
+    "30 minutes": 30 * 60,
+    "1 hour": 60 * 60,
+}
+
+# How often inactivity is checked, in milliseconds
+IDLE_CHECK_INTERVAL = 5000
+
 class PasswordManagerApp(ctk.CTk):
     """Main application class for the password manager."""
     
@@ -23,6 +36,17 @@ class PasswordManagerApp(ctk.CTk):
         self.auth_manager = AuthManager(self.storage_manager)
         self.crypto_manager = None  # Will be initialized after login
         self.theme_manager = ThemeManager(self)
+        self.quick_unlock = QuickUnlock()
+        self.master_key = None
+        
+        # Calibrate the KDF while the login screen is up, not during account creation
+        self.auth_manager.calibrate_kdf_policy()
+        
+        # Track activity for the auto logout
+        self.last_activity = time.monotonic()
+        self.idle_check_job = None
+        for event in ("<KeyPress>", "<ButtonPress>", "<Motion>"):
+            self.bind_all(event, self.record_activity, add="+")
         
         # Initialize UI frames
         self.current_frame = None
@@ -45,7 +69,7 @@ class PasswordManagerApp(ctk.CTk):
         if self.current_frame:
             self.current_frame.pack_forget()
             
-        self.login_frame = LoginFrame(self, self.auth_manager, self.on_login_success)
+        self.login_frame = LoginFrame(self, self.auth_manager, self.on_login_success, self.quick_unlock)
         self.login_frame.pack(fill=ctk.BOTH, expand=True)
         self.current_frame = self.login_frame
         
@@ -59,7 +83,8 @@ class PasswordManagerApp(ctk.CTk):
             self.crypto_manager, 
             self.storage_manager,
             self.theme_manager,
-            self.on_logout
+            self.on_logout,
+            self.set_quick_unlock_pin
         )
         self.dashboard_frame.pack(fill=ctk.BOTH, expand=True)
         self.current_frame = self.dashboard_frame
@@ -67,14 +92,63 @@ class PasswordManagerApp(ctk.CTk):
     def on_login_success(self, master_key):
         """Handle successful login."""
         # Initialize crypto manager with the master key
-        self.crypto_manager = CryptoManager(master_key)
+        settings = self.storage_manager.get_app_settings()
+        self.crypto_manager = CryptoManager(master_key, compression=settings.get("vault_compression", "zlib"))
+        self.master_key = master_key
         self.show_dashboard_frame()
         
+        self.last_activity = time.monotonic()
+        self.schedule_idle_check()
+        
     def on_logout(self):
         """Handle logout."""
-        # Clear sensitive data
+        # Clear sensitive data; the PIN only survives an auto logout
+        self.quick_unlock.disable()
+        self.lock()
+        
+    def lock(self):
+        """Lock the session, keeping the quick unlock PIN if one is set."""
+        if self.idle_check_job:
+            self.after_cancel(self.idle_check_job)
+            self.idle_check_job = None
+        
         self.crypto_manager = None
+        self.master_key = None
+        self.quick_unlock.lock()
+        
+        # Destroy the dashboard, with its dialogs and decrypted entries
+        if self.current_frame:
+            self.current_frame.destroy()
+            self.current_frame = None
         self.show_login_frame()
+        
+    def set_quick_unlock_pin(self, pin):
+        """Set the PIN that unlocks the session after an auto logout."""
+        if self.master_key:
+            self.quick_unlock.enable(self.master_key, pin)
+        
+    def record_activity(self, event=None):
+        """Record user activity, postponing the auto logout."""
+        self.last_activity = time.monotonic()
+        
+    def schedule_idle_check(self):
+        """Check for inactivity again after IDLE_CHECK_INTERVAL."""
+        if self.idle_check_job:
+            self.after_cancel(self.idle_check_job)
+        self.idle_check_job = self.after(IDLE_CHECK_INTERVAL, self.check_idle)
+        
+    def check_idle(self):
+        """Lock the session once it has been inactive for the auto logout time."""
+        self.idle_check_job = None
+        if self.crypto_manager is None:
+            return
+        
+        # Read each time so a changed setting applies right away
+        timeout = AUTO_LOGOUT_SECONDS.get(self.storage_manager.get_app_settings().get("auto_logout"))
+        if timeout and time.monotonic() - self.last_activity >= timeout:
+            self.lock()
+        else:
+            self.schedule_idle_check()
 
 if __name__ == "__main__":
     # Set appearance mode
@@ -0,0 +1,112 @@
+import os
+import time
+import base64
+import kdf_registry
+from crypto_manager import wrap_data_key, unwrap_data_key
+
+class QuickUnlock:
+    """
+    Unlocks a locked session with a short PIN instead of the master password.
+
+    When a PIN is set, the vault's data key is wrapped in memory under a key
+    derived from it (a cheap derivation: milliseconds, not the master KDF)
+    and the plain key is not kept. Nothing is written to disk. Once the
+    session locks, the PIN works for at most max_attempts tries and until
+    timeout seconds have passed; after that the wrapped key is dropped and
+    only the master password unlocks.
+    """
+
+    # Light scrypt parameters: a PIN has little entropy, so the limits on
+    # attempts and time protect it, not the cost of the derivation
+    PIN_KDF = {"name": "scrypt", "n": 2 ** 14, "r": 8, "p": 1}
+
+    def __init__(self, max_attempts=3, timeout=3600):
+        """
+        Initialize with quick unlock disabled.
+
+        Args:
+            max_attempts: Wrong PINs allowed after each lock
+            timeout: Seconds after locking during which the PIN works
+        """
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self._wrapped_key = None
+        self._salt = None
+        self._locked_at = None
+        self._attempts = 0
+
+    def enable(self, data_key, pin):
+        """
+        Set the PIN for the current session.
+
+        Args:
+            data_key: The unlocked vault's data key
+            pin: PIN chosen by the user
+        """
+        self._salt = os.urandom(16)
+        pin_key = base64.urlsafe_b64encode(kdf_registry.derive_key(pin, self._salt, self.PIN_KDF))
+        self._wrapped_key = wrap_data_key(pin_key, data_key)
+        self._locked_at = None
+        self._attempts = 0
+
+    def disable(self):
+        """Forget the PIN and the wrapped key."""
+        self._wrapped_key = None
+        self._salt = None
+        self._locked_at = None
+        self._attempts = 0
+
+    def is_enabled(self):
+        """Check if a PIN is set for this session."""
+        return self._wrapped_key is not None
+
+    def lock(self):
+        """Start the attempt counter and timeout of a locked session."""
+        if self.is_enabled():
+            self._locked_at = time.monotonic()
+            self._attempts = 0
+
+    def is_available(self):
+        """
+        Check if the locked session can still be unlocked with the PIN.
+
+        The wrapped key is dropped once the timeout has passed.
+        """
+        if not self.is_enabled() or self._locked_at is None:
+            return False
+        if time.monotonic() - self._locked_at > self.timeout:
+            self.disable()
+            return False
+        return True
+
+    @property
+    def attempts_left(self):
+        return max(0, self.max_attempts - self._attempts)
+
+    def unlock(self, pin):
+        """
+        Unlock the locked session with the PIN.
+
+        Args:
+            pin: PIN entered by the user
+
+        Returns:
+            bytes: The data key, or None if the PIN is wrong or quick unlock
+                  is no longer available
+        """
+        if not self.is_available():
+            return None
+
+        try:
+            pin_key = base64.urlsafe_b64encode(kdf_registry.derive_key(pin, self._salt, self.PIN_KDF))
+            data_key = unwrap_data_key(pin_key, self._wrapped_key)
+        except Exception:
+            self._attempts += 1
+            if self._attempts >= self.max_attempts:
+                self.disable()
+            return None
+
+        # Unlocked: the PIN stays set for the next lock
+        self._locked_at = None
+        self._attempts = 0
+        return data_key
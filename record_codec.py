@@ -0,0 +1,225 @@
+import base64
+import binascii
+import struct
+
+# Header of a binary payload. JSON payloads start with "{", so a leading
+# NUL byte tells them apart and old payloads stay readable.
+MAGIC = b"\x00SPB"
+FORMAT_VERSION = 1
+
+# Value type tags
+_NONE = 0x00
+_FALSE = 0x01
+_TRUE = 0x02
+_INT = 0x03          # zigzag varint
+_FLOAT = 0x04        # IEEE 754 double
+_STR = 0x05          # varint length + UTF-8
+_B64 = 0x06          # base64 text stored as its raw bytes
+_B64_TOKEN = 0x07    # base64 of a urlsafe-base64 token (encrypted fields) stored raw
+_LIST = 0x08         # varint byte length + varint count + values
+_DICT = 0x09         # varint byte length + varint count + (field, value) pairs
+
+# Interned field names, encoded as one varint instead of the name.
+# Existing payloads depend on these numbers: only ever append.
+FIELD_NAMES = [
+    None,  # 0 = name follows as a literal string
+    "title", "username", "password", "website", "category", "notes",
+    "encrypted", "created_at", "modified_at", "id", "entries", "version",
+    "password_hidden", "shared_by", "encrypted_entry",
+]
+_FIELD_TAGS = {name: tag for tag, name in enumerate(FIELD_NAMES) if name}
+
+# Fields that usually hold base64 ciphertext and are worth storing as raw bytes
+BINARY_FIELDS = frozenset(["password", "encrypted_entry"])
+
+_DOUBLE = struct.Struct(">d")
+
+def encode_record(value):
+    """
+    Encode a JSON-like value (dicts, lists, str, int, float, bool, None).
+
+    Args:
+        value: Value to encode
+
+    Returns:
+        bytes: Header + encoded value
+    """
+    out = bytearray(MAGIC)
+    out.append(FORMAT_VERSION)
+    _encode_value(out, value, None)
+    return bytes(out)
+
+def is_binary_record(data):
+    """Check if a payload was produced by encode_record."""
+    return data[:len(MAGIC)] == MAGIC
+
+def decode_record(data, skip_fields=None):
+    """
+    Decode a payload produced by encode_record.
+
+    Args:
+        data: Encoded bytes (or memoryview)
+        skip_fields: Field names whose values are skipped without being
+                     decoded and left out of the result, at any depth
+
+    Returns:
+        The decoded value
+    """
+    data = memoryview(data)
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a binary record")
+    version = data[len(MAGIC)]
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Unsupported record format version {version}")
+
+    value, _ = _decode_value(data, len(MAGIC) + 1, frozenset(skip_fields or ()))
+    return value
+
+def _write_varint(out, number):
+    while number >= 0x80:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+def _read_varint(data, offset):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+def _raw_base64(text):
+    """Return (type tag, raw bytes) if text is base64 that round-trips exactly, else None."""
+    try:
+        outer = base64.b64decode(text, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    if base64.b64encode(outer).decode("ascii") != text:
+        return None
+
+    try:
+        inner = base64.urlsafe_b64decode(outer)
+        if base64.urlsafe_b64encode(inner) == outer:
+            return _B64_TOKEN, inner
+    except (binascii.Error, ValueError):
+        pass
+    return _B64, outer
+
+def _encode_value(out, value, field):
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        _write_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, str):
+        raw = _raw_base64(value) if field in BINARY_FIELDS and value else None
+        if raw is not None:
+            out.append(raw[0])
+            _write_varint(out, len(raw[1]))
+            out += raw[1]
+        else:
+            encoded = value.encode("utf-8")
+            out.append(_STR)
+            _write_varint(out, len(encoded))
+            out += encoded
+    elif isinstance(value, (list, tuple)):
+        body = bytearray()
+        _write_varint(body, len(value))
+        for item in value:
+            _encode_value(body, item, None)
+        out.append(_LIST)
+        _write_varint(out, len(body))
+        out += body
+    elif isinstance(value, dict):
+        body = bytearray()
+        _write_varint(body, len(value))
+        for name, item in value.items():
+            if not isinstance(name, str):
+                raise TypeError(f"Field names must be strings, not {type(name).__name__}")
+            tag = _FIELD_TAGS.get(name, 0)
+            _write_varint(body, tag)
+            if not tag:
+                encoded = name.encode("utf-8")
+                _write_varint(body, len(encoded))
+                body += encoded
+            _encode_value(body, item, name)
+        out.append(_DICT)
+        _write_varint(out, len(body))
+        out += body
+    else:
+        raise TypeError(f"Object of type {type(value).__name__} can't be encoded")
+
+def _skip_value(data, offset):
+    """Return the offset just past the value at offset, without decoding it."""
+    kind = data[offset]
+    offset += 1
+    if kind in (_NONE, _FALSE, _TRUE):
+        return offset
+    if kind == _INT:
+        return _read_varint(data, offset)[1]
+    if kind == _FLOAT:
+        return offset + _DOUBLE.size
+    # Everything else is length-prefixed
+    length, offset = _read_varint(data, offset)
+    return offset + length
+
+def _decode_value(data, offset, skip_fields):
+    kind = data[offset]
+    offset += 1
+    if kind == _NONE:
+        return None, offset
+    if kind == _TRUE:
+        return True, offset
+    if kind == _FALSE:
+        return False, offset
+    if kind == _INT:
+        number, offset = _read_varint(data, offset)
+        return (number >> 1) if not number & 1 else -((number + 1) >> 1), offset
+    if kind == _FLOAT:
+        return _DOUBLE.unpack_from(data, offset)[0], offset + _DOUBLE.size
+
+    length, offset = _read_varint(data, offset)
+    end = offset + length
+    if kind == _STR:
+        return str(data[offset:end], "utf-8"), end
+    if kind == _B64:
+        return base64.b64encode(data[offset:end]).decode("ascii"), end
+    if kind == _B64_TOKEN:
+        return base64.b64encode(base64.urlsafe_b64encode(data[offset:end])).decode("ascii"), end
+
+    count, offset = _read_varint(data, offset)
+    if kind == _LIST:
+        items = []
+        for _ in range(count):
+            item, offset = _decode_value(data, offset, skip_fields)
+            items.append(item)
+        return items, end
+    if kind == _DICT:
+        result = {}
+        for _ in range(count):
+            tag, offset = _read_varint(data, offset)
+            if tag:
+                name = FIELD_NAMES[tag] if tag < len(FIELD_NAMES) else None
+                if name is None:
+                    raise ValueError(f"Unknown field tag {tag}")
+            else:
+                name_length, offset = _read_varint(data, offset)
+                name = str(data[offset:offset + name_length], "utf-8")
+                offset += name_length
+            if name in skip_fields:
+                offset = _skip_value(data, offset)
+                continue
+            result[name], offset = _decode_value(data, offset, skip_fields)
+        return result, end
+    raise ValueError(f"Unknown value type {kind}")
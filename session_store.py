@@ -0,0 +1,207 @@
+import hmac
+import time
+import hashlib
+import secrets
+import threading
+from crypto_manager import generate_data_key, wrap_data_key, unwrap_data_key
+
+class UserSession:
+    """
+    A logged-in user's session: who it belongs to and their unlocked vault key.
+
+    The app keeps the vault it opened with the key in vault, so both are
+    forgotten together when the session expires or is revoked.
+    """
+
+    def __init__(self, session_id, username, key, token):
+        self.session_id = session_id
+        self.username = username
+        self.key = key
+        self.token_hash = hashlib.sha256(token.encode()).digest()
+        self.last_seen = time.time()
+        self.vault = None
+
+class MemorySessionBackend:
+    """Session records held by this worker process only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}  # session_id -> record
+
+    def get_session(self, session_id):
+        with self._lock:
+            record = self._records.get(session_id)
+            return dict(record) if record else None
+
+    def save_session(self, session_id, record):
+        with self._lock:
+            self._records[session_id] = dict(record)
+
+    def touch_session(self, session_id, last_access):
+        with self._lock:
+            if session_id in self._records:
+                self._records[session_id]["last_access"] = last_access
+
+    def delete_session(self, session_id):
+        with self._lock:
+            self._records.pop(session_id, None)
+
+    def delete_user_sessions(self, username):
+        with self._lock:
+            for session_id in [sid for sid, record in self._records.items() if record["username"] == username]:
+                del self._records[session_id]
+
+    def delete_idle_sessions(self, before):
+        with self._lock:
+            idle = [sid for sid, record in self._records.items() if record["last_access"] < before]
+            for session_id in idle:
+                del self._records[session_id]
+            return len(idle)
+
+class SessionStore:
+    """
+    Server-side sessions of the web app.
+
+    The cookie only carries an opaque session id and a per-session token.
+    The backend maps the id to the user, the last access time and the
+    vault key wrapped under the token, so the backend alone doesn't reveal
+    any key. Each worker keeps the unwrapped key of the sessions it served,
+    while the backend is still asked on every request: deleting a record
+    revokes the session in all workers at once. Unwrapped keys of sessions
+    a worker hasn't served within the idle TTL are dropped as it handles
+    other requests.
+
+    Any object with the methods of MemorySessionBackend can be the backend;
+    SQLiteStore has them, and shares sessions between workers.
+    """
+
+    def __init__(self, backend=None, idle_ttl=1800, touch_interval=60):
+        """
+        Initialize the store.
+
+        Args:
+            backend: Where session records are kept (this worker's memory
+                     if not provided)
+            idle_ttl: Seconds of inactivity after which a session expires
+            touch_interval: Seconds between writes of a session's last
+                            access time
+        """
+        self.backend = backend or MemorySessionBackend()
+        self.idle_ttl = idle_ttl
+        self.touch_interval = touch_interval
+
+        self._lock = threading.Lock()
+        self._unlocked = {}  # session_id -> UserSession
+        self._last_sweep = time.time()
+
+    def create(self, username, key):
+        """
+        Start a session.
+
+        Args:
+            username: Logged-in user
+            key: The user's vault key
+
+        Returns:
+            tuple: (session_id, token) to keep in the cookie
+        """
+        now = time.time()
+        self.backend.delete_idle_sessions(now - self.idle_ttl)
+        self._forget_idle(now)
+
+        session_id = secrets.token_urlsafe(32)
+        # The token is a Fernet key of its own
+        token = generate_data_key().decode()
+        self.backend.save_session(session_id, {
+            "username": username,
+            "wrapped_key": wrap_data_key(token.encode(), key),
+            "created_at": now,
+            "last_access": now
+        })
+        with self._lock:
+            self._unlocked[session_id] = UserSession(session_id, username, key, token)
+        return session_id, token
+
+    def get(self, session_id, token):
+        """
+        Look up a session.
+
+        Args:
+            session_id: Session id from the cookie
+            token: Token from the cookie
+
+        Returns:
+            UserSession: The session, or None if it expired, was revoked or
+                         the token doesn't match
+        """
+        if not session_id or not token:
+            return None
+
+        now = time.time()
+        if now - self._last_sweep >= self.touch_interval:
+            self._forget_idle(now)
+
+        record = self.backend.get_session(session_id)
+        if record is None or now - record["last_access"] > self.idle_ttl:
+            self._forget(session_id)
+            if record is not None:
+                self.backend.delete_session(session_id)
+            return None
+
+        with self._lock:
+            user_session = self._unlocked.get(session_id)
+        if user_session is None:
+            # First request of this session served by this worker
+            try:
+                key = unwrap_data_key(token.encode(), record["wrapped_key"])
+            except Exception:
+                return None
+            user_session = UserSession(session_id, record["username"], key, token)
+            with self._lock:
+                self._unlocked[session_id] = user_session
+        elif not hmac.compare_digest(hashlib.sha256(token.encode()).digest(), user_session.token_hash):
+            return None
+
+        user_session.last_seen = now
+        if now - record["last_access"] >= self.touch_interval:
+            self.backend.touch_session(session_id, now)
+        return user_session
+
+    def revoke(self, session_id):
+        """End a session."""
+        self._forget(session_id)
+        self.backend.delete_session(session_id)
+
+    def revoke_user(self, username, keep=None):
+        """
+        End all sessions of a user.
+
+        Args:
+            username: User whose sessions end
+            keep: Id of a session to keep
+        """
+        kept = self.backend.get_session(keep) if keep else None
+        self.backend.delete_user_sessions(username)
+        if kept is not None:
+            self.backend.save_session(keep, kept)
+
+        with self._lock:
+            for session_id in [sid for sid, s in self._unlocked.items() if s.username == username and sid != keep]:
+                del self._unlocked[session_id]
+
+    def local_sessions(self, username):
+        """Get the sessions of a user unlocked in this worker."""
+        with self._lock:
+            return [s for s in self._unlocked.values() if s.username == username]
+
+    def _forget_idle(self, now):
+        """Drop unwrapped keys (and open vaults) of sessions this worker hasn't served within the idle TTL."""
+        with self._lock:
+            self._last_sweep = now
+            idle = [sid for sid, s in self._unlocked.items() if now - s.last_seen > self.idle_ttl]
+            for session_id in idle:
+                del self._unlocked[session_id]
+
+    def _forget(self, session_id):
+        with self._lock:
+            self._unlocked.pop(session_id, None)
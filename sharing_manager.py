@@ -3,9 +3,81 @@ import base64
 import json
 import time
 import uuid
+import hashlib
 from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import hashes
+from durable_io import atomic_write_json
+
+# Version 1 shares have no format_version and stretch the access key with
+# PBKDF2 and a fixed salt. Version 2 derives the key with HKDF and a random
+# salt per share: the access key is already 256 random bits, so stretching
+# it only costs CPU time.
+SHARE_FORMAT_VERSION = 2
+SHARE_KEY_INFO = b"securepass share key v2"
+
+def _pbkdf2_sha256(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+def derive_share_key(share_data, access_key, pbkdf2=None):
+    """
+    Derive the Fernet key of a share from its access key.
+    
+    Args:
+        share_data: Share metadata (format version and salt are read from it)
+        access_key: Access key of the share
+        pbkdf2: Function(password, salt, iterations) returning the derived
+                bytes, used for version 1 shares; defaults to hashlib
+        
+    Returns:
+        bytes: Base64 encoded Fernet key
+    """
+    if share_data.get("format_version", 1) >= 2:
+        hkdf = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=base64.b64decode(share_data["key_salt"]),
+            info=SHARE_KEY_INFO,
+        )
+        key = hkdf.derive(access_key.encode())
+    else:
+        key = (pbkdf2 or _pbkdf2_sha256)(access_key, b'sharing_salt', 100000)
+    return base64.urlsafe_b64encode(key)
+
+def encrypt_shared_entry(shared_entry, access_key):
+    """
+    Encrypt an entry for sharing in the current share format.
+    
+    Args:
+        shared_entry: Dictionary to share
+        access_key: Access key of the share
+        
+    Returns:
+        dict: format_version, key_salt and encrypted_entry fields of the share
+    """
+    share_data = {
+        "format_version": SHARE_FORMAT_VERSION,
+        "key_salt": base64.b64encode(os.urandom(16)).decode()
+    }
+    fernet = Fernet(derive_share_key(share_data, access_key))
+    encrypted_data = fernet.encrypt(json.dumps(shared_entry).encode())
+    share_data["encrypted_entry"] = base64.b64encode(encrypted_data).decode()
+    return share_data
+
+def decrypt_shared_entry(share_data, sharing_key):
+    """
+    Decrypt the entry of a share.
+    
+    Args:
+        share_data: Share metadata with the encrypted entry
+        sharing_key: Key from derive_share_key
+        
+    Returns:
+        dict: The shared entry
+    """
+    fernet = Fernet(sharing_key)
+    encrypted_data = base64.b64decode(share_data["encrypted_entry"])
+    return json.loads(fernet.decrypt(encrypted_data).decode())
 
 class SharingManager:
     """Manages secure password sharing with time-limited access."""
@@ -68,26 +140,16 @@ class SharingManager:
         expiration_time = time.time() + (expiration_hours * 3600)
         
         # Encrypt the entry with the access key
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=b'sharing_salt',  # Fixed salt for simplicity
-            iterations=100000,
-        )
-        sharing_key = base64.urlsafe_b64encode(kdf.derive(access_key.encode()))
-        fernet = Fernet(sharing_key)
-        
-        encrypted_data = fernet.encrypt(json.dumps(shared_entry).encode())
+        share_data = encrypt_shared_entry(shared_entry, access_key)
         
-        # Create share metadata
-        share_data = {
-            "encrypted_entry": base64.b64encode(encrypted_data).decode(),
+        # Add share metadata
+        share_data.update({
             "created_at": time.time(),
             "expires_at": expiration_time,
             "access_count_limit": access_count,
             "access_count_current": 0,
             "is_valid": True
-        }
+        })
         
         # Save shared item
         self._save_shared_item(share_id, share_data)
@@ -142,19 +204,8 @@ class SharingManager:
         
         # Decrypt the shared item
         try:
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=b'sharing_salt',  # Fixed salt for simplicity
-                iterations=100000,
-            )
-            sharing_key = base64.urlsafe_b64encode(kdf.derive(access_key.encode()))
-            fernet = Fernet(sharing_key)
-            
-            encrypted_data = base64.b64decode(share_data["encrypted_entry"])
-            decrypted_data = fernet.decrypt(encrypted_data)
-            
-            return json.loads(decrypted_data.decode())
+            sharing_key = derive_share_key(share_data, access_key)
+            return decrypt_shared_entry(share_data, sharing_key)
         except Exception as e:
             print(f"Error decrypting shared item: {e}")
             return None
@@ -226,8 +277,7 @@ class SharingManager:
         """
         try:
             file_path = os.path.join(self.shared_dir, f"{share_id}.json")
-            with open(file_path, 'w') as f:
-                json.dump(share_data, f)
+            atomic_write_json(file_path, share_data)
             return True
         except Exception as e:
             print(f"Error saving shared item: {e}")
@@ -0,0 +1,521 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from vault_store import VaultStore
+
+class SQLiteStore:
+    """
+    SQLite storage for the web server: users, vault records and shares.
+
+    Every thread of every worker process gets its own connection (SQLite
+    connections must not cross a fork), and the database runs in WAL mode
+    so readers never block the single writer.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS vault_records (
+            owner TEXT NOT NULL,
+            entry_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            payload BLOB NOT NULL,
+            PRIMARY KEY (owner, entry_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_vault_records_owner ON vault_records (owner, position);
+
+        -- Bumped on every change to a vault's records
+        CREATE TABLE IF NOT EXISTS vault_versions (
+            owner TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+
+        -- Single-blob vaults imported without the owner's key, split on first unlock
+        CREATE TABLE IF NOT EXISTS legacy_vaults (
+            owner TEXT PRIMARY KEY,
+            payload BLOB NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS shares (
+            share_id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_shares_owner ON shares (owner);
+        CREATE INDEX IF NOT EXISTS idx_shares_expires_at ON shares (expires_at);
+
+        -- Bumped on every change to the shares of an owner
+        CREATE TABLE IF NOT EXISTS share_versions (
+            owner TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+
+        -- Web sessions shared by all workers (see session_store)
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            last_access REAL NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_username ON sessions (username);
+        CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions (last_access);
+    """
+
+    def __init__(self, path, timeout=5.0):
+        """
+        Open (and create if needed) the database.
+
+        Args:
+            path: Path of the SQLite database file
+            timeout: Seconds to wait for another writer's lock
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        self.connection().executescript(self.SCHEMA)
+
+    def connection(self):
+        """Get the connection of the current thread in this process."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed statements in one write transaction."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # Users
+
+    def get_user(self, username):
+        """
+        Load a user record.
+
+        Args:
+            username: Name of the user
+
+        Returns:
+            dict: User data or None if the user doesn't exist
+        """
+        row = self.connection().execute(
+            "SELECT data FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_user(self, username, user_data):
+        """Create or replace a user record."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO users (username, data) VALUES (?, ?)",
+                (username, json.dumps(user_data))
+            )
+
+    def add_user(self, username, user_data):
+        """
+        Create a user record unless the name is taken.
+
+        Returns:
+            bool: True if the user was created, False if it already existed
+        """
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO users (username, data) VALUES (?, ?)",
+                (username, json.dumps(user_data))
+            )
+            return cursor.rowcount == 1
+
+    # Shares
+
+    def get_share(self, share_id):
+        """Load a share or None if it doesn't exist."""
+        row = self.connection().execute(
+            "SELECT data FROM shares WHERE share_id = ?", (share_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_share(self, share_id, share_data):
+        """Create or replace a share."""
+        with self.transaction() as conn:
+            self._write_share(conn, share_id, share_data)
+
+    @contextmanager
+    def update_share(self, share_id):
+        """
+        Load a share for a read-modify-write that other workers can't interleave with.
+
+        Yields the share data (None if it doesn't exist); changes made to it
+        are written back when the block exits without an exception, and the
+        share isn't written (nor the owner's share version bumped) if there
+        are none.
+        """
+        with self.transaction() as conn:
+            row = conn.execute("SELECT data FROM shares WHERE share_id = ?", (share_id,)).fetchone()
+            share_data = json.loads(row[0]) if row else None
+            yield share_data
+            if share_data is not None and share_data != json.loads(row[0]):
+                self._write_share(conn, share_id, share_data)
+
+    def get_owner_shares(self, owner):
+        """
+        Load all shares created by a user.
+
+        Returns:
+            list: (share_id, share_data) tuples
+        """
+        rows = self.connection().execute(
+            "SELECT share_id, data FROM shares WHERE owner = ? ORDER BY expires_at", (owner,)
+        ).fetchall()
+        return [(share_id, json.loads(data)) for share_id, data in rows]
+
+    def delete_expired_shares(self, before):
+        """
+        Delete shares that expired before the given time.
+
+        Returns:
+            int: Number of deleted shares
+        """
+        with self.transaction() as conn:
+            owners = conn.execute("SELECT DISTINCT owner FROM shares WHERE expires_at < ?", (before,)).fetchall()
+            for (owner,) in owners:
+                self._bump_share_version(conn, owner)
+            return conn.execute("DELETE FROM shares WHERE expires_at < ?", (before,)).rowcount
+
+    def count_expired_shares(self, owner, now):
+        """Count an owner's shares whose expiry time has passed."""
+        row = self.connection().execute(
+            "SELECT COUNT(*) FROM shares WHERE owner = ? AND expires_at <= ?", (owner, now)
+        ).fetchone()
+        return row[0]
+
+    def get_share_version(self, owner):
+        """
+        Get the version of an owner's shares, incremented on every change.
+
+        Returns:
+            int: Version number (0 for an owner who never shared)
+        """
+        row = self.connection().execute(
+            "SELECT version FROM share_versions WHERE owner = ?", (owner,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _write_share(self, conn, share_id, share_data):
+        conn.execute(
+            "INSERT OR REPLACE INTO shares (share_id, owner, expires_at, data) VALUES (?, ?, ?, ?)",
+            (share_id, share_data.get("owner", ""), share_data.get("expires_at", 0), json.dumps(share_data))
+        )
+        self._bump_share_version(conn, share_data.get("owner", ""))
+
+    @staticmethod
+    def _bump_share_version(conn, owner):
+        conn.execute(
+            "INSERT INTO share_versions (owner, version) VALUES (?, 1) "
+            "ON CONFLICT (owner) DO UPDATE SET version = version + 1",
+            (owner,)
+        )
+
+    # Sessions
+
+    def get_session(self, session_id):
+        """Load a session record or None if it doesn't exist."""
+        row = self.connection().execute(
+            "SELECT data, last_access FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        record["last_access"] = row[1]
+        return record
+
+    def save_session(self, session_id, record):
+        """Create or replace a session record."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, username, last_access, data) VALUES (?, ?, ?, ?)",
+                (session_id, record["username"], record["last_access"], json.dumps(record))
+            )
+
+    def touch_session(self, session_id, last_access):
+        """Update the last access time of a session."""
+        with self.transaction() as conn:
+            conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (last_access, session_id))
+
+    def delete_session(self, session_id):
+        """Delete a session record."""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def delete_user_sessions(self, username):
+        """Delete all session records of a user."""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE username = ?", (username,))
+
+    def delete_idle_sessions(self, before):
+        """
+        Delete sessions last used before the given time.
+
+        Returns:
+            int: Number of deleted sessions
+        """
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM sessions WHERE last_access < ?", (before,)).rowcount
+
+    # Vaults
+
+    def open_vault(self, owner, crypto_manager):
+        """
+        Open a user's vault for per-entry reads and writes.
+
+        Args:
+            owner: Name of the user
+            crypto_manager: CryptoManager used to encrypt/decrypt records
+
+        Returns:
+            SQLiteVault: The opened vault
+        """
+        return SQLiteVault(self, owner, crypto_manager)
+
+    def import_raw_vault(self, owner, records, legacy_blob=None):
+        """
+        Import encrypted vault records without decrypting them.
+
+        Args:
+            owner: Name of the user
+            records: (entry_id, encrypted payload) tuples in vault order
+            legacy_blob: Single-blob vault to split on the owner's next unlock
+        """
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM vault_records WHERE owner = ?", (owner,))
+            conn.execute("DELETE FROM legacy_vaults WHERE owner = ?", (owner,))
+            conn.executemany(
+                "INSERT INTO vault_records (owner, entry_id, position, payload) VALUES (?, ?, ?, ?)",
+                [(owner, entry_id, position, payload) for position, (entry_id, payload) in enumerate(records)]
+            )
+            if legacy_blob:
+                conn.execute("INSERT INTO legacy_vaults (owner, payload) VALUES (?, ?)", (owner, legacy_blob))
+            self.bump_vault_version(conn, owner)
+
+    @staticmethod
+    def bump_vault_version(conn, owner):
+        """Increment a vault's version inside the caller's transaction."""
+        conn.execute(
+            "INSERT INTO vault_versions (owner, version) VALUES (?, 1) "
+            "ON CONFLICT (owner) DO UPDATE SET version = version + 1",
+            (owner,)
+        )
+
+class SQLiteVault:
+    """A user's vault stored as one encrypted row per entry, with the VaultStore interface."""
+
+    def __init__(self, store, owner, crypto_manager):
+        """
+        Open a vault.
+
+        Args:
+            store: SQLiteStore holding the vault
+            owner: Name of the user
+            crypto_manager: CryptoManager used to encrypt/decrypt records
+        """
+        self.store = store
+        self.owner = owner
+        self.crypto_manager = crypto_manager
+        self._split_legacy_vault()
+
+    def is_legacy(self):
+        return False
+
+    def upgrade(self):
+        """Nothing to do: imported single-blob vaults are split when opened."""
+
+    def entry_ids(self):
+        """
+        Get the ids of all live entries.
+
+        Returns:
+            list: Entry ids in insertion order
+        """
+        rows = self.store.connection().execute(
+            "SELECT entry_id FROM vault_records WHERE owner = ? ORDER BY position", (self.owner,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def version(self):
+        """
+        Get the vault's version, incremented on every change.
+
+        Returns:
+            int: Version number (0 for a vault that was never written)
+        """
+        row = self.store.connection().execute(
+            "SELECT version FROM vault_versions WHERE owner = ?", (self.owner,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def __len__(self):
+        return self.store.connection().execute(
+            "SELECT COUNT(*) FROM vault_records WHERE owner = ?", (self.owner,)
+        ).fetchone()[0]
+
+    def __contains__(self, entry_id):
+        return self.store.connection().execute(
+            "SELECT 1 FROM vault_records WHERE owner = ? AND entry_id = ?", (self.owner, entry_id)
+        ).fetchone() is not None
+
+    def get_entry(self, entry_id, include_secrets=True):
+        """
+        Read and decrypt a single entry.
+
+        Returns:
+            dict: The entry or None if it does not exist
+        """
+        row = self.store.connection().execute(
+            "SELECT payload FROM vault_records WHERE owner = ? AND entry_id = ?", (self.owner, entry_id)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._decrypt(entry_id, row[0], include_secrets)
+
+    def load_entries(self, include_secrets=True):
+        """
+        Read and decrypt all live entries.
+
+        Args:
+            include_secrets: If False, only the metadata of each entry is decrypted
+
+        Returns:
+            list: Entry dictionaries in insertion order
+        """
+        rows = self.store.connection().execute(
+            "SELECT entry_id, payload FROM vault_records WHERE owner = ? ORDER BY position", (self.owner,)
+        ).fetchall()
+        entries = []
+        for entry_id, payload in rows:
+            entry = self._decrypt(entry_id, payload, include_secrets)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def put_entry(self, entry):
+        """
+        Add or replace an entry. Edited entries keep their position.
+
+        Returns:
+            str: Id of the written entry
+        """
+        if not entry.get("id"):
+            entry["id"] = VaultStore.new_entry_id()
+        payload = self.crypto_manager.encrypt_entry(entry)
+
+        with self.store.transaction() as conn:
+            self._write(conn, entry["id"], payload)
+        return entry["id"]
+
+    def delete_entry(self, entry_id):
+        """
+        Delete an entry.
+
+        Returns:
+            bool: True if the entry existed, False otherwise
+        """
+        with self.store.transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM vault_records WHERE owner = ? AND entry_id = ?", (self.owner, entry_id)
+            )
+            if cursor.rowcount != 1:
+                return False
+            self.store.bump_vault_version(conn, self.owner)
+            return True
+
+    def write_batch(self, changes):
+        """
+        Add, replace and delete several entries in one transaction.
+
+        Args:
+            changes: List of ("put", entry) and ("delete", entry_id) tuples,
+                     applied in order; entries without an id get one
+        """
+        records = []
+        for op, value in changes:
+            if op == "put":
+                if not value.get("id"):
+                    value["id"] = VaultStore.new_entry_id()
+                records.append((op, value["id"], self.crypto_manager.encrypt_entry(value)))
+            else:
+                records.append((op, value, None))
+
+        with self.store.transaction() as conn:
+            for op, entry_id, payload in records:
+                if op == "put":
+                    self._write(conn, entry_id, payload)
+                else:
+                    conn.execute(
+                        "DELETE FROM vault_records WHERE owner = ? AND entry_id = ?", (self.owner, entry_id)
+                    )
+                    self.store.bump_vault_version(conn, self.owner)
+
+    def refresh(self):
+        """Nothing is cached in memory; always reads the database."""
+        return False
+
+    def compact(self):
+        """Rows are updated in place; there is nothing to compact."""
+        return True
+
+    def _write(self, conn, entry_id, payload):
+        updated = conn.execute(
+            "UPDATE vault_records SET payload = ? WHERE owner = ? AND entry_id = ?",
+            (payload, self.owner, entry_id)
+        ).rowcount
+        if not updated:
+            conn.execute(
+                "INSERT INTO vault_records (owner, entry_id, position, payload) "
+                "SELECT ?, ?, COALESCE(MAX(position), -1) + 1, ? FROM vault_records WHERE owner = ?",
+                (self.owner, entry_id, payload, self.owner)
+            )
+        self.store.bump_vault_version(conn, self.owner)
+
+    def _decrypt(self, entry_id, payload, include_secrets=True):
+        entry = self.crypto_manager.decrypt_entry(payload, include_secrets)
+        if entry is None:
+            return None
+        entry["id"] = entry_id
+        return entry
+
+    def _split_legacy_vault(self):
+        """Turn an imported single-blob vault into per-entry rows, now that the key is known."""
+        conn = self.store.connection()
+        if conn.execute("SELECT 1 FROM legacy_vaults WHERE owner = ?", (self.owner,)).fetchone() is None:
+            return
+
+        with self.store.transaction() as conn:
+            row = conn.execute("SELECT payload FROM legacy_vaults WHERE owner = ?", (self.owner,)).fetchone()
+            if row is None:
+                return
+            data = self.crypto_manager.decrypt_data(row[0])
+            if not data or not isinstance(data, dict):
+                raise ValueError("Could not decrypt vault")
+
+            for entry in data.get("entries", []):
+                if not entry.get("id"):
+                    entry["id"] = VaultStore.new_entry_id()
+                self._write(conn, entry["id"], self.crypto_manager.encrypt_entry(entry))
+            conn.execute("DELETE FROM legacy_vaults WHERE owner = ?", (self.owner,))
@@ -1,10 +1,15 @@
 document.addEventListener('DOMContentLoaded', function() {
     // State
     let passwordEntries = [];
+    let entriesById = new Map();
+    let nextCursor = null;
+    let passwordsRequest = 0;
+    let searchTimer = null;
+    let vaultCategories = [];
     let categories = ['All'];
     let selectedCategory = 'All';
     let searchText = '';
-    let currentEntryId = -1;
+    let currentEntryId = null;
     
     // DOM Elements - Navigation
     const navItems = document.querySelectorAll('.nav-item');
@@ -14,6 +19,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const passwordList = document.getElementById('password-list');
     const emptyPasswordsMessage = document.getElementById('empty-passwords');
     const searchInput = document.getElementById('password-search');
+    const loadMoreBtn = document.getElementById('load-more-passwords');
     const categoryFilter = document.getElementById('category-filter');
     const addPasswordBtn = document.querySelector('.add-password-btn');
     
@@ -107,6 +113,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const clipboardTimeout = document.getElementById('clipboard-timeout');
     const autoLogout = document.getElementById('auto-logout');
     const backupPasswordsBtn = document.getElementById('backup-passwords');
+    const importPasswordsBtn = document.getElementById('import-passwords');
+    const importFileInput = document.getElementById('import-file');
     const saveSettingsBtn = document.getElementById('save-settings');
     
     // Initialize
@@ -171,30 +179,69 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    // Password List Functions
-    function loadPasswords() {
-        fetch('/api/passwords')
-            .then(response => response.json())
-            .then(data => {
-                passwordEntries = data.entries || [];
-                
-                // Extract categories
-                const categorySet = new Set(['All']);
-                passwordEntries.forEach(entry => {
-                    if (entry.category) {
-                        categorySet.add(entry.category);
+    // Responses of GET requests by URL, revalidated with their ETag
+    const ETAG_CACHE_SIZE = 50;
+    const etagCache = new Map();
+    
+    // GET JSON, sending the ETag of the cached response so an unchanged one comes back as 304
+    function fetchJsonCached(url) {
+        const cached = etagCache.get(url);
+        const headers = cached ? { 'If-None-Match': cached.etag } : {};
+        
+        return fetch(url, { headers })
+            .then(response => {
+                if (response.status === 304 && cached) {
+                    return cached.data;
+                }
+                return response.json().then(data => {
+                    const etag = response.headers.get('ETag');
+                    if (response.ok && etag) {
+                        etagCache.delete(url);
+                        etagCache.set(url, { etag, data });
+                        if (etagCache.size > ETAG_CACHE_SIZE) {
+                            etagCache.delete(etagCache.keys().next().value);
+                        }
                     }
+                    return data;
                 });
-                categories = Array.from(categorySet).sort();
-                
-                // Update category filter
-                updateCategoryDropdown();
-                
-                // Update categories datalist for the form
-                updateCategoriesDatalist();
+            });
+    }
+    
+    // Password List Functions
+    const PAGE_SIZE = 100;
+    
+    // Load the first page matching the search and category, or the next page if append is set
+    function loadPasswords(append = false) {
+        const params = new URLSearchParams({ limit: PAGE_SIZE, sort: 'title' });
+        if (selectedCategory !== 'All') {
+            params.set('category', selectedCategory);
+        }
+        if (searchText) {
+            params.set('q', searchText);
+        }
+        if (append && nextCursor) {
+            params.set('cursor', nextCursor);
+        }
+        
+        // Responses to superseded requests (e.g. while typing) are ignored
+        const requestNumber = ++passwordsRequest;
+        
+        fetchJsonCached(`/api/passwords?${params}`)
+            .then(data => {
+                if (requestNumber !== passwordsRequest) {
+                    return;
+                }
+                if (data.error) {
+                    throw new Error(data.error);
+                }
                 
-                // Display passwords
-                displayFilteredPasswords();
+                // Cached responses are shared, so the list is always a new array
+                const page = (data.entries || []).slice();
+                passwordEntries = append ? passwordEntries.concat(page) : page;
+                entriesById = new Map(passwordEntries.map(entry => [entry.id, entry]));
+                nextCursor = data.next_cursor || null;
+                vaultCategories = data.categories || [];
+                refreshPasswordList();
             })
             .catch(error => {
                 console.error('Error loading passwords:', error);
@@ -202,6 +249,47 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
+    // Apply an added or updated entry returned by the server without reloading the list
+    function upsertEntry(entry) {
+        if (entriesById.has(entry.id)) {
+            passwordEntries = passwordEntries.map(item => item.id === entry.id ? entry : item);
+        } else {
+            passwordEntries = passwordEntries.concat([entry]);
+        }
+        entriesById.set(entry.id, entry);
+        refreshPasswordList();
+    }
+    
+    function removeEntry(entryId) {
+        passwordEntries = passwordEntries.filter(item => item.id !== entryId);
+        entriesById.delete(entryId);
+        refreshPasswordList();
+    }
+    
+    function refreshPasswordList() {
+        // Categories of the whole vault, plus any added since it was loaded
+        const categorySet = new Set(['All', ...vaultCategories]);
+        passwordEntries.forEach(entry => {
+            if (entry.category) {
+                categorySet.add(entry.category);
+            }
+        });
+        categories = Array.from(categorySet).sort();
+        
+        // Update category filter
+        updateCategoryDropdown();
+        
+        // Update categories datalist for the form
+        updateCategoriesDatalist();
+        
+        // Display passwords
+        displayFilteredPasswords();
+        
+        if (loadMoreBtn) {
+            loadMoreBtn.style.display = nextCursor ? 'block' : 'none';
+        }
+    }
+    
     function displayFilteredPasswords() {
         const filtered = filterPasswords();
         
@@ -230,8 +318,8 @@ document.addEventListener('DOMContentLoaded', function() {
             emptyPasswordsMessage.style.display = 'none';
             
             // Create password items
-            filtered.forEach((entry, index) => {
-                createPasswordItem(entry, index);
+            filtered.forEach(entry => {
+                createPasswordItem(entry);
             });
         }
     }
@@ -249,8 +337,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     entry.title || '',
                     entry.username || '',
                     entry.website || '',
-                    entry.category || '',
-                    entry.notes || ''
+                    entry.category || ''
                 ].map(field => field.toLowerCase());
                 
                 return searchFields.some(field => field.includes(searchText.toLowerCase()));
@@ -260,10 +347,10 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    function createPasswordItem(entry, index) {
+    function createPasswordItem(entry) {
         const item = document.createElement('div');
         item.className = 'password-item';
-        item.setAttribute('data-entry-index', index);
+        item.setAttribute('data-entry-id', entry.id);
         
         // HTML for the password item
         item.innerHTML = `
@@ -282,10 +369,10 @@ document.addEventListener('DOMContentLoaded', function() {
         `;
         
         // Add click handlers
-        item.addEventListener('click', () => viewPassword(index));
+        item.addEventListener('click', () => viewPassword(entry.id));
         item.querySelector('.view-password-btn').addEventListener('click', (e) => {
             e.stopPropagation();
-            viewPassword(index);
+            viewPassword(entry.id);
         });
         
         passwordList.appendChild(item);
@@ -329,6 +416,10 @@ document.addEventListener('DOMContentLoaded', function() {
             searchInput.addEventListener('input', () => {
                 searchText = searchInput.value;
                 displayFilteredPasswords();
+                
+                // Ask the server once typing pauses
+                clearTimeout(searchTimer);
+                searchTimer = setTimeout(() => loadPasswords(), 250);
             });
         }
         
@@ -337,9 +428,15 @@ document.addEventListener('DOMContentLoaded', function() {
             categoryFilter.addEventListener('change', () => {
                 selectedCategory = categoryFilter.value;
                 displayFilteredPasswords();
+                loadPasswords();
             });
         }
         
+        // Next page
+        if (loadMoreBtn) {
+            loadMoreBtn.addEventListener('click', () => loadPasswords(true));
+        }
+        
         // Add password button
         if (addPasswordBtn) {
             addPasswordBtn.addEventListener('click', showAddPasswordModal);
@@ -439,7 +536,7 @@ document.addEventListener('DOMContentLoaded', function() {
         // Reset form
         passwordForm.reset();
         entryIdInput.value = '';
-        currentEntryId = -1;
+        currentEntryId = null;
         
         // Set modal title
         passwordModalTitle.textContent = 'Add Password';
@@ -448,40 +545,41 @@ document.addEventListener('DOMContentLoaded', function() {
         openModal(passwordModal);
     }
     
-    function showEditPasswordModal(entryIndex) {
+    function showEditPasswordModal(entryId) {
         // Get entry
-        const entry = passwordEntries[entryIndex];
-        currentEntryId = entryIndex;
+        const entry = entriesById.get(entryId);
+        currentEntryId = entryId;
         
         // Fill form with entry data
         titleInput.value = entry.title || '';
         websiteInput.value = entry.website || '';
         usernameInput.value = entry.username || '';
         
-        // For encrypted password, we need to decrypt it first
-        if (entry.password_hidden) {
-            // Decrypt password
-            fetch(`/api/passwords/decrypt/${entryIndex}`)
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        passwordInput.value = data.password;
-                    } else {
-                        passwordInput.value = '';
-                        showToast('Failed to decrypt password.', 'error');
-                    }
-                })
-                .catch(error => {
-                    console.error('Error decrypting password:', error);
-                    showToast('Failed to decrypt password.', 'error');
-                });
-        } else {
-            passwordInput.value = entry.password || '';
-        }
-        
         categoryInput.value = entry.category || '';
-        notesInput.value = entry.notes || '';
-        entryIdInput.value = entryIndex;
+        entryIdInput.value = entryId;
+        
+        // The password and notes aren't in the list; fetch (and decrypt) them.
+        // A password that can't be decrypted stays as the placeholder, which
+        // keeps the stored one when the entry is saved.
+        passwordInput.value = '********';
+        notesInput.value = '';
+        fetch(`/api/passwords/decrypt/${encodeURIComponent(entryId)}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    throw new Error(data.error);
+                }
+                notesInput.value = data.notes || '';
+                if (data.password === null) {
+                    showToast('Failed to decrypt password.', 'error');
+                } else {
+                    passwordInput.value = data.password || '';
+                }
+            })
+            .catch(error => {
+                console.error('Error decrypting password:', error);
+                showToast('Failed to decrypt password.', 'error');
+            });
         
         // Set modal title
         passwordModalTitle.textContent = 'Edit Password';
@@ -492,7 +590,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     function savePassword() {
         // Get form data
-        const entryId = entryIdInput.value !== '' ? parseInt(entryIdInput.value) : -1;
+        const entryId = entryIdInput.value;
         const entry = {
             title: titleInput.value,
             website: websiteInput.value,
@@ -513,9 +611,9 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
         
-        if (entryId >= 0) {
+        if (entryId) {
             // Update existing password
-            fetch(`/api/passwords/${entryId}`, {
+            fetch(`/api/passwords/${encodeURIComponent(entryId)}`, {
                 method: 'PUT',
                 headers: {
                     'Content-Type': 'application/json'
@@ -526,7 +624,7 @@ document.addEventListener('DOMContentLoaded', function() {
             .then(data => {
                 if (data.success) {
                     showToast('Password updated successfully!', 'success');
-                    loadPasswords();
+                    upsertEntry(data.entry);
                     closePasswordModal();
                 } else {
                     showToast(data.error || 'Failed to update password.', 'error');
@@ -549,7 +647,7 @@ document.addEventListener('DOMContentLoaded', function() {
             .then(data => {
                 if (data.success) {
                     showToast('Password added successfully!', 'success');
-                    loadPasswords();
+                    upsertEntry(data.entry);
                     closePasswordModal();
                 } else {
                     showToast(data.error || 'Failed to add password.', 'error');
@@ -565,7 +663,7 @@ document.addEventListener('DOMContentLoaded', function() {
     function closePasswordModal() {
         closeModal(passwordModal);
         passwordForm.reset();
-        currentEntryId = -1;
+        currentEntryId = null;
     }
     
     // View Password Functions
@@ -670,9 +768,9 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    function viewPassword(entryIndex) {
-        const entry = passwordEntries[entryIndex];
-        currentEntryId = entryIndex;
+    function viewPassword(entryId) {
+        const entry = entriesById.get(entryId);
+        currentEntryId = entryId;
         
         // Set view details
         viewTitle.textContent = entry.title || 'Untitled';
@@ -696,27 +794,25 @@ document.addEventListener('DOMContentLoaded', function() {
             viewModified.textContent = 'Unknown';
         }
         
-        // For encrypted password, we need to decrypt it first
-        if (entry.password_hidden) {
-            viewPasswordField.value = '********';
-            
-            // Decrypt password
-            fetch(`/api/passwords/decrypt/${entryIndex}`)
-                .then(response => response.json())
-                .then(data => {
-                    if (data.success) {
-                        viewPasswordField.value = data.password;
-                    } else {
-                        showToast('Failed to decrypt password.', 'error');
-                    }
-                })
-                .catch(error => {
-                    console.error('Error decrypting password:', error);
+        // The password and notes aren't in the list; fetch (and decrypt) them
+        viewPasswordField.value = '********';
+        fetch(`/api/passwords/decrypt/${encodeURIComponent(entryId)}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    throw new Error(data.error);
+                }
+                viewNotes.textContent = data.notes || '';
+                if (data.password === null) {
                     showToast('Failed to decrypt password.', 'error');
-                });
-        } else {
-            viewPasswordField.value = entry.password || '';
-        }
+                } else {
+                    viewPasswordField.value = data.password || '';
+                }
+            })
+            .catch(error => {
+                console.error('Error decrypting password:', error);
+                showToast('Failed to decrypt password.', 'error');
+            });
         
         // Show/hide visit button based on whether there's a website
         if (entry.website && (entry.website.startsWith('http://') || entry.website.startsWith('https://'))) {
@@ -729,15 +825,15 @@ document.addEventListener('DOMContentLoaded', function() {
         openModal(viewPasswordModal);
     }
     
-    function deletePassword(entryIndex) {
-        fetch(`/api/passwords/${entryIndex}`, {
+    function deletePassword(entryId) {
+        fetch(`/api/passwords/${encodeURIComponent(entryId)}`, {
             method: 'DELETE'
         })
         .then(response => response.json())
         .then(data => {
             if (data.success) {
                 showToast('Password deleted successfully!', 'success');
-                loadPasswords();
+                removeEntry(entryId);
             } else {
                 showToast(data.error || 'Failed to delete password.', 'error');
             }
@@ -854,7 +950,7 @@ document.addEventListener('DOMContentLoaded', function() {
         // Generate share button
         if (generateShareBtn) {
             generateShareBtn.addEventListener('click', function() {
-                const entryId = parseInt(shareEntryId.value);
+                const entryId = shareEntryId.value;
                 const expHours = parseInt(expirationTime.value);
                 const accCount = parseInt(accessCount.value);
                 
@@ -950,11 +1046,11 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    function showShareModal(entryIndex) {
-        const entry = passwordEntries[entryIndex];
+    function showShareModal(entryId) {
+        const entry = entriesById.get(entryId);
         
         // Set share details
-        shareEntryId.value = entryIndex;
+        shareEntryId.value = entryId;
         shareTitle.textContent = entry.title || 'Untitled';
         
         // Reset to step 1
@@ -1024,8 +1120,7 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     function loadSharedPasswords() {
-        fetch('/api/shares')
-            .then(response => response.json())
+        fetchJsonCached('/api/shares')
             .then(data => {
                 const shares = data.shares || [];
                 
@@ -1058,6 +1153,24 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // Time left before a share expires, counted from its expiry time so
+    // that cached responses stay correct
+    function remainingText(share) {
+        const remainingSeconds = Math.max(0, share.expires_at - Date.now() / 1000);
+        const remainingHours = remainingSeconds / 3600;
+        
+        if (share.expired || remainingSeconds === 0) {
+            return 'Expired';
+        } else if (remainingHours < 1) {
+            return `${Math.floor(remainingSeconds / 60)} minutes remaining`;
+        } else if (remainingHours < 24) {
+            return `${Math.floor(remainingHours)} hours remaining`;
+        } else if (remainingHours < 48) {
+            return '1 day remaining';
+        }
+        return `${Math.floor(remainingHours / 24)} days remaining`;
+    }
+    
     function createSharedItem(share) {
         const item = document.createElement('div');
         item.className = 'shared-item';
@@ -1067,7 +1180,7 @@ document.addEventListener('DOMContentLoaded', function() {
             <div class="share-id">Share ID: ${share.id.substring(0, 8)}...</div>
             <div class="share-dates">Created: ${share.created_at_formatted} • Expires: ${share.expires_at_formatted}</div>
             <div class="share-status">
-                <span class="remaining-time">${share.remaining_text}</span>
+                <span class="remaining-time">${remainingText(share)}</span>
                 <span class="access-count">
                     ${share.access_count_limit > 0 
                         ? `Accessed ${share.access_count_current}/${share.access_count_limit} times`
@@ -1245,8 +1358,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Settings Functions
     function initSettingsHandlers() {
         // Load current settings
-        fetch('/api/settings')
-        .then(response => response.json())
+        fetchJsonCached('/api/settings')
         .then(settings => {
             // Apply loaded settings to form
             if (themeMode && settings.theme_mode) {
@@ -1313,8 +1425,91 @@ document.addEventListener('DOMContentLoaded', function() {
         // Backup passwords button
         if (backupPasswordsBtn) {
             backupPasswordsBtn.addEventListener('click', function() {
-                // In a real implementation, this would trigger a download
-                showToast('Backup created successfully!', 'success');
+                const passphrase = prompt('Choose a passphrase to encrypt the backup with:');
+                if (passphrase === null) {
+                    return;
+                }
+                if (passphrase.length < 8) {
+                    showToast('Passphrase must be at least 8 characters long', 'error');
+                    return;
+                }
+                
+                // The server streams the encrypted export; save it as a file
+                fetch('/api/export', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify({ passphrase: passphrase })
+                })
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`Export failed with status ${response.status}`);
+                    }
+                    return response.blob();
+                })
+                .then(blob => {
+                    const url = URL.createObjectURL(blob);
+                    const link = document.createElement('a');
+                    link.href = url;
+                    link.download = 'securepass-backup.spx';
+                    document.body.appendChild(link);
+                    link.click();
+                    link.remove();
+                    URL.revokeObjectURL(url);
+                    showToast('Backup created successfully!', 'success');
+                })
+                .catch(error => {
+                    console.error('Error creating backup:', error);
+                    showToast('Failed to create backup', 'error');
+                });
+            });
+        }
+        
+        // Import passwords button
+        if (importPasswordsBtn && importFileInput) {
+            importPasswordsBtn.addEventListener('click', function() {
+                importFileInput.click();
+            });
+            
+            importFileInput.addEventListener('change', function() {
+                const file = this.files[0];
+                if (!file) {
+                    return;
+                }
+                
+                const formData = new FormData();
+                formData.append('file', file);
+                this.value = '';
+                
+                // Backups made with "Create Backup" are opened with their passphrase
+                if (file.name.toLowerCase().endsWith('.spx')) {
+                    const passphrase = prompt('Enter the passphrase of the backup:');
+                    if (passphrase === null) {
+                        return;
+                    }
+                    formData.append('passphrase', passphrase);
+                }
+                
+                showToast('Importing passwords...', 'info');
+                fetch('/api/import', {
+                    method: 'POST',
+                    body: formData
+                })
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        showToast(data.error || 'Failed to import passwords.', 'error');
+                        return;
+                    }
+                    const report = data.report;
+                    showToast(`Imported ${report.imported} passwords, skipped ${report.duplicates} duplicates`, 'success');
+                    loadPasswords();
+                })
+                .catch(error => {
+                    console.error('Error importing passwords:', error);
+                    showToast('Failed to import passwords', 'error');
+                });
             });
         }
         
@@ -2,7 +2,9 @@ import os
 import json
 import base64
 from pathlib import Path
-from datetime import datetime
+from vault_store import VaultStore
+from backup_manager import BackupManager
+from durable_io import atomic_write, atomic_write_json
 
 class StorageManager:
     """Manages data storage for the password manager."""
@@ -13,9 +15,12 @@ class StorageManager:
         self.data_dir = os.path.join(str(Path.home()), ".securepass")
         self.config_file = os.path.join(self.data_dir, "config.json")
         self.passwords_file = os.path.join(self.data_dir, "passwords.dat")
+        self.kdf_policy_file = os.path.join(self.data_dir, "kdf_policy.json")
         
         # Ensure directory exists
         self._ensure_data_dir_exists()
+        
+        self.backup_manager = BackupManager(os.path.join(self.data_dir, "backups"))
     
     def _ensure_data_dir_exists(self):
         """Create the data directory if it doesn't exist."""
@@ -37,8 +42,7 @@ class StorageManager:
             bool: True if successful, False otherwise
         """
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(config_data, f)
+            atomic_write_json(self.config_file, config_data)
             return True
         except Exception as e:
             print(f"Error saving master configuration: {e}")
@@ -69,8 +73,7 @@ class StorageManager:
             bool: True if successful, False otherwise
         """
         try:
-            with open(self.passwords_file, 'wb') as f:
-                f.write(encrypted_data)
+            atomic_write(self.passwords_file, encrypted_data)
             return True
         except Exception as e:
             print(f"Error saving encrypted passwords: {e}")
@@ -93,9 +96,25 @@ class StorageManager:
             print(f"Error loading encrypted passwords: {e}")
             return None
     
+    def open_vault(self, crypto_manager):
+        """
+        Open the password vault for per-entry reads and writes.
+        
+        Args:
+            crypto_manager: CryptoManager used to encrypt/decrypt entries
+            
+        Returns:
+            VaultStore: The opened vault
+        """
+        return VaultStore(self.passwords_file, crypto_manager)
+    
     def backup_passwords(self):
         """
-        Create a backup of the passwords file.
+        Create an incremental backup of the password database.
+        
+        The configuration is backed up with the vault because the vault
+        can't be decrypted without it. Old backups are pruned according
+        to the retention policy.
         
         Returns:
             bool: True if successful, False otherwise
@@ -104,16 +123,42 @@ class StorageManager:
             return False
             
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = os.path.join(self.data_dir, f"passwords_backup_{timestamp}.dat")
-            
-            with open(self.passwords_file, 'rb') as source:
-                with open(backup_file, 'wb') as target:
-                    target.write(source.read())
+            snapshot = self.backup_manager.create_snapshot({
+                "passwords.dat": self.passwords_file,
+                "config.json": self.config_file
+            })
+            if snapshot is None:
+                return False
+            self.backup_manager.apply_retention()
             return True
         except Exception as e:
             print(f"Error creating backup: {e}")
             return False
+    
+    def list_backups(self):
+        """
+        Get the available backups.
+        
+        Returns:
+            list: Backup manifests, newest first
+        """
+        try:
+            return self.backup_manager.list_snapshots()
+        except Exception as e:
+            print(f"Error listing backups: {e}")
+            return []
+    
+    def restore_backup(self, snapshot_id):
+        """
+        Restore the password database and configuration from a backup.
+        
+        Args:
+            snapshot_id: Id of the backup to restore
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.backup_manager.restore_snapshot(snapshot_id)
             
     def get_app_settings(self):
         """
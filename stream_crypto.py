@@ -0,0 +1,165 @@
+import io
+import os
+import struct
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# Stream layout:
+#   header: MAGIC (6 bytes) + format version (1 byte) + chunk size (4 bytes)
+#           + nonce prefix (7 bytes)
+#   chunks: AES-GCM ciphertext + tag of chunk_size plaintext bytes each; the
+#           last chunk holds the remaining 0 to chunk_size bytes
+#
+# A chunk's nonce is the prefix, its 4-byte index and a flag set only on the
+# last chunk, so chunks can't be reordered, and a stream cut at a chunk
+# boundary fails to decrypt instead of looking complete. The header (and any
+# associated data given by the caller) is authenticated with every chunk.
+MAGIC = b"SPSTRM"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">6sBI7s")
+NONCE_FINAL = struct.Struct(">IB")  # chunk index, last chunk flag
+TAG_SIZE = 16
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+class StreamWriter(io.RawIOBase):
+    """Encrypts everything written to it into a file object, one chunk at a time."""
+
+    def __init__(self, fileobj, key, chunk_size=DEFAULT_CHUNK_SIZE, associated_data=b""):
+        """
+        Start a stream; the header is written right away.
+
+        Args:
+            fileobj: Binary file object to write to
+            key: 32-byte AES-256-GCM key
+            chunk_size: Plaintext bytes per chunk
+            associated_data: Bytes the stream is bound to (not written)
+        """
+        super().__init__()
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self._cipher = AESGCM(key)
+        self._nonce_prefix = os.urandom(7)
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, chunk_size, self._nonce_prefix)
+        self._associated_data = header + associated_data
+        self._buffer = bytearray()
+        self._index = 0
+        fileobj.write(header)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        """
+        Buffer data and encrypt every chunk that is complete.
+
+        Returns:
+            int: Number of bytes taken
+        """
+        if self.closed:
+            raise ValueError("write to closed stream")
+        self._buffer += data
+        # A full chunk is held back until more data shows it isn't the last one
+        while len(self._buffer) > self.chunk_size:
+            self._write_chunk(bytes(self._buffer[:self.chunk_size]), final=False)
+            del self._buffer[:self.chunk_size]
+        return len(data)
+
+    def close(self):
+        """Encrypt the remaining data as the last chunk. The file object is left open."""
+        if not self.closed:
+            self._write_chunk(bytes(self._buffer), final=True)
+            self._buffer.clear()
+        super().close()
+
+    def _write_chunk(self, plaintext, final):
+        if self._index > 0xFFFFFFFF:
+            raise ValueError("Stream too long")
+        nonce = self._nonce_prefix + NONCE_FINAL.pack(self._index, final)
+        self.fileobj.write(self._cipher.encrypt(nonce, plaintext, self._associated_data))
+        self._index += 1
+
+class StreamReader(io.RawIOBase):
+    """
+    Decrypts a stream written by StreamWriter while it is read.
+
+    Wrap it in io.BufferedReader (or io.TextIOWrapper) for line access.
+    """
+
+    def __init__(self, fileobj, key, associated_data=b""):
+        """
+        Open a stream; the header is read right away.
+
+        Args:
+            fileobj: Binary file object positioned at the stream header
+            key: 32-byte AES-256-GCM key
+            associated_data: Bytes given to the writer
+
+        Raises:
+            ValueError: If the data isn't a supported stream
+        """
+        super().__init__()
+        self.fileobj = fileobj
+        header = fileobj.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("Not an encrypted stream")
+        magic, version, self.chunk_size, self._nonce_prefix = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("Not an encrypted stream")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported stream format version {version}")
+
+        self._cipher = AESGCM(key)
+        self._associated_data = header + associated_data
+        self._index = 0
+        self._plaintext = b""
+        self._position = 0
+        self._finished = False
+        # One chunk is read ahead: a chunk is the last one if nothing follows it
+        self._next_chunk = self._read_chunk()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        """
+        Read decrypted bytes into a buffer.
+
+        Returns:
+            int: Number of bytes read, 0 at the end of the stream
+
+        Raises:
+            ValueError: If the stream was modified or cut short
+        """
+        while self._position >= len(self._plaintext):
+            if self._finished:
+                return 0
+            self._decrypt_next()
+
+        count = min(len(buffer), len(self._plaintext) - self._position)
+        buffer[:count] = self._plaintext[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def _read_chunk(self):
+        size = self.chunk_size + TAG_SIZE
+        data = self.fileobj.read(size)
+        # Unbuffered file objects may return less than asked before the end
+        while data and len(data) < size:
+            more = self.fileobj.read(size - len(data))
+            if not more:
+                break
+            data += more
+        return data
+
+    def _decrypt_next(self):
+        chunk = self._next_chunk
+        self._next_chunk = self._read_chunk()
+        final = not self._next_chunk
+        nonce = self._nonce_prefix + NONCE_FINAL.pack(self._index, final)
+        try:
+            self._plaintext = self._cipher.decrypt(nonce, chunk, self._associated_data)
+        except InvalidTag:
+            raise ValueError("Encrypted stream is corrupt or incomplete") from None
+        self._position = 0
+        self._index += 1
+        self._finished = final
@@ -1,4 +1,5 @@
 import customtkinter as ctk
+from tkinter import filedialog
 from typing import List, Dict, Any
 from ui.password_entry_frame import PasswordEntryFrame
 from ui.generator_frame import GeneratorFrame
@@ -8,19 +9,24 @@ from ui.share_dialog import ShareDialog
 from ui.access_shared_dialog import AccessSharedDialog
 from password_generator import PasswordGenerator
 from sharing_manager import SharingManager
+from export_manager import export_vault
+from import_manager import iter_import, import_entries
+import kdf_registry
 
 class DashboardFrame(ctk.CTkFrame):
     """Main dashboard frame containing password list and management functions."""
     
-    def __init__(self, parent, crypto_manager, storage_manager, theme_manager, on_logout):
+    def __init__(self, parent, crypto_manager, storage_manager, theme_manager, on_logout, on_set_pin=None):
         super().__init__(parent)
         self.parent = parent
         self.crypto_manager = crypto_manager
         self.storage_manager = storage_manager
         self.theme_manager = theme_manager
         self.on_logout = on_logout
+        self.on_set_pin = on_set_pin
         self.password_generator = PasswordGenerator()
         self.sharing_manager = SharingManager(storage_manager, crypto_manager)
+        self.vault = None
         
         # Data storage
         self.password_entries = []
@@ -131,6 +137,30 @@ class DashboardFrame(ctk.CTkFrame):
         )
         self.settings_button.pack(fill="x", pady=5)
         
+        # Export button
+        self.export_button = ctk.CTkButton(
+            self.nav_buttons_frame,
+            text="Export",
+            command=self.show_export_dialog,
+            fg_color="transparent",
+            text_color=("gray10", "gray90"),
+            hover_color=("gray70", "gray30"),
+            anchor="w"
+        )
+        self.export_button.pack(fill="x", pady=5)
+        
+        # Import button
+        self.import_button = ctk.CTkButton(
+            self.nav_buttons_frame,
+            text="Import",
+            command=self.show_import_dialog,
+            fg_color="transparent",
+            text_color=("gray10", "gray90"),
+            hover_color=("gray70", "gray30"),
+            anchor="w"
+        )
+        self.import_button.pack(fill="x", pady=5)
+        
         # Spacer
         self.sidebar_spacer = ctk.CTkFrame(self.sidebar, fg_color="transparent", height=20)
         self.sidebar_spacer.pack(fill="x", expand=True)
@@ -234,43 +264,37 @@ class DashboardFrame(ctk.CTkFrame):
         self.add_button.place(x=x, y=y)
     
     def load_passwords(self):
-        """Load encrypted passwords from storage."""
-        encrypted_data = self.storage_manager.load_encrypted_passwords()
-        
-        if encrypted_data:
-            try:
-                decrypted_data = self.crypto_manager.decrypt_data(encrypted_data)
-                if decrypted_data and isinstance(decrypted_data, dict) and "entries" in decrypted_data:
-                    self.password_entries = decrypted_data["entries"]
-                    
-                    # Extract categories
-                    categories = set(["All"])
-                    for entry in self.password_entries:
-                        if "category" in entry and entry["category"]:
-                            categories.add(entry["category"])
-                    
-                    self.categories = sorted(list(categories))
-                    self.update_category_dropdown()
-                else:
-                    self.password_entries = []
-            except Exception as e:
-                print(f"Error decrypting passwords: {e}")
-                self.password_entries = []
-        else:
+        """Load the password entries (metadata only) from storage."""
+        try:
+            self.vault = self.storage_manager.open_vault(self.crypto_manager)
+            # Passwords and notes stay encrypted until an entry is viewed
+            self.password_entries = self.vault.load_entries(include_secrets=False)
+            
+            # Extract categories
+            categories = set(["All"])
+            for entry in self.password_entries:
+                if "category" in entry and entry["category"]:
+                    categories.add(entry["category"])
+            
+            self.categories = sorted(list(categories))
+            self.update_category_dropdown()
+        except Exception as e:
+            print(f"Error decrypting passwords: {e}")
             self.password_entries = []
             
         # Display passwords
         self.display_filtered_passwords()
     
-    def save_passwords(self):
-        """Save passwords to encrypted storage."""
-        data = {
-            "entries": self.password_entries,
-            "version": 1
-        }
-        
-        encrypted_data = self.crypto_manager.encrypt_data(data)
-        return self.storage_manager.save_encrypted_passwords(encrypted_data)
+    def save_entry(self, entry):
+        """Write a single added or edited entry to encrypted storage."""
+        if self.vault is None:
+            return False
+        try:
+            self.vault.put_entry(entry)
+            return True
+        except Exception as e:
+            print(f"Error saving password entry: {e}")
+            return False
     
     def update_category_dropdown(self):
         """Update the category dropdown with available categories."""
@@ -311,9 +335,8 @@ class DashboardFrame(ctk.CTkFrame):
                 username = entry.get("username", "").lower()
                 website = entry.get("website", "").lower()
                 category = entry.get("category", "").lower()
-                notes = entry.get("notes", "").lower()
                 
-                search_fields = [title, username, website, category, notes]
+                search_fields = [title, username, website, category]
                 if not any(self.search_text in field for field in search_fields):
                     continue
                     
@@ -429,6 +452,14 @@ class DashboardFrame(ctk.CTkFrame):
     
     def view_password(self, entry):
         """Show dialog to view a password entry."""
+        # The list only holds metadata; decrypt the full entry now. Without
+        # its secrets, editing it would overwrite them with blanks
+        full_entry = self.vault.get_entry(entry["id"]) if self.vault is not None and entry.get("id") else None
+        if full_entry is None:
+            self.show_error_dialog("Password Details", "Could not decrypt this password entry.")
+            return
+        entry = full_entry
+        
         # Create a top level window
         dialog = ctk.CTkToplevel(self)
         dialog.title("Password Details")
@@ -497,9 +528,13 @@ class DashboardFrame(ctk.CTkFrame):
         entry_frame.pack(fill="both", expand=True, padx=10, pady=10)
     
     def add_new_password(self, entry):
-        """Add a new password entry."""
-        # Add the entry to the list
-        self.password_entries.append(entry)
+        """Add a new password entry. Returns True if it was saved."""
+        # Save the new entry (this assigns its id)
+        if not self.save_entry(entry):
+            return False
+        
+        # Add the entry's metadata to the list
+        self.password_entries.append(self.crypto_manager.split_entry(entry)[0])
         
         # Update categories if needed
         if "category" in entry and entry["category"] and entry["category"] not in self.categories:
@@ -507,18 +542,20 @@ class DashboardFrame(ctk.CTkFrame):
             self.categories.sort()
             self.update_category_dropdown()
         
-        # Save passwords
-        self.save_passwords()
-        
         # Refresh display
         self.display_filtered_passwords()
+        return True
     
     def save_edited_password(self, old_entry, new_entry):
-        """Save changes to an existing password entry."""
+        """Save changes to an existing password entry. Returns True if they were saved."""
+        # Save the edited entry
+        if not self.save_entry(new_entry):
+            return False
+        
         # Find the entry in the list
         for i, entry in enumerate(self.password_entries):
-            if entry is old_entry:
-                self.password_entries[i] = new_entry
+            if entry.get("id") == old_entry.get("id"):
+                self.password_entries[i] = self.crypto_manager.split_entry(new_entry)[0]
                 break
         
         # Update categories if needed
@@ -527,22 +564,21 @@ class DashboardFrame(ctk.CTkFrame):
             self.categories.sort()
             self.update_category_dropdown()
         
-        # Save passwords
-        self.save_passwords()
-        
         # Refresh display
         self.display_filtered_passwords()
+        return True
     
     def delete_password(self, entry):
         """Delete a password entry."""
         # Remove the entry from the list
-        self.password_entries.remove(entry)
+        self.password_entries = [item for item in self.password_entries if item.get("id") != entry.get("id")]
         
         # Update categories
         self.update_categories_after_delete()
         
-        # Save passwords
-        self.save_passwords()
+        # Remove it from storage
+        if self.vault is not None and entry.get("id"):
+            self.vault.delete_entry(entry["id"])
         
         # Refresh display
         self.display_filtered_passwords()
@@ -626,7 +662,8 @@ class DashboardFrame(ctk.CTkFrame):
         self.tool_frame = SettingsFrame(
             self.content_frame,
             self.theme_manager,
-            self.storage_manager
+            self.storage_manager,
+            self.on_set_pin
         )
         self.tool_frame.grid(row=0, column=0, rowspan=2, sticky="nsew", padx=10, pady=10)
         
@@ -702,6 +739,178 @@ class DashboardFrame(ctk.CTkFrame):
         """Complete the logout process."""
         dialog.destroy()
         self.on_logout()
+    
+    def show_export_dialog(self):
+        """Ask for a passphrase and export the vault to an encrypted file."""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Export Passwords")
+        dialog.geometry("340x230")
+        dialog.transient(self)
+        dialog.grab_set()
+        
+        label = ctk.CTkLabel(
+            dialog,
+            text="Choose a passphrase for the export.\nIt is needed to open the file.",
+            font=("Roboto", 12)
+        )
+        label.pack(pady=(20, 10))
+        
+        passphrase_entry = ctk.CTkEntry(dialog, placeholder_text="Passphrase", show="*", width=260)
+        passphrase_entry.pack(pady=5)
+        confirm_entry = ctk.CTkEntry(dialog, placeholder_text="Confirm passphrase", show="*", width=260)
+        confirm_entry.pack(pady=5)
+        
+        button_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        button_frame.pack(fill="x", padx=10, pady=10)
+        
+        cancel_button = ctk.CTkButton(
+            button_frame,
+            text="Cancel",
+            width=100,
+            command=dialog.destroy
+        )
+        cancel_button.pack(side="left", padx=10)
+        
+        export_button = ctk.CTkButton(
+            button_frame,
+            text="Export",
+            width=100,
+            command=lambda: self.confirm_export(dialog, label, passphrase_entry.get(), confirm_entry.get())
+        )
+        export_button.pack(side="right", padx=10)
+    
+    def confirm_export(self, dialog, label, passphrase, confirmation):
+        """Write the export once the passphrase is valid and a file was chosen."""
+        if len(passphrase) < 8:
+            label.configure(text="Passphrase must be at least 8 characters long.")
+            return
+        if passphrase != confirmation:
+            label.configure(text="Passphrases do not match.")
+            return
+        
+        path = filedialog.asksaveasfilename(
+            parent=dialog,
+            defaultextension=".spx",
+            filetypes=[("SecurePass export", "*.spx")],
+            initialfile="securepass-backup.spx"
+        )
+        if not path:
+            return
+        
+        # Entries are streamed from the vault, so memory use doesn't grow with its size
+        policy = kdf_registry.load_policy(self.storage_manager.kdf_policy_file)
+        if export_vault(self.vault, path, passphrase, policy):
+            dialog.destroy()
+        else:
+            label.configure(text="Export failed. See the log for details.")
+        
+    def show_import_dialog(self):
+        """Import the passwords of a CSV or JSON export from another password manager, or restore a SecurePass export."""
+        if self.vault is None:
+            return
+        
+        path = filedialog.askopenfilename(
+            parent=self,
+            filetypes=[("Password exports", "*.csv *.json *.spx"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        
+        if path.lower().endswith(".spx"):
+            self.show_restore_dialog(path)
+        else:
+            self.import_file(path)
+        
+    def show_restore_dialog(self, path):
+        """Ask for the passphrase of a SecurePass export, then restore it."""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Restore Backup")
+        dialog.geometry("340x190")
+        dialog.transient(self)
+        dialog.grab_set()
+        
+        label = ctk.CTkLabel(
+            dialog,
+            text="Enter the passphrase of the backup.",
+            font=("Roboto", 12)
+        )
+        label.pack(pady=(20, 10))
+        
+        passphrase_entry = ctk.CTkEntry(dialog, placeholder_text="Passphrase", show="*", width=260)
+        passphrase_entry.pack(pady=5)
+        
+        button_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        button_frame.pack(fill="x", padx=10, pady=10)
+        
+        cancel_button = ctk.CTkButton(
+            button_frame,
+            text="Cancel",
+            width=100,
+            command=dialog.destroy
+        )
+        cancel_button.pack(side="left", padx=10)
+        
+        def restore():
+            passphrase = passphrase_entry.get()
+            dialog.destroy()
+            self.import_file(path, passphrase)
+        
+        restore_button = ctk.CTkButton(
+            button_frame,
+            text="Restore",
+            width=100,
+            command=restore
+        )
+        restore_button.pack(side="right", padx=10)
+        
+    def import_file(self, path, passphrase=None):
+        """Import the entries of a file, showing the progress and result in a dialog."""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Import Passwords")
+        dialog.geometry("340x170")
+        dialog.transient(self)
+        dialog.grab_set()
+        
+        label = ctk.CTkLabel(dialog, text="Importing...", font=("Roboto", 12))
+        label.pack(pady=(30, 10))
+        
+        def show_progress(report):
+            label.configure(text=f"Read {report['read']} items, {report['imported']} to import...")
+            dialog.update_idletasks()
+        
+        # The file is parsed as it is read and the new entries written at once
+        try:
+            with open(path, 'rb') as f:
+                report = import_entries(self.vault, iter_import(f, passphrase), progress=show_progress)
+            label.configure(
+                text=f"Imported {report['imported']} passwords.\n"
+                     f"Skipped {report['duplicates']} duplicates and {report['skipped']} other items."
+            )
+        except ValueError as e:
+            label.configure(text=f"Could not read the file:\n{e}", wraplength=300)
+        except Exception as e:
+            print(f"Error importing passwords: {e}")
+            label.configure(text="Import failed. See the log for details.")
+        
+        close_button = ctk.CTkButton(dialog, text="Close", width=100, command=dialog.destroy)
+        close_button.pack(pady=10)
+        
+        # Show the imported entries
+        self.load_passwords()
+        
+    def show_error_dialog(self, title, message):
+        """Show a message in a small modal dialog."""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title(title)
+        dialog.geometry("340x150")
+        dialog.transient(self)
+        dialog.grab_set()
+        
+        label = ctk.CTkLabel(dialog, text=message, font=("Roboto", 12), wraplength=300)
+        label.pack(pady=(30, 10))
+        
+        ok_button = ctk.CTkButton(dialog, text="OK", width=100, command=dialog.destroy)
+        ok_button.pack(pady=10)
         
     def show_share_dialog(self, entry):
         """Show dialog to share a password securely."""
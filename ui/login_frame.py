@@ -4,15 +4,19 @@ from ui.app_icons import get_lock_icon
 class LoginFrame(ctk.CTkFrame):
     """Frame for user login or initial setup."""
     
-    def __init__(self, parent, auth_manager, on_login_success):
+    def __init__(self, parent, auth_manager, on_login_success, quick_unlock=None):
         super().__init__(parent)
         self.parent = parent
         self.auth_manager = auth_manager
         self.on_login_success = on_login_success
+        self.quick_unlock = quick_unlock
         
         # Check if this is first run
         self.is_first_run = self.auth_manager.is_first_run()
         
+        # A session locked after inactivity can be unlocked with its PIN
+        self.use_pin = quick_unlock is not None and quick_unlock.is_available()
+        
         # Create UI elements
         self.create_widgets()
         
@@ -26,7 +30,10 @@ class LoginFrame(ctk.CTkFrame):
         self.icon_label = ctk.CTkLabel(self.header_frame, text="", image=lock_icon)
         self.icon_label.pack()
         
-        title_text = "Create Master Password" if self.is_first_run else "Enter Master Password"
+        if self.use_pin:
+            title_text = "Enter PIN"
+        else:
+            title_text = "Create Master Password" if self.is_first_run else "Enter Master Password"
         self.title_label = ctk.CTkLabel(
             self.header_frame, 
             text=title_text,
@@ -38,6 +45,8 @@ class LoginFrame(ctk.CTkFrame):
             "This password will be used to secure all your passwords.\n"
             "Make sure it's strong and memorable - you cannot recover it if forgotten!"
         ) if self.is_first_run else "Enter your master password to unlock the password manager"
+        if self.use_pin:
+            description_text = "The password manager was locked after inactivity.\nEnter your PIN to unlock it"
         
         self.description_label = ctk.CTkLabel(
             self.header_frame,
@@ -61,7 +70,7 @@ class LoginFrame(ctk.CTkFrame):
         # Password fields
         self.password_label = ctk.CTkLabel(
             self.form_frame, 
-            text="Master Password:",
+            text="PIN:" if self.use_pin else "Master Password:",
             font=("Roboto", 12, "bold")
         )
         self.password_label.pack(anchor="w", pady=(0, 5))
@@ -69,7 +78,7 @@ class LoginFrame(ctk.CTkFrame):
         self.password_entry = ctk.CTkEntry(
             self.form_frame, 
             width=300, 
-            placeholder_text="Enter your master password",
+            placeholder_text="Enter your PIN" if self.use_pin else "Enter your master password",
             show="•"
         )
         self.password_entry.pack(pady=(0, 15))
@@ -111,6 +120,18 @@ class LoginFrame(ctk.CTkFrame):
         )
         self.submit_button.pack(pady=(5, 0))
         
+        if self.use_pin:
+            self.master_password_button = ctk.CTkButton(
+                self.form_frame,
+                text="Use master password",
+                width=300,
+                fg_color="transparent",
+                border_width=1,
+                text_color=("gray10", "gray90"),
+                command=self.use_master_password
+            )
+            self.master_password_button.pack(pady=(10, 0))
+        
         # Error message
         self.error_label = ctk.CTkLabel(
             self.form_frame,
@@ -135,9 +156,24 @@ class LoginFrame(ctk.CTkFrame):
         if self.is_first_run:
             self.confirm_entry.configure(show=show_char)
     
+    def use_master_password(self, message=""):
+        """
+        Switch from the PIN to the master password.
+        
+        Args:
+            message: Error message to show after switching
+        """
+        self.use_pin = False
+        for widget in self.winfo_children():
+            widget.destroy()
+        self.create_widgets()
+        self.show_error(message)
+    
     def handle_submit(self):
         """Handle button click based on whether this is first run or login."""
-        if self.is_first_run:
+        if self.use_pin:
+            self.handle_pin_unlock()
+        elif self.is_first_run:
             self.handle_create_password()
         else:
             self.handle_login()
@@ -160,10 +196,9 @@ class LoginFrame(ctk.CTkFrame):
             self.show_error("Password must be at least 8 characters long")
             return
             
-        # Create the master password
-        if self.auth_manager.create_master_password(password):
-            # Get the derived key
-            _, key = self.auth_manager.verify_master_password(password)
+        # Create the master password; the key comes back from the same derivation
+        key = self.auth_manager.create_master_password(password)
+        if key:
             self.on_login_success(key)
         else:
             self.show_error("Failed to create master password")
@@ -184,6 +219,25 @@ class LoginFrame(ctk.CTkFrame):
         else:
             self.show_error("Invalid master password")
     
+    def handle_pin_unlock(self):
+        """Handle unlocking a locked session with its PIN."""
+        pin = self.password_entry.get()
+        
+        if not pin:
+            self.show_error("Please enter your PIN")
+            return
+            
+        key = self.quick_unlock.unlock(pin)
+        
+        if key:
+            self.on_login_success(key)
+        elif self.quick_unlock.is_available():
+            self.password_entry.delete(0, "end")
+            self.show_error(f"Invalid PIN ({self.quick_unlock.attempts_left} attempts left)")
+        else:
+            # Too many wrong PINs or the PIN expired: the wrapped key is gone
+            self.use_master_password("PIN unlock is no longer available. Enter your master password")
+    
     def show_error(self, message):
         """Display an error message."""
         self.error_label.configure(text=message)
@@ -384,12 +384,18 @@ class PasswordEntryFrame(ctk.CTkFrame):
         new_entry["modified_at"] = time.time()
         
         # Call the appropriate callback
+        saved = None
         if self.is_new:
             if self.on_save:
-                self.on_save(new_entry)
+                saved = self.on_save(new_entry)
         else:
             if self.on_save:
-                self.on_save(self.entry, new_entry)
+                saved = self.on_save(self.entry, new_entry)
+        
+        # Keep the dialog open if the entry couldn't be written
+        if saved is False:
+            self.show_notification("Could not save the password!")
+            return
                 
         # Close the dialog
         self.parent.destroy()
@@ -3,15 +3,17 @@ import os
 import threading
 import time
 from datetime import datetime
+from compression import COMPRESSION_METHODS, METHOD_ZLIB
 
 class SettingsFrame(ctk.CTkFrame):
     """Frame for application settings and utilities."""
     
-    def __init__(self, parent, theme_manager, storage_manager):
+    def __init__(self, parent, theme_manager, storage_manager, on_set_pin=None):
         super().__init__(parent)
         self.parent = parent
         self.theme_manager = theme_manager
         self.storage_manager = storage_manager
+        self.on_set_pin = on_set_pin
         
         # Get current settings
         self.settings = self.storage_manager.get_app_settings()
@@ -139,6 +141,56 @@ class SettingsFrame(ctk.CTkFrame):
             variable=self.logout_var
         )
         self.logout_menu.pack(side="left")
+        
+        # Vault compression, used from the next login
+        self.compression_frame = ctk.CTkFrame(self.security_frame, fg_color="transparent")
+        self.compression_frame.pack(fill="x", padx=15, pady=5)
+        
+        self.compression_label = ctk.CTkLabel(
+            self.compression_frame,
+            text="Vault compression:",
+            font=("Roboto", 12)
+        )
+        self.compression_label.pack(side="left", padx=(0, 10))
+        
+        compression = self.settings.get("vault_compression", METHOD_ZLIB)
+        if compression not in COMPRESSION_METHODS:
+            compression = METHOD_ZLIB
+        self.compression_var = ctk.StringVar(value=compression)
+        self.compression_menu = ctk.CTkOptionMenu(
+            self.compression_frame,
+            values=list(COMPRESSION_METHODS),
+            variable=self.compression_var
+        )
+        self.compression_menu.pack(side="left")
+        
+        # Quick unlock PIN, kept for the current session only
+        if self.on_set_pin:
+            self.pin_frame = ctk.CTkFrame(self.security_frame, fg_color="transparent")
+            self.pin_frame.pack(fill="x", padx=15, pady=(5, 10))
+            
+            self.pin_label = ctk.CTkLabel(
+                self.pin_frame,
+                text="Quick unlock PIN:",
+                font=("Roboto", 12)
+            )
+            self.pin_label.pack(side="left", padx=(0, 10))
+            
+            self.pin_entry = ctk.CTkEntry(
+                self.pin_frame,
+                width=120,
+                placeholder_text="4-12 digits",
+                show="•"
+            )
+            self.pin_entry.pack(side="left", padx=(0, 10))
+            
+            self.pin_button = ctk.CTkButton(
+                self.pin_frame,
+                text="Set PIN",
+                width=80,
+                command=self.set_pin
+            )
+            self.pin_button.pack(side="left")
     
     def create_backup_section(self):
         """Create backup and restore section."""
@@ -169,6 +221,38 @@ class SettingsFrame(ctk.CTkFrame):
             command=self.create_backup
         )
         self.backup_button.pack(anchor="w", padx=15, pady=(0, 10))
+        
+        # Restore options
+        self.restore_frame = ctk.CTkFrame(self.backup_frame, fg_color="transparent")
+        self.restore_frame.pack(fill="x", padx=15, pady=(0, 10))
+        
+        self.restore_var = ctk.StringVar(value="")
+        self.restore_menu = ctk.CTkOptionMenu(
+            self.restore_frame,
+            values=[""],
+            variable=self.restore_var
+        )
+        self.restore_menu.pack(side="left", padx=(0, 10))
+        
+        self.restore_button = ctk.CTkButton(
+            self.restore_frame,
+            text="Restore Backup",
+            command=self.restore_backup
+        )
+        self.restore_button.pack(side="left")
+        
+        self.update_backup_list()
+    
+    def update_backup_list(self):
+        """Refresh the list of backups that can be restored."""
+        self.backups = {}
+        for snapshot in self.storage_manager.list_backups():
+            label = datetime.fromtimestamp(snapshot["created_at"]).strftime("%Y-%m-%d %H:%M:%S")
+            self.backups[label] = snapshot["id"]
+        
+        labels = list(self.backups) or ["No backups yet"]
+        self.restore_menu.configure(values=labels)
+        self.restore_var.set(labels[0])
     
     def create_about_section(self):
         """Create about section."""
@@ -219,17 +303,49 @@ class SettingsFrame(ctk.CTkFrame):
         if success:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             self.show_notification(f"Backup created successfully at {timestamp}")
+            self.update_backup_list()
         else:
             self.show_notification("Failed to create backup. No password data exists yet.")
     
+    def restore_backup(self):
+        """Restore the selected backup."""
+        snapshot_id = self.backups.get(self.restore_var.get())
+        if not snapshot_id:
+            return
+        
+        if self.storage_manager.restore_backup(snapshot_id):
+            self.show_notification("Backup restored. Log out and back in to see the restored passwords.")
+        else:
+            self.show_notification("Failed to restore backup")
+    
+    def set_pin(self):
+        """Set the PIN that unlocks the session after an auto logout."""
+        pin = self.pin_entry.get()
+        
+        if not pin.isdigit() or not 4 <= len(pin) <= 12:
+            self.show_notification("The PIN must be 4 to 12 digits")
+            return
+        
+        self.on_set_pin(pin)
+        self.pin_entry.delete(0, "end")
+        self.show_notification("PIN set. After an auto logout it unlocks SecurePass until you log out.")
+    
     def save_settings(self):
         """Save all settings."""
-        # Collect settings from UI
-        settings = {
+        compression = self.compression_var.get()
+        if compression not in COMPRESSION_METHODS:
+            self.show_notification("Unknown compression method")
+            return
+        
+        # Merge the values from the UI into the stored settings, keeping
+        # the ones this frame has no control for
+        settings = dict(self.storage_manager.get_app_settings())
+        settings.update({
             "theme_mode": self.theme_var.get().lower(),
             "clipboard_timeout": self.clipboard_var.get(),
-            "auto_logout": self.logout_var.get()
-        }
+            "auto_logout": self.logout_var.get(),
+            "vault_compression": compression
+        })
         
         # Save to storage
         if self.storage_manager.save_app_settings(settings):
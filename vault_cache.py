@@ -0,0 +1,159 @@
+import time
+import threading
+from collections import OrderedDict
+
+class VaultCache:
+    """
+    In-process cache of decrypted vault entry lists.
+
+    Entries are keyed by username and only served for the exact vault
+    version they were loaded from, so any write (from this or another
+    worker) turns the next lookup into a miss. The cache is bounded by an
+    approximate memory budget with least-recently-used eviction, and
+    vaults nobody asked for within the idle TTL are dropped.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, idle_ttl=600):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Approximate memory budget for all cached vaults
+            idle_ttl: Seconds after which an unused vault is evicted
+        """
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+
+        self._lock = threading.Lock()
+        self._vaults = OrderedDict()  # username -> (version, entries, size, last_access, derived)
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, username, version):
+        """
+        Get the cached entries of a vault.
+
+        Args:
+            username: Owner of the vault
+            version: Current version of the vault
+
+        Returns:
+            list: Cached entries (must not be modified) or None on a miss
+        """
+        cached = self._lookup(username, version)
+        return cached[1] if cached else None
+
+    def get_derived(self, username, version, name, build):
+        """
+        Get data computed from the cached entries of a vault (a sort order,
+        the list of categories...), computing it once per vault version.
+
+        Args:
+            username: Owner of the vault
+            version: Current version of the vault
+            name: Name of the derived data
+            build: Function(entries) computing it
+
+        Returns:
+            The derived data (must not be modified) or None if the vault
+            isn't cached
+        """
+        cached = self._lookup(username, version)
+        if cached is None:
+            return None
+        derived = cached[4]
+        if name not in derived:
+            derived[name] = build(cached[1])
+        return derived[name]
+
+    def put(self, username, version, entries):
+        """
+        Cache the entries of a vault.
+
+        Args:
+            username: Owner of the vault
+            version: Version of the vault the entries were loaded from
+            entries: List of decrypted entry dictionaries
+        """
+        size = self._estimate_size(entries)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove(username)
+            self._vaults[username] = (version, entries, size, time.monotonic(), {})
+            self._total_bytes += size
+            self._evict()
+
+    def invalidate(self, username):
+        """Drop a user's cached vault."""
+        with self._lock:
+            self._remove(username)
+
+    def clear(self):
+        """Drop all cached vaults."""
+        with self._lock:
+            self._vaults.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Hit/miss/eviction counters and current usage
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "vaults": len(self._vaults),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+    def _lookup(self, username, version):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._vaults.get(username)
+            if cached is None or cached[0] != version or now - cached[3] > self.idle_ttl:
+                if cached is not None:
+                    self._remove(username)
+                self.misses += 1
+                return None
+
+            self._vaults[username] = cached[:3] + (now, cached[4])
+            self._vaults.move_to_end(username)
+            self.hits += 1
+            return cached
+
+    def _remove(self, username):
+        cached = self._vaults.pop(username, None)
+        if cached is not None:
+            self._total_bytes -= cached[2]
+
+    def _evict(self):
+        """Drop idle vaults, then least recently used ones until within budget."""
+        now = time.monotonic()
+        for username in [name for name, cached in self._vaults.items() if now - cached[3] > self.idle_ttl]:
+            self._remove(username)
+            self.evictions += 1
+
+        while self._total_bytes > self.max_bytes and self._vaults:
+            username = next(iter(self._vaults))
+            self._remove(username)
+            self.evictions += 1
+
+    @staticmethod
+    def _estimate_size(entries):
+        """Rough memory footprint of an entry list in bytes."""
+        size = 64 + 8 * len(entries)
+        for entry in entries:
+            size += 240
+            for field, value in entry.items():
+                size += 100 + len(field) + (len(value) if isinstance(value, str) else 0)
+        return size
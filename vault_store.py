@@ -0,0 +1,792 @@
+import os
+import mmap
+import zlib
+import struct
+import threading
+import uuid
+from contextlib import contextmanager
+from durable_io import group_committer
+
+try:
+    import fcntl
+except ImportError:  # Windows - single desktop process, no cross-process locking needed
+    fcntl = None
+
+class VaultStore:
+    """
+    Append-only vault file made of individually encrypted entry records.
+
+    File layout:
+        header:  MAGIC (7 bytes) + format version (1 byte)
+                 + offset of the latest index record (8 bytes, version 2+)
+        records: op (1 byte) + entry id (16 bytes) + payload length (4 bytes) + payload
+
+    A PUT record carries the encrypted entry (see CryptoManager.encrypt_entry:
+    metadata and secrets are separate tokens, so listing entries leaves the
+    secrets encrypted), a DELETE record has an empty payload. The latest
+    record for an entry id wins. An in-memory offset index maps every live
+    entry id to its record, so a single add, edit or delete appends one
+    record instead of rewriting the whole file.
+
+    A BATCH record wraps the PUT and DELETE records of one write_batch call
+    (same layout, one after the other; its id field carries a CRC32 of the
+    payload), so a torn write leaves none of them applied rather than some.
+
+    An INDEX record holds the offset index as it was when it was written
+    (its id field carries a CRC32 of the payload). It is written when the
+    file is compacted and again whenever enough records were appended after
+    the last one, and the header points to the latest. Opening a vault
+    loads that index and only scans the records after it.
+
+    The file is memory-mapped for reading and records are decrypted lazily
+    from slices of the mapping, so only the entries actually read are
+    copied into memory.
+
+    Writers take an exclusive lock on the file and first index any records
+    appended by other processes, so several web workers can share a vault.
+
+    Files written before this format (one Fernet blob holding the whole
+    vault) are still readable and are upgraded on the first write, as are
+    version 1 files (no index) and version 2 files (no batches).
+    """
+
+    MAGIC = b"SPVAULT"
+    FORMAT_VERSION = 3
+    HEADER = struct.Struct(">7sB")
+    INDEX_POINTER = struct.Struct(">Q")
+    RECORD_HEADER = struct.Struct(">B16sI")
+    INDEX_ENTRY = struct.Struct(">16sQI")  # entry id, payload offset, payload length
+
+    OP_PUT = 1
+    OP_DELETE = 2
+    OP_INDEX = 3
+    OP_BATCH = 4
+
+    # Rewrite the log once superseded records outweigh live ones
+    COMPACT_MIN_BYTES = 64 * 1024
+
+    # Write a new index once this many records (and at least a quarter of
+    # the live entry count, to amortize its size) were appended after the last
+    INDEX_INTERVAL = 1024
+
+    def __init__(self, path, crypto_manager):
+        """
+        Open a vault file.
+
+        Args:
+            path: Path of the vault file
+            crypto_manager: CryptoManager used to encrypt/decrypt records
+        """
+        self.path = path
+        self.crypto_manager = crypto_manager
+
+        self._lock = threading.RLock()
+        self._index = {}  # entry id -> (payload offset, payload length)
+        self._end = 0  # offset just past the last complete record
+        self._dead_bytes = 0
+        self._unindexed_records = 0  # records after the latest index record
+        self._version = None  # format version of the file
+        self._legacy_entries = None  # entries read from an old single-blob file
+        self._file_id = None
+        self._created = False  # file created since the last sync
+        self._map = None  # read-only mapping of the file
+        self._map_id = None
+
+        with self._lock:
+            self._load()
+
+    @staticmethod
+    def new_entry_id():
+        """Generate a new entry id."""
+        return str(uuid.uuid4())
+
+    @classmethod
+    def read_raw(cls, path):
+        """
+        Read a vault file without decrypting it.
+
+        Args:
+            path: Path of the vault file
+
+        Returns:
+            tuple: (records, legacy_blob) where records is a list of
+                  (entry_id, encrypted payload) for the live entries and
+                  legacy_blob is the whole file if it uses the old format
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if not data.startswith(cls.MAGIC):
+            return [], data or None
+
+        live = {}
+        offset = cls._data_start(data[len(cls.MAGIC)])
+        while offset + cls.RECORD_HEADER.size <= len(data):
+            op, raw_id, length = cls.RECORD_HEADER.unpack_from(data, offset)
+            payload_offset = offset + cls.RECORD_HEADER.size
+            if payload_offset + length > len(data):
+                break
+            if op == cls.OP_BATCH:
+                if not cls._batch_complete(data, payload_offset, length, raw_id):
+                    break
+                records = cls._iter_records(data, payload_offset, payload_offset + length)
+            else:
+                records = [(op, raw_id, payload_offset, length)]
+            for op, raw_id, record_offset, record_length in records:
+                if op == cls.OP_PUT:
+                    live[cls._format_id(raw_id)] = data[record_offset:record_offset + record_length]
+                elif op == cls.OP_DELETE:
+                    live.pop(cls._format_id(raw_id), None)
+            offset = payload_offset + length
+        return list(live.items()), None
+
+    def is_legacy(self):
+        """Check if the file on disk still uses the single-blob format."""
+        return self._legacy_entries is not None
+
+    def entry_ids(self):
+        """
+        Get the ids of all live entries.
+
+        Returns:
+            list: Entry ids in insertion order
+        """
+        with self._lock:
+            if self._legacy_entries is not None:
+                return [entry["id"] for entry in self._legacy_entries]
+            return list(self._index)
+
+    def version(self):
+        """
+        Get a token that changes whenever the vault file changes.
+
+        Returns:
+            tuple: Opaque, comparable version token
+        """
+        with self._lock:
+            return (self._file_id, self._end)
+
+    def __len__(self):
+        with self._lock:
+            if self._legacy_entries is not None:
+                return len(self._legacy_entries)
+            return len(self._index)
+
+    def __contains__(self, entry_id):
+        with self._lock:
+            if self._legacy_entries is not None:
+                return any(entry["id"] == entry_id for entry in self._legacy_entries)
+            return entry_id in self._index
+
+    def get_entry(self, entry_id, include_secrets=True):
+        """
+        Read and decrypt a single entry.
+
+        Args:
+            entry_id: Id of the entry
+            include_secrets: If False, only the metadata is decrypted
+
+        Returns:
+            dict: The entry or None if it does not exist
+        """
+        with self._lock:
+            if self._legacy_entries is not None:
+                for entry in self._legacy_entries:
+                    if entry["id"] == entry_id:
+                        return self._copy_legacy_entry(entry, include_secrets)
+                return None
+
+            if entry_id not in self._index:
+                return None
+
+            with self._mapped() as view:
+                location = self._index.get(entry_id)
+                if location is None:
+                    return None
+                return self._read_entry(view, entry_id, *location, include_secrets)
+
+    def load_entries(self, include_secrets=True):
+        """
+        Read and decrypt all live entries.
+
+        Args:
+            include_secrets: If False, only the metadata of each entry is
+                             decrypted; passwords and notes are left out
+
+        Returns:
+            list: Entry dictionaries in insertion order
+        """
+        with self._lock:
+            if self._legacy_entries is not None:
+                return [self._copy_legacy_entry(entry, include_secrets) for entry in self._legacy_entries]
+
+            entries = []
+            if not self._index:
+                return entries
+
+            with self._mapped() as view:
+                for entry_id, location in self._index.items():
+                    entry = self._read_entry(view, entry_id, *location, include_secrets)
+                    if entry is not None:
+                        entries.append(entry)
+            return entries
+
+    def put_entry(self, entry):
+        """
+        Add or replace an entry.
+
+        An id is assigned (and stored in the entry) if it doesn't have one.
+
+        Args:
+            entry: Entry dictionary
+
+        Returns:
+            str: Id of the written entry
+        """
+        if not entry.get("id"):
+            entry["id"] = self.new_entry_id()
+        entry_id = entry["id"]
+        payload = self.crypto_manager.encrypt_entry(entry)
+
+        with self._lock:
+            with self._locked_file() as f:
+                self._append(f, [(self.OP_PUT, entry_id, payload)])
+                self._maybe_compact(f)
+        self._sync()
+        return entry_id
+
+    def delete_entry(self, entry_id):
+        """
+        Delete an entry.
+
+        Args:
+            entry_id: Id of the entry to delete
+
+        Returns:
+            bool: True if the entry existed, False otherwise
+        """
+        with self._lock:
+            with self._locked_file() as f:
+                if entry_id not in self._index:
+                    return False
+                self._append(f, [(self.OP_DELETE, entry_id, b"")])
+                self._maybe_compact(f)
+        self._sync()
+        return True
+
+    def write_batch(self, changes):
+        """
+        Add, replace and delete several entries in one atomic write.
+
+        Args:
+            changes: List of ("put", entry) and ("delete", entry_id) tuples,
+                     applied in order; entries without an id get one
+        """
+        records = []
+        for op, value in changes:
+            if op == "put":
+                if not value.get("id"):
+                    value["id"] = self.new_entry_id()
+                records.append((self.OP_PUT, value["id"], self.crypto_manager.encrypt_entry(value)))
+            else:
+                records.append((self.OP_DELETE, value, b""))
+        if not records:
+            return
+
+        with self._lock:
+            with self._locked_file() as f:
+                self._append(f, records, batch=len(records) > 1)
+                self._maybe_compact(f)
+        self._sync()
+
+    def upgrade(self):
+        """
+        Rewrite a legacy single-blob vault in the record format now.
+
+        Entries of a single-blob vault get their ids when it is read, and
+        would get new ones on every read until the vault is written;
+        upgrading stores them, so entry ids stay the same from then on.
+        """
+        if not self.is_legacy():
+            return
+        with self._lock:
+            with self._locked_file():
+                pass
+        self._sync()
+
+    def refresh(self):
+        """
+        Pick up records appended to the file by another writer.
+
+        Returns:
+            bool: True if the in-memory index changed
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                changed = bool(self._index) or self._legacy_entries is not None
+                self._reset()
+                self._unmap()
+                return changed
+
+            file_id = (stat.st_ino, stat.st_dev)
+            if file_id != self._file_id or stat.st_size < self._end:
+                # Replaced (compacted, upgraded or restored) - rebuild from scratch
+                self._load()
+                return True
+
+            if stat.st_size == self._end:
+                return False
+
+            if self._legacy_entries is not None:
+                self._load()
+                return True
+
+            with open(self.path, 'rb') as f:
+                self._map_file(f)
+                self._scan()
+            return True
+
+    def compact(self):
+        """
+        Rewrite the file keeping only the latest record of each live entry.
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        with self._lock:
+            try:
+                with self._locked_file() as f:
+                    self._compact(f)
+            except Exception as e:
+                print(f"Error compacting vault: {e}")
+                return False
+        self._sync()
+        return True
+
+    def _reset(self):
+        """Forget everything known about the file."""
+        self._index = {}
+        self._end = 0
+        self._dead_bytes = 0
+        self._unindexed_records = 0
+        self._version = None
+        self._legacy_entries = None
+        self._file_id = None
+
+    @staticmethod
+    def _file_identity(f):
+        stat = os.fstat(f.fileno())
+        return (stat.st_ino, stat.st_dev)
+
+    @classmethod
+    def _data_start(cls, version):
+        """Offset of the first record in a file of the given format version."""
+        if version >= 2:
+            return cls.HEADER.size + cls.INDEX_POINTER.size
+        return cls.HEADER.size
+
+    @staticmethod
+    def _format_id(raw_id):
+        """Same as str(uuid.UUID(bytes=raw_id)), without building a UUID object."""
+        h = raw_id.hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+    def _load(self):
+        """Build the offset index from the file on disk."""
+        self._reset()
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            self._unmap()
+            return
+        with f:
+            self._load_from(f)
+
+    def _load_from(self, f):
+        """Build the offset index from an open vault file."""
+        self._reset()
+        f.seek(0)
+        header = f.read(self.HEADER.size)
+        if len(header) == self.HEADER.size and header.startswith(self.MAGIC):
+            _, version = self.HEADER.unpack(header)
+            if version > self.FORMAT_VERSION:
+                raise ValueError(f"Unsupported vault format version {version}")
+            self._version = version
+            self._end = self._data_start(version)
+            self._map_file(f)
+            if version >= 2:
+                self._load_index()
+            self._scan()
+        elif header:
+            f.seek(0)
+            encrypted_data = f.read()
+            self._load_legacy(encrypted_data)
+            self._end = len(encrypted_data)
+            self._unmap()
+        self._file_id = self._file_identity(f)
+
+    def _map_file(self, f):
+        """Map the open vault file, unless the current mapping already covers it."""
+        file_id = self._file_identity(f)
+        size = os.fstat(f.fileno()).st_size
+        if self._map is not None and self._map_id == file_id and len(self._map) >= size:
+            return
+        self._unmap()
+        if size:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._map_id = file_id
+
+    def _unmap(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A view of it is still alive; it is unmapped once that is released
+                pass
+        self._map = None
+        self._map_id = None
+
+    def _load_index(self):
+        """Load the index record the header points to; the records after it are scanned."""
+        data = self._map
+        if data is None or len(data) < self._end:
+            return
+        (index_offset,) = self.INDEX_POINTER.unpack_from(data, self.HEADER.size)
+        if not index_offset or index_offset + self.RECORD_HEADER.size > len(data):
+            return
+        op, checksum, length = self.RECORD_HEADER.unpack_from(data, index_offset)
+        payload_offset = index_offset + self.RECORD_HEADER.size
+        if op != self.OP_INDEX or payload_offset + length > len(data):
+            return
+        payload = data[payload_offset:payload_offset + length]
+        if checksum[:4] != zlib.crc32(payload).to_bytes(4, "big"):
+            # Not completely written - fall back to scanning every record
+            return
+
+        live_bytes = 0
+        for raw_id, offset, entry_length in self.INDEX_ENTRY.iter_unpack(payload):
+            self._index[self._format_id(raw_id)] = (offset, entry_length)
+            live_bytes += self.RECORD_HEADER.size + entry_length
+        self._end = payload_offset + length
+        self._dead_bytes = self._end - self._data_start(self._version) - live_bytes
+
+    def _scan(self):
+        """Index records from the end of the index to the last complete one in the mapping."""
+        data = self._map
+        size = len(data) if data is not None else 0
+        offset = self._end
+        while offset + self.RECORD_HEADER.size <= size:
+            op, raw_id, length = self.RECORD_HEADER.unpack_from(data, offset)
+            payload_offset = offset + self.RECORD_HEADER.size
+            if payload_offset + length > size:
+                # Torn write at the tail; it is overwritten by the next append
+                break
+            if op == self.OP_INDEX:
+                # Superseded by the index loaded at startup or the records after it
+                self._dead_bytes += self.RECORD_HEADER.size + length
+            elif op == self.OP_BATCH:
+                if not self._batch_complete(data, payload_offset, length, raw_id):
+                    # Torn batch at the tail; none of its records count
+                    break
+                self._dead_bytes += self.RECORD_HEADER.size
+                for record in self._iter_records(data, payload_offset, payload_offset + length):
+                    self._apply(record[0], self._format_id(record[1]), record[2], record[3])
+            else:
+                self._apply(op, self._format_id(raw_id), payload_offset, length)
+            offset = payload_offset + length
+        self._end = offset
+
+    @classmethod
+    def _batch_complete(cls, data, payload_offset, length, checksum):
+        """Check the CRC32 of a BATCH record's payload."""
+        return checksum[:4] == zlib.crc32(data[payload_offset:payload_offset + length]).to_bytes(4, "big")
+
+    @classmethod
+    def _iter_records(cls, data, start, end):
+        """Yield (op, raw id, payload offset, payload length) of the records inside a BATCH record."""
+        offset = start
+        while offset + cls.RECORD_HEADER.size <= end:
+            op, raw_id, length = cls.RECORD_HEADER.unpack_from(data, offset)
+            payload_offset = offset + cls.RECORD_HEADER.size
+            yield op, raw_id, payload_offset, length
+            offset = payload_offset + length
+
+    def _apply(self, op, entry_id, payload_offset, length):
+        """Update the index for one record. Edited entries keep their position."""
+        if op == self.OP_PUT:
+            previous = self._index.get(entry_id)
+            self._index[entry_id] = (payload_offset, length)
+        else:
+            previous = self._index.pop(entry_id, None)
+            self._dead_bytes += self.RECORD_HEADER.size
+        if previous is not None:
+            self._dead_bytes += self.RECORD_HEADER.size + previous[1]
+        self._unindexed_records += 1
+
+    def _load_legacy(self, encrypted_data):
+        """Read a vault stored as a single encrypted blob."""
+        data = self.crypto_manager.decrypt_data(encrypted_data)
+        if not data or not isinstance(data, dict):
+            raise ValueError("Could not decrypt vault")
+
+        entries = data.get("entries", [])
+        for entry in entries:
+            if not entry.get("id"):
+                entry["id"] = self.new_entry_id()
+        self._legacy_entries = entries
+
+    @contextmanager
+    def _mapped(self):
+        """
+        Get a view of the mapped file the index describes.
+
+        The file is only reopened if the mapping doesn't cover the indexed
+        records yet (e.g. after an append). A file replaced on disk keeps
+        being read through the old mapping until refresh() is called, which
+        gives a consistent view of the vault.
+        """
+        if self._map is None or self._map_id != self._file_id or len(self._map) < self._end:
+            with open(self.path, 'rb') as f:
+                if self._file_identity(f) != self._file_id:
+                    self._load_from(f)
+                else:
+                    self._map_file(f)
+        with memoryview(self._map if self._map is not None else b"") as view:
+            yield view
+
+    @contextmanager
+    def _locked_file(self):
+        """
+        Open the vault for writing under an exclusive lock.
+
+        The index is brought up to date with the file before yielding, and a
+        legacy single-blob or version 1 vault is rewritten in the current
+        format first.
+        """
+        while True:
+            f = self._open_locked(self.path, os.O_RDWR | os.O_CREAT)
+            try:
+                if self._file_identity(f) != self._path_identity():
+                    # Replaced by another writer while we waited for the lock
+                    self._close_locked(f)
+                    continue
+
+                size = os.fstat(f.fileno()).st_size
+                if self._file_identity(f) != self._file_id or size < self._end:
+                    self._load_from(f)
+                elif size > self._end:
+                    if self._legacy_entries is not None:
+                        self._load_from(f)
+                    else:
+                        self._map_file(f)
+                        self._scan()
+
+                if self._legacy_entries is not None:
+                    self._upgrade_legacy()
+                    self._close_locked(f)
+                    continue
+                if self._version is not None and self._version < self.FORMAT_VERSION:
+                    self._compact(f)
+                    self._close_locked(f)
+                    continue
+            except BaseException:
+                self._close_locked(f)
+                raise
+            break
+
+        try:
+            if self._end == 0:
+                # New (empty) file
+                f.seek(0)
+                f.write(self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION))
+                f.write(self.INDEX_POINTER.pack(0))
+                self._version = self.FORMAT_VERSION
+                self._end = self._data_start(self._version)
+                self._file_id = self._file_identity(f)
+                self._created = True
+            yield f
+        finally:
+            self._close_locked(f)
+
+    @staticmethod
+    def _open_locked(path, flags):
+        """Open a file for reading and writing and take an exclusive lock on it."""
+        f = os.fdopen(os.open(path, flags, 0o600), 'r+b')
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                f.close()
+                raise
+        return f
+
+    @staticmethod
+    def _close_locked(f):
+        """
+        Unlock and close a file opened by _open_locked.
+
+        The lock is released explicitly: a memory mapping of the file shares
+        its open file description and would otherwise keep it locked.
+        """
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            f.close()
+
+    def _path_identity(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_dev)
+
+    def _upgrade_legacy(self):
+        """Rewrite an old single-blob vault in the record format."""
+        entries = self._legacy_entries
+        records = [(self.OP_PUT, entry["id"], self.crypto_manager.encrypt_entry(entry)) for entry in entries]
+        self._replace_file(records)
+
+    def _compact(self, f):
+        """Rewrite the locked file keeping only live records."""
+        records = []
+        for entry_id, (offset, length) in self._index.items():
+            f.seek(offset)
+            records.append((self.OP_PUT, entry_id, f.read(length)))
+        self._replace_file(records)
+
+    def _replace_file(self, records):
+        """
+        Atomically replace the (locked) vault file with one holding the given records.
+
+        The new file is locked until it is in place, so writers waiting on the
+        old file notice the replacement and retry on the new one.
+        """
+        temp_path = self.path + ".tmp"
+        new_file = self._open_locked(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC)
+        try:
+            try:
+                new_file.write(self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION))
+                new_file.write(self.INDEX_POINTER.pack(0))
+                self._index = {}
+                self._version = self.FORMAT_VERSION
+                self._end = self._data_start(self._version)
+                self._dead_bytes = 0
+                self._unindexed_records = 0
+                self._legacy_entries = None
+                self._append(new_file, records, write_index=True)
+                os.fsync(new_file.fileno())
+                # Mapped files can't be replaced on Windows
+                self._unmap()
+                os.replace(temp_path, self.path)
+                self._created = True
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                # Index no longer matches any file; rebuild it on next access
+                self._file_id = None
+                raise
+        finally:
+            self._close_locked(new_file)
+
+    def _append(self, f, records, write_index=False, batch=False):
+        """
+        Append records at the end of the indexed log and update the index.
+
+        The records are wrapped in a BATCH record if batch is set. An index
+        record follows them if write_index is set or enough records were
+        appended since the last one.
+        """
+        f.seek(self._end)
+        offset = self._end
+        if batch:
+            payload = b"".join(
+                self.RECORD_HEADER.pack(op, uuid.UUID(entry_id).bytes, len(payload)) + payload
+                for op, entry_id, payload in records
+            )
+            checksum = zlib.crc32(payload).to_bytes(4, "big").ljust(16, b"\0")
+            f.write(self.RECORD_HEADER.pack(self.OP_BATCH, checksum, len(payload)))
+            f.write(payload)
+            offset += self.RECORD_HEADER.size
+            self._dead_bytes += self.RECORD_HEADER.size
+        for op, entry_id, payload in records:
+            if not batch:
+                f.write(self.RECORD_HEADER.pack(op, uuid.UUID(entry_id).bytes, len(payload)))
+                f.write(payload)
+
+            payload_offset = offset + self.RECORD_HEADER.size
+            self._apply(op, entry_id, payload_offset, len(payload))
+            offset = payload_offset + len(payload)
+
+        if write_index or self._unindexed_records >= max(self.INDEX_INTERVAL, len(self._index) // 4):
+            offset = self._write_index(f, offset)
+
+        # Drop any torn record left behind by an interrupted write (a mapping
+        # covering it must go first: it can't be shrunk under on Windows and
+        # would fault on Linux)
+        if self._map is not None and len(self._map) > offset:
+            self._unmap()
+        f.truncate()
+        f.flush()
+        self._end = offset
+        self._file_id = self._file_identity(f)
+
+    def _write_index(self, f, offset):
+        """
+        Write the current offset index as a record at offset and point the header to it.
+
+        Returns:
+            int: Offset just past the index record
+        """
+        payload = b"".join(
+            self.INDEX_ENTRY.pack(bytes.fromhex(entry_id.replace("-", "")), entry_offset, length)
+            for entry_id, (entry_offset, length) in self._index.items()
+        )
+        checksum = zlib.crc32(payload).to_bytes(4, "big").ljust(16, b"\0")
+        f.write(self.RECORD_HEADER.pack(self.OP_INDEX, checksum, len(payload)))
+        f.write(payload)
+
+        # The record is written before the pointer; a pointer to an
+        # incomplete record fails the checksum and the file is scanned instead
+        f.seek(self.HEADER.size)
+        f.write(self.INDEX_POINTER.pack(offset))
+        end = offset + self.RECORD_HEADER.size + len(payload)
+        f.seek(end)
+
+        self._dead_bytes += self.RECORD_HEADER.size + len(payload)
+        self._unindexed_records = 0
+        return end
+
+    def _sync(self):
+        """
+        Wait until appended records are on disk.
+
+        Called after the file lock is released, so concurrent writers of
+        the vault share a single fsync.
+        """
+        paths = [self.path]
+        if self._created:
+            # New or replaced file - its directory entry must be durable too
+            paths.append(os.path.dirname(os.path.abspath(self.path)))
+            self._created = False
+        group_committer.sync(*paths)
+
+    def _maybe_compact(self, f):
+        live_bytes = self._end - self._dead_bytes
+        if self._dead_bytes > self.COMPACT_MIN_BYTES and self._dead_bytes > live_bytes:
+            self._compact(f)
+
+    def _read_entry(self, view, entry_id, offset, length, include_secrets=True):
+        """Decrypt the record payload at the given location of the mapped file."""
+        entry = self.crypto_manager.decrypt_entry(view[offset:offset + length], include_secrets)
+        if entry is None:
+            return None
+        entry["id"] = entry_id
+        return entry
+
+    def _copy_legacy_entry(self, entry, include_secrets):
+        if include_secrets:
+            return dict(entry)
+        return self.crypto_manager.split_entry(entry)[0]